@@ -0,0 +1,248 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import clients
+import gcp
+import operations
+import ratelimit
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Default number of in-flight calls allowed per API
+DEFAULT_LIMITS = {
+    'compute': 100,
+    'storage': 100,
+    'sheets': 10,
+    'translate': 50,
+    'speech': 20,
+}
+
+_limits = dict(DEFAULT_LIMITS)
+# Event loop -> {api: Semaphore}; a semaphore is bound to the loop that first waits on it
+_semaphores = weakref.WeakKeyDictionary()
+_executor = None
+
+
+def set_limit(api, limit):
+    """
+    Set the maximum number of concurrent in-flight calls for an API.
+
+    Calls already waiting keep the old limit; later calls use the new one.
+
+    Args:
+        api (str): API name, e.g. 'compute', 'storage', 'sheets'.
+        limit (int): Maximum number of concurrent calls.
+    """
+    _limits[api] = limit
+    for semaphores in list(_semaphores.values()):
+        semaphores.pop(api, None)
+
+
+def set_executor(executor):
+    """
+    Replace the thread pool used to bridge blocking SDK calls.
+
+    Args:
+        executor (Executor): Executor to run blocking calls on.
+    """
+    global _executor
+    _executor = executor
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=sum(_limits.values()), thread_name_prefix='aio-bridge')
+    return _executor
+
+
+def _semaphore(api):
+    loop = asyncio.get_running_loop()
+    semaphores = _semaphores.get(loop)
+    if semaphores is None:
+        semaphores = _semaphores[loop] = {}
+    semaphore = semaphores.get(api)
+    if semaphore is None:
+        semaphore = semaphores[api] = asyncio.Semaphore(_limits.get(api, 10))
+    return semaphore
+
+
+async def run_blocking(api, func, *args, **kwargs):
+    """
+    Run a blocking connector call on the bridge executor under the API's concurrency limit.
+
+    The call runs in a copy of the caller's context, as with asyncio.to_thread(), so
+    gcp.use_target() set around the coroutine applies to it.
+
+    Args:
+        api (str): API name whose limiter the call counts against.
+        func (callable): Blocking function to call.
+
+    Returns:
+        The function's return value.
+    """
+    async with _semaphore(api):
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_get_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+async def wait_for_operation(project, operation_name, zone=None, region=None, timeout=None):
+    """
+    Await a Compute Engine operation without holding a thread while it runs.
+
+    Returns:
+        Operation: The finished operation; raises OperationError on failure or timeout.
+    """
+    future = operations.get_poller(gcp.current_target()[0]).track(
+        project, operation_name, zone=zone, region=region, timeout=timeout)
+    return await asyncio.wrap_future(future)
+
+
+async def create_instance(project, zone, instance_name, machine_type, source_image, network='default'):
+    """
+    Create a Compute Engine instance.
+
+    Returns:
+        str: Instance name if created successfully, else None.
+    """
+    from google.cloud import compute_v1
+
+    try:
+        # Loading credentials and building clients blocks; keep it off the event loop
+        compute_client, _ = await run_blocking('compute', gcp.initialize_clients)
+        if not compute_client:
+            return None
+        instance = gcp.build_instance_resource(project, zone, instance_name, machine_type, source_image, network)
+        request = compute_v1.InsertInstanceRequest(
+            project=project, zone=zone, instance_resource=instance, request_id=str(uuid.uuid4()))
+        operation = await run_blocking('compute', ratelimit.call, 'compute', project, compute_client.insert,
+                                       request=request)
+        await wait_for_operation(project, operation.name, zone=zone)
+        logger.info(f"Successfully created instance: {instance_name}")
+        gcp.notify_mutation('instances', project, zone)
+        return instance_name
+    except Exception as e:
+        logger.error(f"Failed to create instance: {e}")
+        return None
+
+
+async def list_instances(project, zone):
+    """List running Compute Engine instances in a zone."""
+    return await run_blocking('compute', gcp.list_instances, project, zone)
+
+
+async def terminate_instance(project, zone, instance_name):
+    """Terminate (delete) a Compute Engine instance."""
+    from google.cloud import compute_v1
+
+    try:
+        # Loading credentials and building clients blocks; keep it off the event loop
+        compute_client, _ = await run_blocking('compute', gcp.initialize_clients)
+        if not compute_client:
+            return
+        request = compute_v1.DeleteInstanceRequest(
+            project=project, zone=zone, instance=instance_name, request_id=str(uuid.uuid4()))
+        operation = await run_blocking('compute', ratelimit.call, 'compute', project, compute_client.delete,
+                                       request=request)
+        await wait_for_operation(project, operation.name, zone=zone)
+        logger.info(f"Successfully terminated instance: {instance_name}")
+        gcp.notify_mutation('instances', project, zone)
+    except Exception as e:
+        logger.error(f"Failed to terminate instance: {e}")
+
+
+async def create_storage_bucket(bucket_name, location='US', storage_class='STANDARD'):
+    """Create a Cloud Storage bucket."""
+    return await run_blocking('storage', gcp.create_storage_bucket, bucket_name, location, storage_class)
+
+
+async def list_storage_buckets():
+    """List all Cloud Storage buckets in the project."""
+    return await run_blocking('storage', gcp.list_storage_buckets)
+
+
+async def upload_file_to_storage(bucket_name, source_file, destination_blob_name=None):
+    """Upload a file to a Cloud Storage bucket."""
+    return await run_blocking('storage', gcp.upload_file_to_storage, bucket_name, source_file, destination_blob_name)
+
+
+async def delete_storage_bucket(bucket_name):
+    """Delete a Cloud Storage bucket and all its contents."""
+    return await run_blocking('storage', gcp.delete_storage_bucket, bucket_name)
+
+
+async def create_load_balancer(project, bucket_name, backend_bucket_name, domain_name):
+    """Create a CDN-enabled load balancer in front of a Cloud Storage bucket."""
+    return await run_blocking(
+        'compute', gcp.create_load_balancer, project, bucket_name, backend_bucket_name, domain_name)
+
+
+async def read_sheet(range_name):
+    """Read a range from the configured spreadsheet."""
+    import spread
+    return await run_blocking('sheets', spread.read_sheet, range_name)
+
+
+async def write_sheet(range_name, values):
+    """Write values to a range of the configured spreadsheet."""
+    import spread
+    return await run_blocking('sheets', spread.write_sheet, range_name, values)
+
+
+async def translate(text, target_language):
+    """Translate text to the target language."""
+    import trans
+    return await run_blocking('translate', trans.translate, text, target_language)
+
+
+async def transcribe_audio(file_path):
+    """Transcribe a mono LINEAR16 WAV file."""
+    import sppechtotext
+    return await run_blocking('speech', sppechtotext.transcribe_audio, file_path)
+
+
+async def main():
+    """Async counterpart of gcp.main() that never blocks the event loop."""
+    _, project = gcp.current_target()
+    zone = 'us-central1-a'
+    instance_name = 'gcp-instance-test'
+    machine_type = 'n1-standard-1'
+    source_image = 'projects/debian-cloud/global/images/family/debian-11'
+    bucket_name = 'my-gcp-bucket-party212'
+    file_to_upload = "C:\\Users\\naman\\Downloads\\hmm_flowchart.png"
+
+    # Instance and bucket creation are independent, so run them together
+    instance_id, bucket = await asyncio.gather(
+        create_instance(project, zone, instance_name, machine_type, source_image),
+        create_storage_bucket(bucket_name, location='US', storage_class='STANDARD'),
+    )
+
+    await asyncio.gather(list_instances(project, zone), list_storage_buckets())
+
+    if bucket and os.path.exists(file_to_upload):
+        await upload_file_to_storage(bucket_name, file_to_upload)
+
+    logger.info("Waiting for 2 minutes before deleting created resources...")
+    await asyncio.sleep(120)
+
+    cleanup = []
+    if instance_id:
+        cleanup.append(terminate_instance(project, zone, instance_name))
+    if bucket:
+        cleanup.append(delete_storage_bucket(bucket_name))
+    await asyncio.gather(*cleanup)
+
+    logger.info("Resource cleanup completed.")
+    clients.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
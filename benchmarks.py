@@ -0,0 +1,563 @@
+import argparse
+import importlib.util
+import json
+import logging
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from collections import namedtuple
+
+import numpy as np
+
+import fakegcp
+import fanout
+import gcp
+import metrics
+import operations
+import ratelimit
+import reconciler
+import spread
+import sppechtotext
+import trans
+import uploads
+import warmpool
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PROJECT = 'bench-project'
+PROJECTS = tuple(f"bench-project-{index}" for index in range(3))
+ZONES = ('us-central1-a', 'us-central1-b', 'europe-west1-b', 'asia-east1-a')
+
+# The fakes replace the API servers, not the client libraries: gcp.py still builds real
+# SDK request objects and the fakes answer with real SDK types and exceptions
+REQUIRED_SDKS = {
+    'google.cloud.compute_v1': 'google-cloud-compute',
+    'google.cloud.speech': 'google-cloud-speech',
+    'google.api_core': 'google-api-core',
+    'googleapiclient': 'google-api-python-client',
+    'google_crc32c': 'google-crc32c',
+}
+
+BenchmarkResult = namedtuple('BenchmarkResult', 'name units unit seconds throughput p50 p99')
+
+
+class BenchmarkFailed(Exception):
+    """Raised when a benchmark did less work than it asked for, so its numbers would be meaningless."""
+
+
+def _expect(what, actual, expected):
+    if actual != expected:
+        raise BenchmarkFailed(f"{what}: got {actual}, expected {expected}")
+
+
+def _expect_success(what, results):
+    """Consume per-item result dicts and raise if any of them failed; return their completion times."""
+    start = time.perf_counter()
+    latencies, errors = [], []
+    for result in results:
+        if result['success']:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(result['error'])
+    if errors:
+        raise BenchmarkFailed(f"{what}: {len(errors)} failed, first error: {errors[0]}")
+    return latencies
+
+
+def default_profiles(error_rate=0.01):
+    """
+    Latency, failure and quota profiles loosely modelled on the real APIs.
+
+    Args:
+        error_rate (float): Probability of an injected 503 on every API.
+
+    Returns:
+        dict: API name -> fakegcp.Profile.
+    """
+    return {
+        'compute': fakegcp.Profile(latency=0.02, jitter=0.3, error_rate=error_rate, rate=200),
+        'storage': fakegcp.Profile(latency=0.01, jitter=0.3, error_rate=error_rate, rate=1000,
+                                   per_unit=1 / 200e6),
+        'sheets': fakegcp.Profile(latency=0.05, jitter=0.3, error_rate=error_rate, rate=5, burst=10),
+        'translate': fakegcp.Profile(latency=0.03, jitter=0.3, error_rate=error_rate, rate=50,
+                                     per_unit=1e-6),
+        'speech': fakegcp.Profile(latency=0.05, jitter=0.3, error_rate=error_rate, rate=20, per_unit=0.005),
+    }
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers, or None if it is empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _timed_runs(repeat, run):
+    """Call run() repeat times; return (total units, per-run latencies)."""
+    units, latencies = 0, []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        units += run()
+        latencies.append(time.perf_counter() - start)
+    return units, latencies
+
+
+def _instance_specs(count, prefix):
+    return [{
+        'project': PROJECT,
+        'zone': ZONES[index % len(ZONES)],
+        'instance_name': f"{prefix}-{index:05d}",
+        'machine_type': 'n1-standard-1',
+        'source_image': 'projects/debian-cloud/global/images/family/debian-11',
+    } for index in range(count)]
+
+
+def bench_provision(cloud, scale, workdir, repeat):
+    """Create a fleet with create_instances(); latency is each VM's time to ready."""
+    specs = _instance_specs(int(200 * scale), 'provision')
+    latencies = _expect_success('create_instances', gcp.create_instances(specs, max_in_flight=50))
+    _expect('instances created', len(latencies), len(specs))
+    return len(latencies), latencies
+
+
+def bench_terminate(cloud, scale, workdir, repeat):
+    """Delete a fleet with terminate_instances(); latency is each VM's time to gone."""
+    specs = _instance_specs(int(200 * scale), 'terminate')
+    for zone in ZONES:
+        cloud.compute.seed(PROJECT, zone, [spec['instance_name'] for spec in specs if spec['zone'] == zone])
+    latencies = _expect_success('terminate_instances', gcp.terminate_instances(specs, max_in_flight=50))
+    _expect('instances terminated', len(latencies), len(specs))
+    return len(latencies), latencies
+
+
+def bench_list_instances(cloud, scale, workdir, repeat):
+    """Stream running instances across zones with filtered, paged aggregated listing."""
+    count = int(5000 * scale)
+    running = 0
+    for index, zone in enumerate(ZONES):
+        names = [f"list-{index}-{number:06d}" for number in range(count // len(ZONES))]
+        half = len(names) // 2
+        cloud.compute.seed(PROJECT, zone, names[:half], status='RUNNING')
+        cloud.compute.seed(PROJECT, zone, names[half:], status='TERMINATED')
+        running += half
+
+    def run():
+        listed = sum(1 for _ in gcp.iter_instances(PROJECT, status='RUNNING'))
+        _expect('running instances listed', listed, running)
+        return listed
+    return _timed_runs(repeat, run)
+
+
+def bench_list_buckets(cloud, scale, workdir, repeat):
+    """Stream bucket records page by page."""
+    count = int(3000 * scale)
+    for index in range(count):
+        cloud.storage.seed(f"bench-bucket-{index:06d}", [])
+
+    def run():
+        listed = sum(1 for _ in gcp.iter_buckets(page_size=500))
+        _expect('buckets listed', listed, count)
+        return listed
+    return _timed_runs(repeat, run)
+
+
+def bench_fanout(cloud, scale, workdir, repeat):
+    """Stream running instances from every (project, zone) target as one merged stream."""
+    count = int(6000 * scale) // (len(PROJECTS) * len(ZONES))
+    for project in PROJECTS:
+        for index, zone in enumerate(ZONES):
+            cloud.compute.seed(project, zone, [f"fan-{index}-{number:06d}" for number in range(count)],
+                               status='RUNNING')
+    targets = fanout.targets(PROJECTS, ZONES)
+
+    def run():
+        report = fanout.FanOutReport()
+        listed = sum(1 for result in fanout.list_instances(targets, status='RUNNING', report=report)
+                     if result.error is None)
+        if not report.complete:
+            raise BenchmarkFailed(f"fan-out: {len(report.failed)} targets failed")
+        _expect('instances listed', listed, count * len(targets))
+        return listed
+    return _timed_runs(repeat, run)
+
+
+def bench_teardown(cloud, scale, workdir, repeat):
+    """Empty and delete a bucket with delete_storage_bucket(); units are objects removed."""
+    count = int(20000 * scale)
+
+    def run():
+        cloud.storage.seed('bench-teardown', (f"data/{index:07d}.bin" for index in range(count)))
+        deleted = gcp.delete_storage_bucket('bench-teardown')
+        _expect('objects deleted', deleted, count)
+        return deleted
+    return _timed_runs(repeat, run)
+
+
+def _write_tree(root, scale):
+    """
+    Write a reproducible tree of small files plus one file large enough for a parallel upload.
+
+    Returns:
+        tuple: (total bytes, number of files).
+    """
+    generator = np.random.default_rng(0)
+    total = 0
+    for index in range(int(40 * scale)):
+        size = int(generator.integers(4 * 1024, 2 * 1024 * 1024))
+        path = os.path.join(root, f"dir-{index % 4}", f"file-{index:04d}.bin")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(generator.bytes(size))
+        total += size
+    size = int(24 * 1024 * 1024 * scale)
+    with open(os.path.join(root, 'large.bin'), 'wb') as f:
+        f.write(generator.bytes(size))
+    return total + size, int(40 * scale) + 1
+
+
+def _expect_uploaded(result, files):
+    if result['failed']:
+        name, error = next(iter(result['failed'].items()))
+        raise BenchmarkFailed(f"{len(result['failed'])} uploads failed, first: {name}: {error}")
+    _expect('files uploaded or skipped', len(result['uploaded']) + len(result['skipped']), files)
+
+
+def bench_upload(cloud, scale, workdir, repeat):
+    """Upload a directory tree with upload_directory(); units are bytes sent."""
+    source = os.path.join(workdir, 'upload-tree')
+    total, files = _write_tree(source, scale)
+    cloud.storage.seed('bench-uploads', [])
+    options = {'chunk_size': 1024 * 1024, 'parallel_threshold': 8 * 1024 * 1024,
+               'state_dir': os.path.join(workdir, 'upload-state')}
+
+    def run():
+        result = uploads.upload_directory('bench-uploads', source, prefix='tree', **options)
+        _expect_uploaded(result, files)
+        return total
+    return _timed_runs(repeat, run)
+
+
+def bench_upload_sync(cloud, scale, workdir, repeat):
+    """Re-sync an unchanged tree; every file should be skipped after one listing and stat-only checks."""
+    source = os.path.join(workdir, 'sync-tree')
+    _, files = _write_tree(source, scale)
+    cloud.storage.seed('bench-sync', [])
+    options = {'chunk_size': 1024 * 1024, 'parallel_threshold': 8 * 1024 * 1024,
+               'state_dir': os.path.join(workdir, 'sync-state')}
+    _expect_uploaded(uploads.upload_directory('bench-sync', source, **options), files)
+
+    def run():
+        result = uploads.upload_directory('bench-sync', source, sync=True, **options)
+        if result['failed'] or result['uploaded']:
+            raise BenchmarkFailed(f"sync of an unchanged tree uploaded {len(result['uploaded'])} files "
+                                  f"and failed {len(result['failed'])}")
+        _expect('files skipped', len(result['skipped']), files)
+        return len(result['skipped'])
+    return _timed_runs(repeat, run)
+
+
+def bench_translate(cloud, scale, workdir, repeat):
+    """Translate a corpus with duplicates through translate_batch(); units are strings."""
+    generator = np.random.default_rng(0)
+    words = ['cloud', 'portal', 'instance', 'bucket', 'zone', 'quota', 'latency', 'sheet', 'speech', 'text']
+    count = int(20000 * scale)
+    texts = [' '.join(generator.choice(words, size=int(generator.integers(3, 30)))) for _ in range(count)]
+    texts += texts[:count // 3]
+    def run():
+        translations = trans.translate_batch(texts, 'es', cache=trans.TranslationCache())
+        _expect('strings translated', sum(1 for text in translations if text), len(texts))
+        return len(translations)
+    return _timed_runs(repeat, run)
+
+
+def _write_wav(path, seconds, rate=16000, channels=2):
+    """Write a reproducible stereo WAV of tones separated by short silences."""
+    generator = np.random.default_rng(0)
+    t = np.arange(int(seconds * rate)) / rate
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * generator.standard_normal(t.size)
+    signal[(t % 7) > 6.5] = 0
+    samples = np.repeat((signal * 32767).astype('<i2')[:, None], channels, axis=1)
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+
+
+def bench_transcribe(cloud, scale, workdir, repeat):
+    """Transcribe long stereo audio in silence-split chunks; units are seconds of audio."""
+    seconds = int(180 * scale)
+    path = os.path.join(workdir, 'speech.wav')
+    _write_wav(path, seconds)
+
+    def run():
+        transcript = sppechtotext.transcribe_long_audio(path, window_seconds=20)
+        if not transcript['segments']:
+            raise BenchmarkFailed("transcription returned no segments")
+        return seconds
+    return _timed_runs(repeat, run)
+
+
+def bench_sheets(cloud, scale, workdir, repeat):
+    """Queue scattered cell writes through SheetsClient, flush once, then stream the rows back."""
+    rows = int(2000 * scale)
+
+    def run():
+        with spread.SheetsClient('bench-sheet', flush_interval=60) as client:
+            for row in range(1, rows + 1):
+                client.write(f"Sheet1!A{row}", [[row, f"name-{row}", row * 0.5]])
+            client.flush()
+            read = sum(1 for _ in client.iter_rows('Sheet1', 'A', 'C', block_rows=500))
+            _expect('rows read back', read, rows)
+            return read * 3
+    return _timed_runs(repeat, run)
+
+
+# Fake API methods that change state; a no-op reconcile must not call any of them
+MUTATING_METHODS = {
+    'instances.insert', 'instances.delete', 'instances.setLabels', 'instances.start', 'instances.stop',
+    'instances.suspend', 'instances.resume', 'buckets.insert', 'buckets.patch',
+    'buckets.delete', 'objects.delete', 'objects.resumableUpload', 'objects.upload', 'objects.compose', 'batch',
+}
+
+
+def bench_reconcile(cloud, scale, workdir, repeat):
+    """Apply a desired-state spec once, then time re-runs that must find nothing to change."""
+    source = os.path.join(workdir, 'site')
+    _write_tree(source, scale / 4)
+    spec = {
+        'project': PROJECT,
+        'instances': [{'name': spec['instance_name'], 'zone': spec['zone'], 'machine_type': spec['machine_type'],
+                       'source_image': spec['source_image'], 'labels': {'role': 'web'}}
+                      for spec in _instance_specs(int(40 * scale), 'web')],
+        'buckets': [{'name': f"bench-site-{index}", 'labels': {'tier': 'static'}} for index in range(4)],
+        'uploads': [{'bucket': 'bench-site-0', 'source': source, 'prefix': 'www'}],
+    }
+    _, _, errors = reconciler.reconcile(spec)
+    if errors:
+        key, error = next(iter(errors.items()))
+        raise BenchmarkFailed(f"{len(errors)} changes failed on the first reconcile, first: {key}: {error}")
+
+    def run():
+        mutations_before = sum(count for (api, method), count in cloud.calls.items() if method in MUTATING_METHODS)
+        actions, _, errors = reconciler.reconcile(spec, refresh=True)
+        mutations = sum(count for (api, method), count in cloud.calls.items()
+                        if method in MUTATING_METHODS) - mutations_before
+        if actions or mutations or errors:
+            raise BenchmarkFailed(f"No-op reconcile planned {len(actions)} changes, made {mutations} mutating "
+                                  f"calls and hit {len(errors)} errors.")
+        return len(spec['instances']) + len(spec['buckets']) + len(spec['uploads'])
+    return _timed_runs(repeat, run)
+
+
+def bench_warm_pool(cloud, scale, workdir, repeat):
+    """Hand out instances from a filled warm pool; latency is each handout, relabel plus start."""
+    count = max(1, int(20 * scale))
+    spec = _instance_specs(1, 'pool')[0]
+    pool = warmpool.WarmPool(warmpool.PoolKey(PROJECT, spec['zone'], spec['machine_type'], spec['source_image']),
+                             min_size=count, max_size=count)
+    _expect('standby instances prepared', pool.replenish(max_in_flight=50), count)
+    latencies = []
+    for index in range(count):
+        start = time.perf_counter()
+        if not pool.acquire({'owner': f"user-{index}"}):
+            raise BenchmarkFailed(f"handout {index} returned no instance")
+        latencies.append(time.perf_counter() - start)
+        # Each handout must wake exactly one standby instance rather than create or discard any
+        _expect('standby instances left', pool.available(), count - index - 1)
+    return len(latencies), latencies
+
+
+# Modules that must import without loading any SDK, so each CLI subcommand starts fast
+LIGHT_MODULES = ('cli', 'gcp', 'uploads', 'fanout', 'jobs', 'inventory_cache', 'reconciler', 'loadbalancer',
+                 'spread', 'trans', 'sppechtotext', 'aio', 'warmpool')
+HEAVY_MODULES = ('google.cloud.compute_v1', 'google.cloud.storage', 'google.cloud.speech',
+                 'google.cloud.translate_v2', 'googleapiclient.discovery', 'googleapiclient.errors',
+                 'google.oauth2.service_account', 'grpc', 'numpy')
+_STARTUP_PROBE = (
+    "import json, sys\n"
+    "import {modules}\n"
+    "import cli\n"
+    "cli.build_parser()\n"
+    "print(json.dumps([name for name in {heavy!r} if name in sys.modules]))\n"
+)
+
+
+def bench_startup(cloud, scale, workdir, repeat):
+    """Start fresh interpreters that import the CLI and connectors; fails if any of them loads an SDK eagerly."""
+    probes = {'cli': 'cli', 'library': ', '.join(LIGHT_MODULES)}
+    root = os.path.dirname(os.path.abspath(__file__))
+
+    def run():
+        for name, modules in probes.items():
+            probe = subprocess.run(
+                [sys.executable, '-c', _STARTUP_PROBE.format(modules=modules, heavy=HEAVY_MODULES)],
+                cwd=root, capture_output=True, text=True)
+            if probe.returncode:
+                raise BenchmarkFailed(f"Importing {name} failed: {probe.stderr.strip().splitlines()[-1:]}")
+            eager = json.loads(probe.stdout)
+            if eager:
+                raise BenchmarkFailed(f"Importing {name} loaded {', '.join(eager)} eagerly")
+        return len(probes)
+    return _timed_runs(repeat, run)
+
+
+# name -> (benchmark, unit)
+BENCHMARKS = {
+    'provision': (bench_provision, 'instances'),
+    'terminate': (bench_terminate, 'instances'),
+    'list_instances': (bench_list_instances, 'records'),
+    'list_buckets': (bench_list_buckets, 'records'),
+    'fanout': (bench_fanout, 'records'),
+    'teardown': (bench_teardown, 'objects'),
+    'upload': (bench_upload, 'bytes'),
+    'upload_sync': (bench_upload_sync, 'files'),
+    'translate': (bench_translate, 'strings'),
+    'transcribe': (bench_transcribe, 'audio-s'),
+    'sheets': (bench_sheets, 'cells'),
+    'reconcile': (bench_reconcile, 'resources'),
+    'warm_pool': (bench_warm_pool, 'instances'),
+    'startup': (bench_startup, 'processes'),
+}
+
+
+def _reset_client_side():
+    """Give each benchmark a fresh quota guard and a fast-polling operation poller."""
+    ratelimit.guard = ratelimit.QuotaGuard(
+        rates={api: (1000.0, 1000) for api in fakegcp.APIS}, base_delay=0.01, max_delay=1.0)
+    poller = operations.get_poller(gcp.KEY_PATH)
+    poller.min_interval = 0.05
+    poller.max_interval = 0.5
+
+
+def run_benchmark(name, scale=1.0, repeat=3, error_rate=0.01, seed=0):
+    """
+    Run one benchmark against a fresh FakeCloud.
+
+    Latency is per item for provision, terminate and warm_pool, and per repetition otherwise.
+    Raises BenchmarkFailed if any unit of work failed or fewer completed than requested.
+
+    Args:
+        name (str): Key of BENCHMARKS.
+        scale (float): Multiplier for the workload size.
+        repeat (int): Repetitions for per-run benchmarks.
+        error_rate (float): Probability of an injected 503 on every fake API call.
+        seed (int): Seed for the fakes' latency spread and failures.
+
+    Returns:
+        BenchmarkResult: Throughput in units per second and p50/p99 latency in seconds.
+    """
+    bench, unit = BENCHMARKS[name]
+    _reset_client_side()
+    with tempfile.TemporaryDirectory() as workdir, \
+            fakegcp.FakeCloud(default_profiles(error_rate), operation_seconds=0.2, seed=seed) as cloud:
+        index = uploads.ContentIndex(os.path.join(workdir, 'content-index.db'))
+        uploads.set_index(index)
+        start = time.perf_counter()
+        units, latencies = bench(cloud, scale, workdir, repeat)
+        seconds = time.perf_counter() - start
+        index.close()
+    return BenchmarkResult(name, units, unit, seconds, units / seconds if seconds else 0.0,
+                           percentile(latencies, 0.5), percentile(latencies, 0.99))
+
+
+def compare(results, baseline, tolerance):
+    """
+    Find benchmarks that regressed against a baseline.
+
+    Args:
+        results (list): BenchmarkResult items.
+        baseline (dict): name -> {'throughput', 'p99'} from an earlier --output file.
+        tolerance (float): Allowed relative slowdown, e.g. 0.2 for 20%.
+
+    Returns:
+        list: Messages describing each regression.
+    """
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if not previous:
+            continue
+        if result.throughput < previous['throughput'] * (1 - tolerance):
+            regressions.append(f"{result.name}: throughput {result.throughput:.1f} {result.unit}/s "
+                               f"vs {previous['throughput']:.1f} baseline")
+        if previous.get('p99') and result.p99 and result.p99 > previous['p99'] * (1 + tolerance):
+            regressions.append(f"{result.name}: p99 {result.p99:.3f}s vs {previous['p99']:.3f}s baseline")
+    return regressions
+
+
+def missing_sdks():
+    """Return the pip packages the benchmarks need that are not installed."""
+    missing = []
+    for module, package in REQUIRED_SDKS.items():
+        try:
+            found = importlib.util.find_spec(module) is not None
+        except ImportError:
+            found = False
+        if not found:
+            missing.append(package)
+    return missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the portal against an in-process fake GCP backend.",
+        epilog="No credentials or network are needed, but the Google client libraries in "
+               "requirements.txt must be installed: the fakes only replace the API servers.")
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help=f"Benchmarks to run, from: {', '.join(BENCHMARKS)}; all by default.")
+    parser.add_argument('--scale', type=float, default=1.0, help="Workload size multiplier.")
+    parser.add_argument('--repeat', type=int, default=3, help="Repetitions for per-run benchmarks.")
+    parser.add_argument('--error-rate', type=float, default=0.01, help="Injected 503 rate on every API.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write results as JSON to this file.")
+    parser.add_argument('--baseline', help="JSON results to compare against; exit 1 on regression.")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative regression.")
+    parser.add_argument('--metrics', action='store_true', help="Print collected metrics at the end.")
+    parser.add_argument('--verbose', action='store_true', help="Log retries and failures while running.")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    logging.getLogger().setLevel(logging.WARNING if args.verbose else logging.ERROR)
+    missing = missing_sdks()
+    if missing:
+        print(f"The benchmarks need the Google client libraries; install {', '.join(missing)} "
+              f"(pip install -r requirements.txt).", file=sys.stderr)
+        return 2
+
+    results, failed = [], []
+    print(f"{'benchmark':<16}{'units':>12} {'unit':<10}{'seconds':>9}{'per second':>14}{'p50 s':>10}{'p99 s':>10}")
+    for name in args.benchmarks or list(BENCHMARKS):
+        try:
+            result = run_benchmark(name, args.scale, args.repeat, args.error_rate, args.seed)
+        except BenchmarkFailed as e:
+            failed.append(name)
+            print(f"{name:<16}FAILED: {e}")
+            continue
+        results.append(result)
+        print(f"{result.name:<16}{result.units:>12} {result.unit:<10}{result.seconds:>9.2f}"
+              f"{result.throughput:>14.1f}{result.p50 or 0:>10.3f}{result.p99 or 0:>10.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({result.name: result._asdict() for result in results}, f, indent=2)
+    if args.metrics:
+        print(metrics.render())
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+    return 1 if regressions or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
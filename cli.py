@@ -0,0 +1,403 @@
+import argparse
+import json
+import logging
+import sys
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Keep this module cheap to import: every connector and SDK is imported inside the
+# handler that needs it, so a subcommand only pays for what it uses.
+
+DEFAULT_MACHINE_TYPE = 'e2-micro'
+DEFAULT_IMAGE = 'projects/debian-cloud/global/images/family/debian-12'
+
+
+def _labels(pairs):
+    """Parse repeated key=value arguments into a dict."""
+    labels = {}
+    for pair in pairs or []:
+        key, sep, value = pair.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(f"expected key=value, got '{pair}'")
+        labels[key] = value
+    return labels
+
+
+def _params(pairs):
+    """Parse repeated key=value arguments, reading each value as JSON where it parses."""
+    params = {}
+    for key, value in _labels(pairs).items():
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+
+def _emit(record):
+    if hasattr(record, '_asdict'):
+        record = record._asdict()
+    print(json.dumps(record, default=str))
+
+
+def _emit_fanout(results):
+    """Print a fan-out stream, failures to stderr; return the exit status."""
+    failed = False
+    for result in results:
+        if result.error is not None:
+            failed = True
+            print(f"error: {result.target.project}/{result.target.zone or '-'}: {result.error}", file=sys.stderr)
+        else:
+            _emit(result.item)
+    return 1 if failed else 0
+
+
+def _emit_batch(results):
+    status = 0
+    for result in results:
+        _emit(result)
+        if not result['success']:
+            status = 1
+    return status
+
+
+def _projects(args):
+    """Return the --project values, or the current default project."""
+    import gcp
+
+    if not args.project:
+        return [gcp.current_target()[1]]
+    return [args.project] if isinstance(args.project, str) else args.project
+
+
+def instances_list(args):
+    import fanout
+
+    targets = fanout.targets(_projects(args), args.zone or [None])
+    return _emit_fanout(fanout.list_instances(
+        targets, status=args.status, labels=_labels(args.label), name_prefix=args.prefix))
+
+
+def instances_create(args):
+    import gcp
+
+    project = _projects(args)[0]
+    specs = [{'project': project, 'zone': args.zone, 'instance_name': name, 'machine_type': args.machine_type,
+              'source_image': args.image, 'labels': _labels(args.label)} for name in args.names]
+    return _emit_batch(gcp.create_instances(specs, max_in_flight=args.workers))
+
+
+def instances_terminate(args):
+    import gcp
+
+    project = _projects(args)[0]
+    targets = [{'project': project, 'zone': args.zone, 'instance_name': name} for name in args.names]
+    return _emit_batch(gcp.terminate_instances(targets, max_in_flight=args.workers))
+
+
+def buckets_list(args):
+    import fanout
+
+    return _emit_fanout(fanout.list_buckets(fanout.targets(_projects(args)), prefix=args.prefix,
+                                            labels=_labels(args.label)))
+
+
+def buckets_create(args):
+    import gcp
+
+    bucket = gcp.create_storage_bucket(args.name, location=args.location, storage_class=args.storage_class,
+                                       labels=_labels(args.label))
+    return 0 if bucket else 1
+
+
+def buckets_delete(args):
+    import gcp
+
+    deleted = gcp.delete_storage_bucket(args.name, dry_run=args.dry_run)
+    if deleted is None:
+        return 1
+    _emit({'bucket_name': args.name, 'objects': deleted, 'dry_run': args.dry_run})
+    return 0
+
+
+def upload(args):
+    import os
+
+    if os.path.isdir(args.path):
+        import uploads
+
+        result = uploads.upload_directory(args.bucket, args.path, prefix=args.prefix, sync=args.sync,
+                                          max_workers=args.workers)
+        _emit(result)
+        return 1 if result['failed'] else 0
+
+    import gcp
+
+    name = f"{args.prefix.rstrip('/')}/{os.path.basename(args.path)}" if args.prefix else None
+    return 0 if gcp.upload_file_to_storage(args.bucket, args.path, name, skip_unchanged=args.sync) else 1
+
+
+def lb_create(args):
+    import loadbalancer
+
+    _, errors = loadbalancer.create_load_balancer(_projects(args)[0], args.bucket, args.backend_bucket)
+    for node, error in errors.items():
+        print(f"error: {node}: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def lb_delete(args):
+    import loadbalancer
+
+    _, errors = loadbalancer.delete_load_balancer(_projects(args)[0], args.backend_bucket)
+    for node, error in errors.items():
+        print(f"error: {node}: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def _use_key_file(module, args):
+    """Point a connector that keeps its own SERVICE_ACCOUNT_FILE at --key-file, if one was given."""
+    if args.key_file:
+        module.SERVICE_ACCOUNT_FILE = args.key_file
+
+
+def sheets_read(args):
+    import spread
+
+    _use_key_file(spread, args)
+    values = spread.read_sheet(args.range)
+    if values is None:
+        return 1
+    for row in values:
+        _emit(row)
+    return 0
+
+
+def sheets_write(args):
+    import spread
+
+    _use_key_file(spread, args)
+    return 0 if spread.write_sheet(args.range, json.loads(args.values)) else 1
+
+
+def translate(args):
+    import trans
+
+    if bool(args.input) != bool(args.output):
+        print("error: --input and --output must be given together", file=sys.stderr)
+        return 2
+    _use_key_file(trans, args)
+    if args.input:
+        count = trans.translate_file(args.input, args.output, args.target, field=args.field)
+        logger.info(f"Translated {count} records into {args.output}.")
+        return 0
+    for text, translation in zip(args.texts, trans.translate_batch(args.texts, args.target)):
+        _emit({'text': text, 'translation': translation})
+    return 0
+
+
+def transcribe(args):
+    import sppechtotext
+
+    for path in args.files:
+        if args.bucket:
+            result = sppechtotext.transcribe_gcs_audio(path, args.bucket, language_code=args.language)
+        else:
+            result = sppechtotext.transcribe_long_audio(path, language_code=args.language)
+        _emit({'file': path, **result})
+    return 0
+
+
+def reconcile(args):
+    import reconciler
+
+    return reconciler.main(args.args)
+
+
+def jobs_submit(args):
+    import jobs
+
+    queue = jobs.JobQueue(args.db or jobs.DB_PATH)
+    print(queue.submit(args.type, **_params(args.params)))
+    return 0
+
+
+def jobs_status(args):
+    import jobs
+
+    queue = jobs.JobQueue(args.db or jobs.DB_PATH)
+    job = queue.wait(args.id, args.wait) if args.wait else queue.get(args.id)
+    if job is None:
+        print(f"error: no job {args.id}", file=sys.stderr)
+        return 1
+    _emit(job)
+    return 1 if job.state == jobs.FAILED else 0
+
+
+def jobs_list(args):
+    import jobs
+
+    for job in jobs.JobQueue(args.db or jobs.DB_PATH).list_jobs(state=args.state, limit=args.limit):
+        _emit(job)
+    return 0
+
+
+def jobs_worker(args):
+    import threading
+
+    import jobs
+
+    queue = jobs.JobQueue(args.db or jobs.DB_PATH, max_workers=args.workers, key_path=args.key_file).start()
+    logger.info("Job worker running; press Ctrl-C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        queue.close()
+    return 0
+
+
+def bench(args):
+    import benchmarks
+
+    return benchmarks.main(args.args)
+
+
+def build_parser():
+    """
+    Build the argument parser for every subcommand.
+
+    Returns:
+        ArgumentParser: The parser; each subcommand sets 'handler' to the function that runs it.
+    """
+    parser = argparse.ArgumentParser(prog='cloud-portal', description="Cloud portal connectors.")
+    parser.add_argument('--key-file', help="Service account key file; defaults to gcp.KEY_PATH, or to the "
+                                           "connector's SERVICE_ACCOUNT_FILE for sheets and translate. "
+                                           "transcribe always uses application default credentials.")
+    parser.add_argument('--verbose', action='store_true', help="Log progress to stderr.")
+    commands = parser.add_subparsers(dest='command', metavar='command', required=True)
+
+    def command(parent, name, handler, help):
+        sub = parent.add_parser(name, help=help, description=help)
+        sub.set_defaults(handler=handler)
+        return sub
+
+    def project_option(sub, multiple=False):
+        if multiple:
+            sub.add_argument('--project', action='append', help="GCP project ID; repeat to fan out.")
+        else:
+            sub.add_argument('--project', help="GCP project ID.")
+
+    instances = commands.add_parser('instances', help="Compute Engine instances.").add_subparsers(
+        dest='action', metavar='action', required=True)
+    sub = command(instances, 'list', instances_list, "List instances across projects and zones.")
+    project_option(sub, multiple=True)
+    sub.add_argument('--zone', action='append', help="Zone; repeat to fan out. All zones by default.")
+    sub.add_argument('--status', help="Only instances in this status, e.g. RUNNING.")
+    sub.add_argument('--label', action='append', metavar='KEY=VALUE', help="Only instances with this label.")
+    sub.add_argument('--prefix', help="Only instances whose name starts with this.")
+    for name, handler, help in (('create', instances_create, "Create instances."),
+                                ('terminate', instances_terminate, "Delete instances.")):
+        sub = command(instances, name, handler, help)
+        project_option(sub)
+        sub.add_argument('--zone', required=True)
+        sub.add_argument('names', nargs='+', metavar='name')
+        sub.add_argument('--workers', type=int, default=10, help="Operations in flight at once.")
+        if name == 'create':
+            sub.add_argument('--machine-type', default=DEFAULT_MACHINE_TYPE)
+            sub.add_argument('--image', default=DEFAULT_IMAGE, help="Source image.")
+            sub.add_argument('--label', action='append', metavar='KEY=VALUE')
+
+    buckets = commands.add_parser('buckets', help="Cloud Storage buckets.").add_subparsers(
+        dest='action', metavar='action', required=True)
+    sub = command(buckets, 'list', buckets_list, "List buckets across projects.")
+    project_option(sub, multiple=True)
+    sub.add_argument('--prefix', help="Only buckets whose name starts with this.")
+    sub.add_argument('--label', action='append', metavar='KEY=VALUE', help="Only buckets with this label.")
+    sub = command(buckets, 'create', buckets_create, "Create a bucket.")
+    sub.add_argument('name')
+    sub.add_argument('--location', default='US')
+    sub.add_argument('--storage-class', default='STANDARD')
+    sub.add_argument('--label', action='append', metavar='KEY=VALUE')
+    sub = command(buckets, 'delete', buckets_delete, "Delete a bucket and everything in it.")
+    sub.add_argument('name')
+    sub.add_argument('--dry-run', action='store_true', help="Only count the objects.")
+
+    sub = command(commands, 'upload', upload, "Upload a file or directory tree to a bucket.")
+    sub.add_argument('bucket')
+    sub.add_argument('path')
+    sub.add_argument('--prefix', default='', help="Object name prefix.")
+    sub.add_argument('--sync', action='store_true', help="Skip files the bucket already holds.")
+    sub.add_argument('--workers', type=int, default=8, help="Files uploaded at once.")
+
+    lb = commands.add_parser('lb', help="HTTP load balancers in front of buckets.").add_subparsers(
+        dest='action', metavar='action', required=True)
+    sub = command(lb, 'create', lb_create, "Create a CDN-enabled load balancer for a bucket.")
+    project_option(sub)
+    sub.add_argument('bucket')
+    sub.add_argument('backend_bucket')
+    sub = command(lb, 'delete', lb_delete, "Delete a load balancer.")
+    project_option(sub)
+    sub.add_argument('backend_bucket')
+
+    sheets = commands.add_parser('sheets', help="Google Sheets values.").add_subparsers(
+        dest='action', metavar='action', required=True)
+    sub = command(sheets, 'read', sheets_read, "Print the values of a range.")
+    sub.add_argument('range', help="A1 range, e.g. Sheet1!A1:C10.")
+    sub = command(sheets, 'write', sheets_write, "Write values to a range.")
+    sub.add_argument('range', help="A1 range, e.g. Sheet1!A1:C10.")
+    sub.add_argument('values', help="Rows as a JSON list of lists.")
+
+    sub = command(commands, 'translate', translate, "Translate strings or a JSONL/CSV file.")
+    sub.add_argument('target', help="Target language code, e.g. es.")
+    sub.add_argument('texts', nargs='*', metavar='text')
+    sub.add_argument('--input', help="JSONL or CSV file to translate instead of texts; needs --output.")
+    sub.add_argument('--output', help="File to write translated records to; needs --input.")
+    sub.add_argument('--field', default='text', help="Field of each record to translate.")
+
+    sub = command(commands, 'transcribe', transcribe, "Transcribe WAV files.")
+    sub.add_argument('files', nargs='+', metavar='file')
+    sub.add_argument('--language', default='en-US')
+    sub.add_argument('--bucket', help="Stage audio in this bucket and use long-running recognition.")
+
+    sub = command(commands, 'reconcile', reconcile, "Reconcile resources with a desired-state spec.")
+    sub.add_argument('args', nargs=argparse.REMAINDER, help="Arguments for the reconciler.")
+
+    job_commands = commands.add_parser('jobs', help="Background job queue.").add_subparsers(
+        dest='action', metavar='action', required=True)
+    sub = command(job_commands, 'submit', jobs_submit, "Queue a job and print its ID.")
+    sub.add_argument('type', help="Job type, e.g. create_instance.")
+    sub.add_argument('params', nargs='*', metavar='KEY=VALUE', help="Job arguments; values may be JSON.")
+    sub = command(job_commands, 'status', jobs_status, "Show a job.")
+    sub.add_argument('id')
+    sub.add_argument('--wait', type=float, help="Seconds to wait for the job to finish.")
+    sub = command(job_commands, 'list', jobs_list, "List recent jobs.")
+    sub.add_argument('--state')
+    sub.add_argument('--limit', type=int, default=50)
+    sub = command(job_commands, 'worker', jobs_worker, "Run queued jobs until interrupted.")
+    sub.add_argument('--workers', type=int, default=8)
+    for sub in job_commands.choices.values():
+        sub.add_argument('--db', help="Job database; defaults to jobs.DB_PATH.")
+
+    sub = command(commands, 'bench', bench, "Run the offline benchmarks.")
+    sub.add_argument('args', nargs=argparse.REMAINDER, help="Arguments for the benchmark runner.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    if not args.key_file:
+        return args.handler(args)
+
+    import gcp
+
+    with gcp.use_target(args.key_file):
+        return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+import atexit
+import hashlib
+import logging
+import os
+import threading
+import time
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DISCOVERY_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cloud-portal', 'discovery')
+# Discovery documents change rarely; refetch them once a day
+DISCOVERY_CACHE_TTL = 24 * 60 * 60
+
+
+class DiscoveryCache:
+    """
+    On-disk cache of API discovery documents, shared by every process on the machine.
+
+    Implements the get/set interface googleapiclient expects from a discovery cache,
+    so short-lived invocations build their discovery services from a local file
+    instead of fetching the document again.
+    """
+
+    def __init__(self, directory=DISCOVERY_CACHE_DIR, max_age=DISCOVERY_CACHE_TTL):
+        """
+        Args:
+            directory (str): Directory holding the cached documents.
+            max_age (float): Seconds a cached document is used before it is refetched.
+        """
+        self.directory = directory
+        self.max_age = max_age
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url):
+        path = self._path(url)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                return None
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, url, content):
+        path = self._path(url)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content if isinstance(content, str) else content.decode('utf-8'))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache discovery document for {url}: {e}")
+
+
+discovery_cache = DiscoveryCache()
+
+
+def _build_discovery(api, version, credentials):
+    from googleapiclient import discovery
+    return discovery.build(api, version, credentials=credentials, cache=discovery_cache, static_discovery=False)
+
+
+def _build_compute(credentials, project):
+    from google.cloud import compute_v1
+    return compute_v1.InstancesClient(credentials=credentials)
+
+
+def _build_zone_operations(credentials, project):
+    from google.cloud import compute_v1
+    return compute_v1.ZoneOperationsClient(credentials=credentials)
+
+
+def _build_region_operations(credentials, project):
+    from google.cloud import compute_v1
+    return compute_v1.RegionOperationsClient(credentials=credentials)
+
+
+def _build_global_operations(credentials, project):
+    from google.cloud import compute_v1
+    return compute_v1.GlobalOperationsClient(credentials=credentials)
+
+
+def _build_compute_discovery(credentials, project):
+    return _build_discovery('compute', 'v1', credentials)
+
+
+def _build_storage(credentials, project):
+    from google.cloud import storage
+    return storage.Client(credentials=credentials, project=project)
+
+
+def _build_storage_session(credentials, project):
+    from google.auth.transport.requests import AuthorizedSession
+    return AuthorizedSession(credentials)
+
+
+def _build_sheets(credentials, project):
+    return _build_discovery('sheets', 'v4', credentials)
+
+
+def _build_translate(credentials, project):
+    from google.cloud import translate_v2 as translate
+    return translate.Client(credentials=credentials)
+
+
+def _build_speech(credentials, project):
+    from google.cloud import speech
+    return speech.SpeechClient(credentials=credentials)
+
+
+# Client kinds the registry knows how to construct
+BUILDERS = {
+    'compute': _build_compute,
+    'zone_operations': _build_zone_operations,
+    'region_operations': _build_region_operations,
+    'global_operations': _build_global_operations,
+    'compute_discovery': _build_compute_discovery,
+    'storage': _build_storage,
+    'storage_session': _build_storage_session,
+    'sheets': _build_sheets,
+    'translate': _build_translate,
+    'speech': _build_speech,
+}
+
+
+def _close_client(client):
+    """
+    Release the transport held by a client, whichever shape it has.
+
+    Args:
+        client: Any client built by the registry.
+    """
+    close = getattr(client, 'close', None)
+    if close is None:
+        transport = getattr(client, 'transport', None)
+        close = getattr(transport, 'close', None)
+    if close is not None:
+        close()
+
+
+class ClientRegistry:
+    """
+    Process-wide, thread-safe cache of credentials and API clients.
+
+    Clients are keyed by (kind, credentials source, project, scopes) and are
+    built lazily on first use, so every caller in the process shares the same
+    gRPC channel / HTTP session and token instead of paying for new ones.
+    A credentials source is a path to a service account key file, or None for
+    Application Default Credentials.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._credentials = {}
+        self._clients = {}
+        self._overrides = {}
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def credentials(self, source=None, scopes=None):
+        """
+        Return cached credentials for a source, refreshing the token if it has expired.
+
+        Args:
+            source (str): Path to a service account key file, or None for ADC.
+            scopes (list): OAuth scopes to request.
+
+        Returns:
+            Credentials: The shared credentials object.
+        """
+        scopes = tuple(sorted(scopes)) if scopes else ()
+        key = ('credentials', source, scopes)
+        with self._key_lock(key):
+            credentials = self._credentials.get(key)
+            if credentials is None:
+                if source:
+                    if not os.path.exists(source):
+                        raise FileNotFoundError(f"Service account key file not found at: {source}")
+                    from google.oauth2 import service_account
+                    credentials = service_account.Credentials.from_service_account_file(
+                        source, scopes=list(scopes) or None)
+                else:
+                    import google.auth
+                    credentials, _ = google.auth.default(scopes=list(scopes) or None)
+                self._credentials[key] = credentials
+                logger.info(f"Loaded credentials from {source or 'application default credentials'}.")
+            if not credentials.valid and getattr(credentials, 'token', None):
+                from google.auth.transport.requests import Request
+                credentials.refresh(Request())
+            return credentials
+
+    def override(self, kind, client):
+        """
+        Serve a fixed client for a kind, whatever the source or project, e.g. an in-process fake.
+
+        Args:
+            kind (str): Client kind, one of BUILDERS.
+            client: The client to return, or None to remove the override.
+        """
+        if kind not in BUILDERS:
+            raise ValueError(f"Unknown client kind: {kind}")
+        with self._lock:
+            if client is None:
+                self._overrides.pop(kind, None)
+            else:
+                self._overrides[kind] = client
+
+    def get(self, kind, source=None, project=None, scopes=None):
+        """
+        Return a shared client, building it on first use.
+
+        Args:
+            kind (str): Client kind, one of BUILDERS.
+            source (str): Path to a service account key file, or None for ADC.
+            project (str): GCP project ID the client is bound to.
+            scopes (list): OAuth scopes to request.
+
+        Returns:
+            The cached client instance.
+        """
+        if kind not in BUILDERS:
+            raise ValueError(f"Unknown client kind: {kind}")
+        override = self._overrides.get(kind)
+        if override is not None:
+            return override
+        key = (kind, source, project, tuple(sorted(scopes)) if scopes else ())
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._key_lock(key):
+            client = self._clients.get(key)
+            if client is None:
+                credentials = self.credentials(source, scopes)
+                client = BUILDERS[kind](credentials, project)
+                self._clients[key] = client
+                logger.info(f"Initialized {kind} client for project {project}.")
+            return client
+
+    def close(self):
+        """Close every cached client and forget all cached credentials."""
+        with self._lock:
+            clients = list(self._clients.items())
+            self._clients.clear()
+            self._credentials.clear()
+            self._key_locks.clear()
+        for key, client in clients:
+            try:
+                _close_client(client)
+            except Exception as e:
+                logger.error(f"Failed to close {key[0]} client: {e}")
+
+
+registry = ClientRegistry()
+atexit.register(registry.close)
+
+
+def get_client(kind, source=None, project=None, scopes=None):
+    """
+    Return a shared client from the process-wide registry.
+
+    Args:
+        kind (str): Client kind, e.g. 'compute', 'storage', 'sheets'.
+        source (str): Path to a service account key file, or None for ADC.
+        project (str): GCP project ID.
+        scopes (list): OAuth scopes to request.
+
+    Returns:
+        The cached client instance.
+    """
+    return registry.get(kind, source=source, project=project, scopes=scopes)
+
+
+def close():
+    """Close all clients held by the process-wide registry."""
+    registry.close()
@@ -0,0 +1,81 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class DependencyFailed(Exception):
+    """Recorded for a task that was skipped because a dependency failed."""
+
+
+def reverse_dependencies(dependencies):
+    """
+    Invert a dependency map, e.g. to tear a graph down in reverse order.
+
+    Args:
+        dependencies (dict): Task name -> names of the tasks it depends on.
+
+    Returns:
+        dict: Task name -> names of the tasks that depend on it.
+    """
+    reverse = {name: [] for name in dependencies}
+    for name, deps in dependencies.items():
+        for dep in deps:
+            reverse.setdefault(dep, []).append(name)
+    return reverse
+
+
+def run_dag(tasks, dependencies, max_workers=8):
+    """
+    Run tasks concurrently, each as soon as all of its dependencies have succeeded.
+
+    A failed task does not stop independent branches; tasks that depend on it are
+    skipped and reported with DependencyFailed.
+
+    Args:
+        tasks (dict): Task name -> callable(results), where results maps the names of
+            finished tasks to their return values.
+        dependencies (dict): Task name -> names of the tasks it depends on.
+        max_workers (int): Tasks run at once.
+
+    Returns:
+        tuple: (results, errors) dicts keyed by task name.
+    """
+    remaining = {name: set(dependencies.get(name, ())) for name in tasks}
+    unknown = {dep for deps in remaining.values() for dep in deps if dep not in tasks}
+    if unknown:
+        raise ValueError(f"Unknown dependencies: {sorted(unknown)}")
+
+    results = {}
+    errors = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while remaining or running:
+            skipped = True
+            while skipped:
+                skipped = [name for name, deps in remaining.items() if deps & errors.keys()]
+                for name in skipped:
+                    failed = sorted(remaining.pop(name) & errors.keys())
+                    errors[name] = DependencyFailed(f"Skipped {name}: dependency {', '.join(failed)} failed")
+                    logger.error(str(errors[name]))
+            for name in [name for name, deps in remaining.items() if deps <= results.keys()]:
+                del remaining[name]
+                running[pool.submit(tasks[name], dict(results))] = name
+
+            if not running:
+                if remaining:
+                    raise ValueError(f"Dependency cycle among: {sorted(remaining)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.error(f"Task {name} failed: {e}")
+                    errors[name] = e
+
+    return results, errors
@@ -0,0 +1,834 @@
+import base64
+import collections
+import contextlib
+import datetime
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from types import SimpleNamespace
+
+import clients
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+APIS = ('compute', 'storage', 'sheets', 'translate', 'speech')
+
+# Registry client kinds served by each FakeCloud attribute
+CLIENT_KINDS = {
+    'compute': 'compute',
+    'zone_operations': 'operations',
+    'region_operations': 'operations',
+    'global_operations': 'operations',
+    'storage': 'storage',
+    'storage_session': 'storage_session',
+    'sheets': 'sheets',
+    'translate': 'translate',
+    'speech': 'speech',
+}
+
+# Operation durations relative to operation_seconds. Waking a stopped or suspended VM
+# is much quicker than building one, and relabeling is nearly instant.
+OPERATION_WEIGHTS = {
+    'insert': 1.0,
+    'delete': 1.0,
+    'setLabels': 0.1,
+    'start': 0.3,
+    'stop': 0.5,
+    'suspend': 0.5,
+    'resume': 0.15,
+}
+
+# Power-state transitions: action -> (status while running, status when done, statuses it applies to)
+_POWER_TRANSITIONS = {
+    'start': ('STAGING', 'RUNNING', ('TERMINATED',)),
+    'stop': ('STOPPING', 'TERMINATED', ('RUNNING',)),
+    'suspend': ('SUSPENDING', 'SUSPENDED', ('RUNNING',)),
+    'resume': ('STAGING', 'RUNNING', ('SUSPENDED',)),
+}
+
+_FILTER_TERM = re.compile(r"\((\S+) eq '((?:[^'\\]|\\.)*)'\)")
+_CONTENT_RANGE = re.compile(r"bytes (?:\*|(\d+)-(\d+))/(\*|\d+)")
+_A1_RANGE = re.compile(r"^(?:(?P<sheet>'(?:[^']|'')+'|[^!]+)!)?(?P<c1>[A-Za-z]+)(?P<r1>\d*)"
+                       r"(?::(?P<c2>[A-Za-z]+)(?P<r2>\d*))?$")
+
+
+def _api_error(code, message):
+    from google.api_core import exceptions
+    return exceptions.from_http_status(code, message)
+
+
+class Profile:
+    """
+    Behaviour of one fake API: latency, injected failures and a quota.
+
+    Every call sleeps latency (log-normally spread by jitter) plus per_unit seconds
+    for each unit of work it carries (bytes uploaded, characters translated, seconds
+    of audio), fails with a 503 at error_rate, and gets a 429 once calls exceed rate.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate=None, burst=None, per_unit=0.0):
+        """
+        Args:
+            latency (float): Median seconds per call.
+            jitter (float): Sigma of the log-normal latency spread; 0 for fixed latency.
+            error_rate (float): Probability that a call fails with a 503.
+            rate (float): Calls per second allowed before answering 429, or None for no quota.
+            burst (int): Calls allowed in a burst; defaults to rate.
+            per_unit (float): Extra seconds per unit of work in a call.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate = rate
+        self.burst = burst or max(1, int(rate or 1))
+        self.per_unit = per_unit
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """Take a quota token; False once the quota is exhausted."""
+        if self.rate is None:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class FakeCloud:
+    """
+    In-process stand-in for the Compute, Cloud Storage, Sheets, Translate and Speech APIs.
+
+    install() makes the process-wide client registry hand out these fakes instead of
+    real clients, so the portal's own code runs unchanged without network access or
+    credentials. State lives in memory; calls and injected failures are counted per
+    (api, method). The discovery-based Compute client used for load balancers is not faked.
+    """
+
+    def __init__(self, profiles=None, operation_seconds=0.2, operation_error_rate=0.0, seed=0):
+        """
+        Args:
+            profiles (dict): API name -> Profile; APIs left out have no latency, errors or quota.
+            operation_seconds (float): Median time for an instance insert to finish; other
+                operations are scaled by OPERATION_WEIGHTS.
+            operation_error_rate (float): Probability that a Compute operation finishes with an error.
+            seed (int): Seed for latency spread and failure injection.
+        """
+        self.profiles = {api: Profile() for api in APIS}
+        self.profiles.update(profiles or {})
+        self.operation_seconds = operation_seconds
+        self.operation_error_rate = operation_error_rate
+        self.calls = collections.Counter()
+        self.failures = collections.Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.compute = FakeInstancesClient(self)
+        self.operations = FakeOperationsClient(self)
+        self.storage = FakeStorageClient(self)
+        self.storage_session = FakeUploadSession(self)
+        self.sheets = FakeSheetsService(self)
+        self.translate = FakeTranslateClient(self)
+        self.speech = FakeSpeechClient(self)
+
+    def random(self):
+        with self._lock:
+            return self._random.random()
+
+    def spread(self, sigma):
+        """Return a log-normal latency multiplier with median 1."""
+        if not sigma:
+            return 1.0
+        with self._lock:
+            return self._random.lognormvariate(0.0, sigma)
+
+    def call(self, api, method, units=0):
+        """
+        Charge one API call: count it, enforce the quota, wait out its latency and maybe fail.
+
+        Args:
+            api (str): API name.
+            method (str): Method name, for the call counters.
+            units (float): Units of work carried by the call.
+        """
+        profile = self.profiles[api]
+        with self._lock:
+            self.calls[(api, method)] += 1
+        if not profile.admit():
+            with self._lock:
+                self.failures[(api, method, 429)] += 1
+            raise _api_error(429, f"Quota exceeded for {api} {method}")
+        delay = profile.latency * self.spread(profile.jitter) + profile.per_unit * units
+        if delay > 0:
+            time.sleep(delay)
+        if profile.error_rate and self.random() < profile.error_rate:
+            with self._lock:
+                self.failures[(api, method, 503)] += 1
+            raise _api_error(503, f"Injected failure in {api} {method}")
+
+    def install(self):
+        """Serve these fakes from the process-wide client registry."""
+        for kind, attribute in CLIENT_KINDS.items():
+            clients.registry.override(kind, getattr(self, attribute))
+        return self
+
+    def uninstall(self):
+        """Go back to building real clients."""
+        for kind in CLIENT_KINDS:
+            clients.registry.override(kind, None)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.uninstall()
+
+
+def _matches_filter(instance, instance_filter):
+    """Evaluate the (field eq 'regex') terms produced by gcp.build_instance_filter()."""
+    for field, pattern in _FILTER_TERM.findall(instance_filter or ''):
+        if field.startswith('labels.'):
+            value = instance.labels.get(field[len('labels.'):])
+        else:
+            value = getattr(instance, field, None)
+        if value is None or not re.fullmatch(pattern, str(value)):
+            return False
+    return True
+
+
+class FakeInstancesClient:
+    """Compute Engine instances, mutated through operations that finish after a delay."""
+
+    def __init__(self, cloud):
+        self.cloud = cloud
+        self._zones = collections.defaultdict(dict)  # (project, zone) -> {name: Instance}
+        self._requests = {}  # request_id -> Operation, so retried inserts and deletes are idempotent
+        self._lock = threading.Lock()
+
+    def seed(self, project, zone, names, status='RUNNING', machine_type='n1-standard-1', labels=None):
+        """Add instances directly, without calls or operations."""
+        from google.cloud import compute_v1
+
+        with self._lock:
+            instances = self._zones[(project, zone)]
+            for index, name in enumerate(names):
+                instances[name] = compute_v1.Instance(
+                    name=name,
+                    zone=f"https://www.googleapis.com/compute/v1/projects/{project}/zones/{zone}",
+                    status=status,
+                    machine_type=f"zones/{zone}/machineTypes/{machine_type}",
+                    labels=labels or {},
+                    network_interfaces=[compute_v1.NetworkInterface(
+                        network_i_p=f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}",
+                        access_configs=[compute_v1.AccessConfig(name="External NAT")],
+                    )],
+                )
+
+    def insert(self, request):
+        with self._lock:
+            if request.request_id and request.request_id in self._requests:
+                return self._requests[request.request_id]
+        self.cloud.call('compute', 'instances.insert')
+        instance = request.instance_resource
+        instance.zone = f"https://www.googleapis.com/compute/v1/projects/{request.project}/zones/{request.zone}"
+        instance.status = 'PROVISIONING'
+        with self._lock:
+            instances = self._zones[(request.project, request.zone)]
+            if instance.name in instances:
+                raise _api_error(409, f"The resource '{instance.name}' already exists")
+            instances[instance.name] = instance
+
+        def finish(failed):
+            with self._lock:
+                if failed:
+                    instances.pop(instance.name, None)
+                else:
+                    instance.status = 'RUNNING'
+        operation = self.cloud.operations.start(request.zone, 'insert', finish)
+        if request.request_id:
+            with self._lock:
+                self._requests[request.request_id] = operation
+        return operation
+
+    def delete(self, request):
+        with self._lock:
+            if request.request_id and request.request_id in self._requests:
+                return self._requests[request.request_id]
+        self.cloud.call('compute', 'instances.delete')
+        with self._lock:
+            instances = self._zones[(request.project, request.zone)]
+            instance = instances.get(request.instance)
+            if instance is None:
+                raise _api_error(404, f"The resource '{request.instance}' was not found")
+            instance.status = 'STOPPING'
+
+        def finish(failed):
+            with self._lock:
+                if failed:
+                    instance.status = 'RUNNING'
+                else:
+                    instances.pop(request.instance, None)
+        operation = self.cloud.operations.start(request.zone, 'delete', finish)
+        if request.request_id:
+            with self._lock:
+                self._requests[request.request_id] = operation
+        return operation
+
+    def get(self, project, zone, instance, **kwargs):
+        self.cloud.call('compute', 'instances.get')
+        with self._lock:
+            found = self._zones.get((project, zone), {}).get(instance)
+        if found is None:
+            raise _api_error(404, f"The resource '{instance}' was not found")
+        return found
+
+    def set_labels(self, request):
+        self.cloud.call('compute', 'instances.setLabels')
+        with self._lock:
+            instance = self._zones.get((request.project, request.zone), {}).get(request.instance)
+            if instance is None:
+                raise _api_error(404, f"The resource '{request.instance}' was not found")
+            instance.labels = dict(request.instances_set_labels_request_resource.labels)
+        return self.cloud.operations.start(request.zone, 'setLabels')
+
+    def _change_power_state(self, request, action):
+        with self._lock:
+            if request.request_id and request.request_id in self._requests:
+                return self._requests[request.request_id]
+        self.cloud.call('compute', f'instances.{action}')
+        transient, final, allowed = _POWER_TRANSITIONS[action]
+        with self._lock:
+            instance = self._zones.get((request.project, request.zone), {}).get(request.instance)
+            if instance is None:
+                raise _api_error(404, f"The resource '{request.instance}' was not found")
+            if instance.status not in allowed:
+                raise _api_error(400, f"Cannot {action} instance '{request.instance}' in status {instance.status}")
+            previous, instance.status = instance.status, transient
+
+        def finish(failed):
+            with self._lock:
+                instance.status = previous if failed else final
+        operation = self.cloud.operations.start(request.zone, action, finish)
+        if request.request_id:
+            with self._lock:
+                self._requests[request.request_id] = operation
+        return operation
+
+    def start(self, request):
+        return self._change_power_state(request, 'start')
+
+    def stop(self, request):
+        return self._change_power_state(request, 'stop')
+
+    def suspend(self, request):
+        return self._change_power_state(request, 'suspend')
+
+    def resume(self, request):
+        return self._change_power_state(request, 'resume')
+
+    def _page(self, keyed, instance_filter, max_results, page_token):
+        """Return one page of (key, instance) pairs sorted by key, and the next page token."""
+        keys = sorted(key for key, instance in keyed.items() if _matches_filter(instance, instance_filter))
+        start = bisect_right(keys, page_token) if page_token else 0
+        page_keys = keys[start:start + (max_results or 500)]
+        more = start + len(page_keys) < len(keys)
+        return [(key, keyed[key]) for key in page_keys], (page_keys[-1] if more else '')
+
+    def list(self, request):
+        self.cloud.call('compute', 'instances.list')
+        with self._lock:
+            keyed = dict(self._zones.get((request.project, request.zone), {}))
+        page, token = self._page(keyed, request.filter, request.max_results, request.page_token)
+        return SimpleNamespace(items=[instance for _, instance in page], next_page_token=token)
+
+    def aggregated_list(self, request):
+        self.cloud.call('compute', 'instances.aggregatedList')
+        with self._lock:
+            keyed = {f"{zone}/{name}": instance
+                     for (project, zone), instances in self._zones.items() if project == request.project
+                     for name, instance in instances.items()}
+        page, token = self._page(keyed, request.filter, request.max_results, request.page_token)
+        items = collections.defaultdict(list)
+        for key, instance in page:
+            items[f"zones/{key.split('/', 1)[0]}"].append(instance)
+        return SimpleNamespace(
+            items={scope: SimpleNamespace(instances=instances) for scope, instances in items.items()},
+            next_page_token=token)
+
+
+class FakeOperationsClient:
+    """Zone, region and global operations; each finishes about operation_seconds after it starts."""
+
+    def __init__(self, cloud):
+        self.cloud = cloud
+        self._operations = {}  # name -> [done_at, on_done(failed), failed]
+        self._lock = threading.Lock()
+
+    def start(self, zone, operation_type, on_done=None):
+        """Register a new running operation and return it."""
+        from google.cloud import compute_v1
+
+        name = f"operation-{uuid.uuid4().hex}"
+        done_at = time.monotonic() + self.cloud.operation_seconds * OPERATION_WEIGHTS.get(
+            operation_type, 1.0) * self.cloud.spread(self.cloud.profiles['compute'].jitter)
+        failed = bool(self.cloud.operation_error_rate) and self.cloud.random() < self.cloud.operation_error_rate
+        with self._lock:
+            self._operations[name] = [done_at, on_done, failed]
+        return compute_v1.Operation(name=name, zone=zone or '', operation_type=operation_type,
+                                    status=compute_v1.Operation.Status.RUNNING)
+
+    def get(self, project, operation, zone=None, region=None):
+        from google.cloud import compute_v1
+
+        self.cloud.call('compute', 'operations.get')
+        with self._lock:
+            entry = self._operations.get(operation)
+            if entry is None:
+                raise _api_error(404, f"The resource '{operation}' was not found")
+            done_at, on_done, failed = entry
+            done = time.monotonic() >= done_at
+            entry[1] = None if done else on_done
+        if not done:
+            return compute_v1.Operation(name=operation, status=compute_v1.Operation.Status.RUNNING)
+        if on_done is not None:
+            on_done(failed)
+        result = compute_v1.Operation(name=operation, status=compute_v1.Operation.Status.DONE)
+        if failed:
+            result.error = compute_v1.Error(errors=[compute_v1.Errors(
+                code='ZONE_RESOURCE_POOL_EXHAUSTED', message="Injected operation failure")])
+        return result
+
+
+def _checksums(content):
+    """Return the base64 MD5 and CRC32C of object content, as object metadata encodes them."""
+    import google_crc32c
+
+    md5_hash = base64.b64encode(hashlib.md5(content).digest()).decode('ascii')
+    crc32c = base64.b64encode(google_crc32c.Checksum(content).digest()).decode('ascii')
+    return md5_hash, crc32c
+
+
+class _BucketData:
+    """Objects of one fake bucket, with a lazily rebuilt sorted name index for listings."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.objects = {}  # name -> (size, md5_hash, crc32c, content or None)
+        self._names = []
+        self._stale = False
+
+    def put(self, name, entry):
+        if name not in self.objects:
+            self._stale = True
+        self.objects[name] = entry
+
+    def names(self):
+        # Deletions leave names in the index; listings skip them until the next rebuild
+        if self._stale or len(self._names) > 2 * len(self.objects) + 1000:
+            self._names = sorted(self.objects)
+            self._stale = False
+        return self._names
+
+    def page(self, prefix, page_size, page_token):
+        names = self.names()
+        start = bisect_right(names, page_token) if page_token else bisect_left(names, prefix or '')
+        page = []
+        for name in names[start:]:
+            if prefix and not name.startswith(prefix):
+                break
+            if name not in self.objects:
+                continue
+            if len(page) == page_size:
+                return page, page[-1]
+            page.append(name)
+        return page, ''
+
+
+class FakeBlob:
+    def __init__(self, storage, bucket_name, name, size=None, md5_hash=None, crc32c=None):
+        self._storage = storage
+        self.bucket_name = bucket_name
+        self.name = name
+        self.size = size
+        self.md5_hash = md5_hash
+        self.crc32c = crc32c
+
+    def create_resumable_upload_session(self, size=None, **kwargs):
+        self._storage.cloud.call('storage', 'objects.resumableUpload')
+        return self._storage.cloud.storage_session.open(self.bucket_name, self.name, size)
+
+    def compose(self, sources, **kwargs):
+        self._storage.cloud.call('storage', 'objects.compose')
+        data = self._storage.bucket_data(self.bucket_name)
+        with self._storage.lock:
+            missing = [source.name for source in sources if source.name not in data.objects]
+            if missing:
+                raise _api_error(404, f"Compose sources not found: {missing}")
+            contents = [data.objects[source.name][3] for source in sources]
+            if any(content is None for content in contents):
+                size = sum(data.objects[source.name][0] for source in sources)
+                data.put(self.name, (size, None, None, None))
+            else:
+                # Composite objects carry a CRC32C but no MD5
+                content = b''.join(contents)
+                size = len(content)
+                data.put(self.name, (size, None, _checksums(content)[1], content))
+        self.size = size
+
+    def delete(self, **kwargs):
+        self._storage.delete_object(self.bucket_name, self.name)
+
+
+class FakeBucket:
+    def __init__(self, storage, name, location='US', storage_class='STANDARD', labels=None):
+        self._storage = storage
+        self.name = name
+        self.location = location
+        self.storage_class = storage_class
+        self.labels = labels or {}
+        self.time_created = datetime.datetime.now(datetime.timezone.utc)
+
+    def blob(self, name):
+        return FakeBlob(self._storage, self.name, name)
+
+    def get_blob(self, name, **kwargs):
+        self._storage.cloud.call('storage', 'objects.get')
+        with self._storage.lock:
+            stored = self._storage.bucket_data(self.name).objects.get(name)
+        return FakeBlob(self._storage, self.name, name, *stored[:3]) if stored is not None else None
+
+    def delete_blob(self, name, **kwargs):
+        self._storage.delete_object(self.name, name)
+
+    def patch(self, **kwargs):
+        self._storage.cloud.call('storage', 'buckets.patch')
+        with self._storage.lock:
+            stored = self._storage.bucket_data(self.name).bucket
+            stored.storage_class = self.storage_class
+            stored.labels = dict(self.labels)
+
+    def delete(self, **kwargs):
+        self._storage.cloud.call('storage', 'buckets.delete')
+        with self._storage.lock:
+            data = self._storage.buckets.get(self.name)
+            if data is None:
+                raise _api_error(404, f"Bucket {self.name} not found")
+            if data.objects:
+                raise _api_error(409, f"Bucket {self.name} is not empty")
+            del self._storage.buckets[self.name]
+
+
+class FakeStorageClient:
+    """Cloud Storage buckets and objects, including batch requests."""
+
+    def __init__(self, cloud):
+        self.cloud = cloud
+        self.buckets = {}  # name -> _BucketData
+        self.lock = threading.Lock()
+        self._local = threading.local()
+
+    def seed(self, bucket_name, names, size=0):
+        """Create a bucket if needed and add empty-content objects directly, without calls."""
+        with self.lock:
+            data = self.buckets.get(bucket_name)
+            if data is None:
+                data = self.buckets[bucket_name] = _BucketData(FakeBucket(self, bucket_name))
+            for name in names:
+                data.put(name, (size, None, None, None))
+
+    def bucket_data(self, bucket_name):
+        data = self.buckets.get(bucket_name)
+        if data is None:
+            raise _api_error(404, f"Bucket {bucket_name} not found")
+        return data
+
+    def store_object(self, bucket_name, name, content):
+        md5_hash, crc32c = _checksums(content)
+        with self.lock:
+            self.bucket_data(bucket_name).put(name, (len(content), md5_hash, crc32c, content))
+
+    def delete_object(self, bucket_name, name):
+        deferred = getattr(self._local, 'batch', None)
+        if deferred is not None:
+            deferred.append((bucket_name, name))
+            return
+        self.cloud.call('storage', 'objects.delete')
+        self._remove(bucket_name, name)
+
+    def _remove(self, bucket_name, name):
+        with self.lock:
+            if self.bucket_data(bucket_name).objects.pop(name, None) is None:
+                raise _api_error(404, f"No such object: {bucket_name}/{name}")
+
+    @contextlib.contextmanager
+    def batch(self):
+        deferred = self._local.batch = []
+        try:
+            yield
+        finally:
+            self._local.batch = None
+        self.cloud.call('storage', 'batch', units=len(deferred))
+        errors = []
+        for bucket_name, name in deferred:
+            try:
+                self._remove(bucket_name, name)
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def bucket(self, bucket_name):
+        data = self.buckets.get(bucket_name)
+        return data.bucket if data is not None else FakeBucket(self, bucket_name)
+
+    def get_bucket(self, bucket_name, **kwargs):
+        self.cloud.call('storage', 'buckets.get')
+        with self.lock:
+            return self.bucket_data(bucket_name).bucket
+
+    def create_bucket(self, bucket, location='US', **kwargs):
+        self.cloud.call('storage', 'buckets.insert')
+        bucket = self.bucket(bucket) if isinstance(bucket, str) else bucket
+        with self.lock:
+            if bucket.name in self.buckets:
+                raise _api_error(409, f"Bucket {bucket.name} already exists")
+            bucket.location = location
+            self.buckets[bucket.name] = _BucketData(bucket)
+        return bucket
+
+    def list_buckets(self, prefix=None, page_size=1000, page_token=None, **kwargs):
+        self.cloud.call('storage', 'buckets.list')
+        with self.lock:
+            names = sorted(name for name in self.buckets if not prefix or name.startswith(prefix))
+            start = bisect_right(names, page_token) if page_token else 0
+            page = [self.buckets[name].bucket for name in names[start:start + page_size]]
+        token = page[-1].name if page and start + len(page) < len(names) else None
+        return SimpleNamespace(pages=iter([page]), next_page_token=token)
+
+    def list_blobs(self, bucket_or_name, prefix=None, page_size=1000, page_token=None, **kwargs):
+        self.cloud.call('storage', 'objects.list')
+        bucket_name = getattr(bucket_or_name, 'name', bucket_or_name)
+        with self.lock:
+            data = self.bucket_data(bucket_name)
+            names, token = data.page(prefix, page_size, page_token)
+            page = [FakeBlob(self, bucket_name, name, *data.objects[name][:3]) for name in names]
+        return SimpleNamespace(pages=iter([page]), next_page_token=token or None)
+
+
+class FakeUploadSession:
+    """
+    Resumable upload sessions, speaking the Content-Range protocol of the JSON API.
+
+    Stands in for the authorized HTTP session uploads.py PUTs chunks through; the
+    storage profile's per_unit applies per byte.
+    """
+
+    def __init__(self, cloud):
+        self.cloud = cloud
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def open(self, bucket_name, name, size):
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[upload_id] = {
+                'bucket': bucket_name, 'name': name, 'size': size,
+                'content': bytearray(), 'done': False,
+            }
+        return f"https://storage.fake/upload/{bucket_name}?upload_id={upload_id}"
+
+    @staticmethod
+    def _response(status_code, received=0):
+        headers = {'Range': f"bytes=0-{received - 1}"} if status_code == 308 and received else {}
+        return SimpleNamespace(status_code=status_code, headers=headers, text='')
+
+    def put(self, url, data=None, headers=None, **kwargs):
+        data = data or b''
+        try:
+            self.cloud.call('storage', 'objects.upload', units=len(data))
+        except Exception as e:
+            return self._response(getattr(e, 'code', 500))
+        match = _CONTENT_RANGE.fullmatch((headers or {}).get('Content-Range', ''))
+        with self._lock:
+            session = self._sessions.get(url.rsplit('upload_id=', 1)[-1])
+            if session is None or match is None:
+                return self._response(404 if session is None else 400)
+            if session['done']:
+                return self._response(200)
+            first, last, total = match.groups()
+            if first is not None:
+                first, last = int(first), int(last)
+                received = len(session['content'])
+                if first > received or last - first + 1 != len(data):
+                    return self._response(400)
+                session['content'] += data[received - first:]
+            received = len(session['content'])
+            if total == '*' or received < int(total):
+                return self._response(308, received)
+            session['done'] = True
+            content, session['content'] = bytes(session['content']), None
+        self.cloud.storage.store_object(session['bucket'], session['name'], content)
+        return self._response(200)
+
+    def close(self):
+        pass
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+class _FakeRequest:
+    """A googleapiclient-style request: nothing happens until execute()."""
+
+    def __init__(self, cloud, method_id, run):
+        self.cloud = cloud
+        self.methodId = method_id
+        self._run = run
+
+    def execute(self, **kwargs):
+        self.cloud.call('sheets', self.methodId)
+        return self._run()
+
+
+class FakeSheetsService:
+    """Sheets v4 values API: get, update, batchGet and batchUpdate."""
+
+    def __init__(self, cloud):
+        self.cloud = cloud
+        self._sheets = collections.defaultdict(dict)  # (spreadsheet, sheet) -> {(row, col): value}
+        self._lock = threading.Lock()
+
+    def spreadsheets(self):
+        return SimpleNamespace(values=lambda: SimpleNamespace(
+            get=lambda spreadsheetId, range, **kwargs: _FakeRequest(
+                self.cloud, 'sheets.spreadsheets.values.get',
+                lambda: self._read(spreadsheetId, range, kwargs.get('valueRenderOption'))),
+            update=lambda spreadsheetId, range, body, **kwargs: _FakeRequest(
+                self.cloud, 'sheets.spreadsheets.values.update',
+                lambda: {'updatedCells': self._write(spreadsheetId, range, body.get('values', []))}),
+            batchGet=lambda spreadsheetId, ranges, **kwargs: _FakeRequest(
+                self.cloud, 'sheets.spreadsheets.values.batchGet',
+                lambda: {'valueRanges': [self._read(spreadsheetId, range_name, kwargs.get('valueRenderOption'))
+                                         for range_name in ranges]}),
+            batchUpdate=lambda spreadsheetId, body, **kwargs: _FakeRequest(
+                self.cloud, 'sheets.spreadsheets.values.batchUpdate',
+                lambda: {'totalUpdatedCells': sum(self._write(spreadsheetId, item['range'], item['values'])
+                                                  for item in body.get('data', []))}),
+        ))
+
+    @staticmethod
+    def _parse(range_name):
+        match = _A1_RANGE.match(range_name)
+        if match is None:
+            raise _api_error(400, f"Unable to parse range: {range_name}")
+        sheet = (match.group('sheet') or 'Sheet1').strip("'").replace("''", "'")
+        top = int(match.group('r1') or 1) - 1
+        left = _column_index(match.group('c1'))
+        if match.group('c2') is None:
+            return sheet, top, left, top, left
+        bottom = int(match.group('r2')) - 1 if match.group('r2') else None
+        return sheet, top, left, bottom, _column_index(match.group('c2'))
+
+    def _read(self, spreadsheet_id, range_name, value_render_option=None):
+        sheet, top, left, bottom, right = self._parse(range_name)
+        with self._lock:
+            cells = dict(self._sheets[(spreadsheet_id, sheet)])
+        if bottom is None:
+            bottom = max((row for row, col in cells if left <= col <= right), default=top - 1)
+        rows = []
+        for row in range(top, bottom + 1):
+            values = [cells.get((row, col), '') for col in range(left, right + 1)]
+            while values and values[-1] in ('', None):
+                values.pop()
+            if value_render_option in (None, 'FORMATTED_VALUE'):
+                values = [str(value) for value in values]
+            rows.append(values)
+        while rows and not rows[-1]:
+            rows.pop()
+        return {'range': range_name, 'values': rows} if rows else {'range': range_name}
+
+    def _write(self, spreadsheet_id, range_name, values):
+        sheet, top, left, _, _ = self._parse(range_name)
+        updated = 0
+        with self._lock:
+            cells = self._sheets[(spreadsheet_id, sheet)]
+            for row_offset, row in enumerate(values):
+                for col_offset, value in enumerate(row):
+                    # Null values leave the cell unchanged
+                    if value is not None:
+                        cells[(top + row_offset, left + col_offset)] = value
+                        updated += 1
+        return updated
+
+
+class FakeTranslateClient:
+    """Translation API v2; enforces the per-request segment and character limits."""
+
+    def __init__(self, cloud, max_segments=128, max_chars=30000):
+        self.cloud = cloud
+        self.max_segments = max_segments
+        self.max_chars = max_chars
+
+    def translate(self, values, target_language=None, format_=None, source_language=None, **kwargs):
+        single = isinstance(values, str)
+        values = [values] if single else list(values)
+        chars = sum(len(value) for value in values)
+        if len(values) > self.max_segments or chars > self.max_chars:
+            raise _api_error(400, f"Request too large: {len(values)} segments, {chars} characters")
+        self.cloud.call('translate', 'translate', units=chars)
+        results = [{
+            'input': value,
+            'translatedText': f"[{target_language}] {value}",
+            'detectedSourceLanguage': source_language or 'en',
+        } for value in values]
+        return results[0] if single else results
+
+
+def _speech_response(seconds):
+    return SimpleNamespace(results=[SimpleNamespace(
+        is_final=True,
+        alternatives=[SimpleNamespace(transcript=f"{seconds:.1f} seconds of audio", confidence=0.9)],
+        result_end_time=datetime.timedelta(seconds=seconds),
+    )])
+
+
+class FakeSpeechClient:
+    """Speech-to-Text v1; the speech profile's per_unit applies per second of audio."""
+
+    def __init__(self, cloud):
+        self.cloud = cloud
+
+    def recognize(self, config, audio, **kwargs):
+        seconds = len(audio.content) / (2 * (config.audio_channel_count or 1) * config.sample_rate_hertz)
+        self.cloud.call('speech', 'recognize', units=seconds)
+        return _speech_response(seconds)
+
+    def streaming_recognize(self, config, requests, **kwargs):
+        audio_bytes = sum(len(request.audio_content) for request in requests)
+        seconds = audio_bytes / (2 * config.config.sample_rate_hertz)
+        self.cloud.call('speech', 'streaming_recognize', units=seconds)
+        return iter([_speech_response(seconds)])
+
+    def long_running_recognize(self, config, audio, **kwargs):
+        bucket_name, _, name = audio.uri[len('gs://'):].partition('/')
+        with self.cloud.storage.lock:
+            entry = self.cloud.storage.bucket_data(bucket_name).objects.get(name)
+        if entry is None:
+            raise _api_error(404, f"No such object: {audio.uri}")
+        seconds = entry[0] / (2 * (config.audio_channel_count or 1) * config.sample_rate_hertz)
+        self.cloud.call('speech', 'long_running_recognize', units=seconds)
+        return SimpleNamespace(result=lambda timeout=None: _speech_response(seconds))
@@ -0,0 +1,252 @@
+import logging
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import gcp
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Where an operation runs: key_path is the service account key file, or None for gcp.KEY_PATH.
+# zone is None for project-wide operations (aggregated listings, buckets).
+Target = namedtuple('Target', 'project zone key_path', defaults=(None, None))
+
+# One entry of the merged stream: either an item produced for a target, or the error it failed with
+FanOutResult = namedtuple('FanOutResult', 'target item error')
+
+_DONE = object()
+
+
+class FanOutReport:
+    """Per-target outcome of a fan-out, filled in while its stream is consumed."""
+
+    def __init__(self):
+        self.succeeded = []
+        self.failed = {}  # target -> exception
+        self.items = 0
+
+    @property
+    def complete(self):
+        """True if every target finished without error."""
+        return not self.failed
+
+    def __repr__(self):
+        return (f"FanOutReport(succeeded={len(self.succeeded)}, failed={len(self.failed)}, "
+                f"items={self.items})")
+
+
+def targets(projects, zones=(None,), key_paths=None):
+    """
+    Build the cross product of projects and zones as fan-out targets.
+
+    Args:
+        projects (iterable): GCP project IDs.
+        zones (iterable): Compute Engine zones; (None,) for one project-wide target per project.
+        key_paths (dict): Project -> service account key file, for projects not using gcp.KEY_PATH.
+
+    Returns:
+        list: Target entries.
+    """
+    key_paths = key_paths or {}
+    zones = list(zones)
+    return [Target(project, zone, key_paths.get(project)) for project in projects for zone in zones]
+
+
+def _put(out, stop, message):
+    """Queue a message, giving up once the consumer has gone away. Returns False if it did."""
+    while not stop.is_set():
+        try:
+            out.put(message, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _run(operation, target, out, stop):
+    error = None
+    try:
+        # Clients, quota and operation polling inside this thread use the target's credentials
+        with gcp.use_target(target.key_path, target.project):
+            for item in operation(target):
+                if not _put(out, stop, (target, item, None)):
+                    return
+    except Exception as e:
+        logger.error(f"Fan-out to {target.project}/{target.zone or '-'} failed: {e}")
+        error = e
+    _put(out, stop, (target, _DONE, error))
+
+
+def fan_out(operation, targets, max_workers=16, buffer_size=1000, report=None):
+    """
+    Run an operation against many (project, zone) targets concurrently and merge the results.
+
+    Each target runs on a shared pool of max_workers threads, so at most that many
+    targets are in flight however many are given. Items are yielded as soon as any
+    target produces them; a bounded buffer stops fast targets from running far ahead
+    of the consumer. A failing target is reported once in the stream and in the report
+    without affecting the others. Closing the stream early stops the remaining work.
+
+    Args:
+        operation (callable): operation(target) -> iterable of items. It runs with the
+            target's credentials and project in effect (see gcp.use_target()).
+        targets (iterable): Target entries.
+        max_workers (int): Maximum number of targets processed at once.
+        buffer_size (int): Items held for the consumer before producers wait.
+        report (FanOutReport): Report to fill in; pass one to inspect failures afterwards.
+
+    Yields:
+        FanOutResult: (target, item, None) per item, or (target, None, error) per failed target.
+    """
+    targets = list(targets)
+    report = report if report is not None else FanOutReport()
+    if not targets:
+        return
+    out = queue.Queue(maxsize=buffer_size)
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(targets)), thread_name_prefix='fanout')
+    for target in targets:
+        pool.submit(_run, operation, target, out, stop)
+
+    remaining = len(targets)
+    try:
+        while remaining:
+            target, item, error = out.get()
+            if item is not _DONE:
+                report.items += 1
+                yield FanOutResult(target, item, None)
+                continue
+            remaining -= 1
+            if error is None:
+                report.succeeded.append(target)
+            else:
+                report.failed[target] = error
+                yield FanOutResult(target, None, error)
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+    logger.info(f"Fan-out finished: {len(report.succeeded)} targets succeeded, {len(report.failed)} failed, "
+                f"{report.items} items.")
+
+
+def _instances(target, **filters):
+    return gcp.iter_instances(target.project, target.zone, **filters)
+
+
+def _buckets(target, **filters):
+    return gcp.iter_buckets(**filters)
+
+
+def _create(specs, target, **options):
+    return gcp.create_instances(specs, **options)
+
+
+def _terminate(instances, target, **options):
+    return gcp.terminate_instances(instances, **options)
+
+
+def list_instances(targets, status=None, labels=None, name_prefix=None, max_workers=16, report=None):
+    """
+    Stream instances from every target as one merged stream.
+
+    Args:
+        targets (iterable): Target entries; a target without a zone covers the whole project.
+        status (str): Instance status to match, e.g. 'RUNNING'.
+        labels (dict): Labels that must all match.
+        name_prefix (str): Instance name prefix.
+        max_workers (int): Maximum number of targets listed at once.
+        report (FanOutReport): Report to fill in with per-target outcomes.
+
+    Yields:
+        FanOutResult: Items are gcp.InstanceRecord entries.
+    """
+    operation = partial(_instances, status=status, labels=labels, name_prefix=name_prefix)
+    return fan_out(operation, targets, max_workers=max_workers, report=report)
+
+
+def list_buckets(targets, prefix=None, labels=None, max_workers=16, report=None):
+    """
+    Stream buckets from every target project as one merged stream.
+
+    Args:
+        targets (iterable): Target entries; zones are ignored, so give one per project.
+        prefix (str): Bucket name prefix.
+        labels (dict): Labels that must all match.
+        max_workers (int): Maximum number of projects listed at once.
+        report (FanOutReport): Report to fill in with per-target outcomes.
+
+    Yields:
+        FanOutResult: Items are gcp.BucketRecord entries.
+    """
+    operation = partial(_buckets, prefix=prefix, labels=labels)
+    return fan_out(operation, targets, max_workers=max_workers, report=report)
+
+
+def _grouped(entries, key_paths, operation, **options):
+    """Group entries by (project, zone) and bind each group to its own target."""
+    key_paths = key_paths or {}
+    groups = {}
+    for entry in entries:
+        target = Target(entry['project'], entry['zone'], key_paths.get(entry['project']))
+        groups.setdefault(target, []).append(entry)
+    return {target: partial(operation, group, **options) for target, group in groups.items()}
+
+
+def _limiter(max_total_in_flight):
+    """Return a semaphore shared by every batch of one call, or None for no overall bound."""
+    return threading.BoundedSemaphore(max_total_in_flight) if max_total_in_flight else None
+
+
+def _dispatch(operations, max_workers, report):
+    return fan_out(lambda target: operations[target](target), operations, max_workers=max_workers, report=report)
+
+
+def create_instances(specs, key_paths=None, max_workers=16, max_in_flight=10, max_total_in_flight=None,
+                     timeout=None, report=None):
+    """
+    Create instances across projects and zones, one concurrent batch per (project, zone).
+
+    Args:
+        specs (iterable): Dicts as accepted by gcp.create_instances().
+        key_paths (dict): Project -> service account key file, for projects not using gcp.KEY_PATH.
+        max_workers (int): Maximum number of (project, zone) batches running at once.
+        max_in_flight (int): Maximum number of inserts outstanding within each batch, so up to
+            max_workers * max_in_flight in total.
+        max_total_in_flight (int): Maximum number of inserts outstanding across all batches,
+            or None to bound each batch only.
+        timeout (float): Per-operation deadline in seconds, or None for the poller default.
+        report (FanOutReport): Report to fill in with per-target outcomes.
+
+    Yields:
+        FanOutResult: Items are the per-instance dicts from gcp.create_instances().
+    """
+    operations = _grouped(specs, key_paths, _create, max_in_flight=max_in_flight, timeout=timeout,
+                          limiter=_limiter(max_total_in_flight))
+    return _dispatch(operations, max_workers, report)
+
+
+def terminate_instances(instances, key_paths=None, max_workers=16, max_in_flight=10, max_total_in_flight=None,
+                        timeout=None, report=None):
+    """
+    Terminate instances across projects and zones, one concurrent batch per (project, zone).
+
+    Args:
+        instances (iterable): Dicts with project, zone and instance_name.
+        key_paths (dict): Project -> service account key file, for projects not using gcp.KEY_PATH.
+        max_workers (int): Maximum number of (project, zone) batches running at once.
+        max_in_flight (int): Maximum number of deletes outstanding within each batch, so up to
+            max_workers * max_in_flight in total.
+        max_total_in_flight (int): Maximum number of deletes outstanding across all batches,
+            or None to bound each batch only.
+        timeout (float): Per-operation deadline in seconds, or None for the poller default.
+        report (FanOutReport): Report to fill in with per-target outcomes.
+
+    Yields:
+        FanOutResult: Items are the per-instance dicts from gcp.terminate_instances().
+    """
+    operations = _grouped(instances, key_paths, _terminate, max_in_flight=max_in_flight, timeout=timeout,
+                          limiter=_limiter(max_total_in_flight))
+    return _dispatch(operations, max_workers, report)
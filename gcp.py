@@ -1,67 +1,190 @@
 import logging
 import os
-from google.cloud import compute_v1
-from google.cloud import storage
-from google.oauth2 import service_account
-from googleapiclient import discovery
-from googleapiclient.errors import HttpError
+import re
 import time
+import uuid
+import contextvars
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import clients
+import operations
+import ratelimit
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def initialize_clients():
+# Path to your service account key file
+KEY_PATH = "C:\\Users\\naman\\Downloads\\watchful-slice-443014-f0-34fb313928ed.json"  # Update this path
+PROJECT_ID = 'watchful-slice-443014-f0'  # Replace with your actual project ID
+
+# Key file and project used by calls that do not name them; see use_target()
+_target = contextvars.ContextVar('gcp_target', default=(None, None))
+
+@contextmanager
+def use_target(key_path=None, project_id=None):
     """
-    Initialize GCP clients for Compute Engine and Cloud Storage using service account credentials.
+    Run the enclosed calls with another service account key and/or default project.
+
+    The setting is local to the current thread (or task), so concurrent callers can
+    each work against a different project without passing credentials around.
+
+    Args:
+        key_path (str): Path to the service account key file, or None for KEY_PATH.
+        project_id (str): Default GCP project ID, or None for PROJECT_ID.
     """
+    token = _target.set((key_path, project_id))
     try:
-        # Path to your service account key file
-        key_path = "C:\\Users\\naman\\Downloads\\watchful-slice-443014-f0-34fb313928ed.json"  # Update this path
+        yield
+    finally:
+        _target.reset(token)
+
+def current_target():
+    """
+    Return the key file and default project in effect for the calling thread.
 
-        if not os.path.exists(key_path):
-            logger.error(f"Service account key file not found at: {key_path}")
-            return None, None
+    Returns:
+        tuple: (key_path, project_id).
+    """
+    key_path, project_id = _target.get()
+    return key_path or KEY_PATH, project_id or PROJECT_ID
 
-        # Initialize credentials
-        credentials = service_account.Credentials.from_service_account_file(key_path)
+def initialize_clients(key_path=None, project_id=None):
+    """
+    Return the shared Compute Engine and Cloud Storage clients for the service account.
 
-        # Initialize Compute Engine client with credentials
-        compute_client = compute_v1.InstancesClient(credentials=credentials)
+    Clients and credentials come from the process-wide registry in clients.py, so they
+    are built once and reused by every call instead of being recreated each time.
 
-        # Initialize Cloud Storage client with credentials and project ID
-        project_id = 'watchful-slice-443014-f0'  # Replace with your actual project ID
-        storage_client = storage.Client(credentials=credentials, project=project_id)
+    Args:
+        key_path (str): Path to the service account key file; defaults to the current target's.
+        project_id (str): GCP project ID the storage client is bound to; defaults to the current target's.
 
-        logger.info("Successfully initialized Compute Engine and Cloud Storage clients.")
+    Returns:
+        tuple: (compute_client, storage_client), or (None, None) on failure.
+    """
+    default_key_path, default_project_id = current_target()
+    key_path = key_path or default_key_path
+    project_id = project_id or default_project_id
+    try:
+        # The registry raises FileNotFoundError for a missing key file
+        compute_client = clients.get_client('compute', source=key_path, project=project_id)
+        storage_client = clients.get_client('storage', source=key_path, project=project_id)
         return compute_client, storage_client
     except Exception as e:
         logger.error(f"Failed to initialize GCP clients: {e}")
         return None, None
 
-def wait_for_operation(compute_client, project, zone, operation_name):
+# Callbacks run after a mutating call succeeds, as callback(resource_type, project, zone)
+_mutation_listeners = []
+
+def add_mutation_listener(callback):
+    """
+    Register a callback to run whenever a portal call creates or deletes a resource.
+
+    Args:
+        callback (callable): Called as callback(resource_type, project, zone), where
+            resource_type is 'instances' or 'buckets' and zone is None for buckets.
+    """
+    _mutation_listeners.append(callback)
+
+def remove_mutation_listener(callback):
+    """Unregister a callback added with add_mutation_listener()."""
+    if callback in _mutation_listeners:
+        _mutation_listeners.remove(callback)
+
+def notify_mutation(resource_type, project, zone=None):
+    """
+    Tell registered listeners that resources of a type changed.
+
+    Args:
+        resource_type (str): 'instances' or 'buckets'.
+        project (str): GCP project ID.
+        zone (str): Compute Engine zone, or None.
+    """
+    for callback in list(_mutation_listeners):
+        try:
+            callback(resource_type, project, zone)
+        except Exception as e:
+            logger.error(f"Mutation listener failed: {e}")
+
+def wait_for_operation(compute_client, project, zone, operation_name, timeout=None):
     """
     Wait for a Compute Engine operation to complete.
 
+    The operation is tracked by the shared poller in operations.py, which backs off
+    between polls and enforces a deadline.
+
     Args:
-        compute_client: Compute Engine client.
+        compute_client: Compute Engine client (unused; kept for backward compatibility).
         project (str): GCP project ID.
         zone (str): Compute Engine zone.
         operation_name (str): Name of the operation.
+        timeout (float): Seconds to wait before giving up; defaults to the poller's.
+
+    Returns:
+        Operation: The finished operation.
+
+    Raises:
+        OperationError: If the operation fails or times out.
     """
     try:
-        while True:
-            result = compute_client.get_zone_operation(project=project, zone=zone, operation=operation_name)
-            if result.status == compute_v1.Operation.Status.DONE:
-                if result.error:
-                    raise Exception(result.error)
-                return
-            else:
-                time.sleep(1)
+        return operations.get_poller(current_target()[0]).wait(project, operation_name, zone=zone, timeout=timeout)
     except Exception as e:
         logger.error(f"Error while waiting for operation {operation_name}: {e}")
+        raise
+
+def build_instance_resource(project, zone, instance_name, machine_type, source_image, network='default',
+                            labels=None):
+    """
+    Build the Instance resource used to insert a Compute Engine VM.
+
+    Args:
+        project (str): GCP project ID.
+        zone (str): Compute Engine zone.
+        instance_name (str): Name of the instance.
+        machine_type (str): Machine type, e.g., 'n1-standard-1'.
+        source_image (str): Image to use for the instance.
+        network (str): Network name.
+        labels (dict): Labels to set on the instance.
 
-def create_instance(project, zone, instance_name, machine_type, source_image, network='default'):
+    Returns:
+        compute_v1.Instance: The instance resource.
+    """
+    from google.cloud import compute_v1
+
+    instance = compute_v1.Instance()
+    instance.name = instance_name
+    instance.machine_type = f"zones/{zone}/machineTypes/{machine_type}"
+    if labels:
+        instance.labels = labels
+
+    # Configure the boot disk
+    initialize_params = compute_v1.AttachedDiskInitializeParams()
+    initialize_params.source_image = source_image
+    initialize_params.disk_size_gb = 10
+
+    disk = compute_v1.AttachedDisk()
+    disk.boot = True
+    disk.auto_delete = True
+    disk.type_ = 'PERSISTENT'
+    disk.initialize_params = initialize_params
+
+    instance.disks = [disk]
+
+    # Configure the network interface
+    network_interface = compute_v1.NetworkInterface()
+    network_interface.network = f"projects/{project}/global/networks/{network}"
+    network_interface.access_configs = [compute_v1.AccessConfig(
+        name="External NAT",
+        type_='ONE_TO_ONE_NAT'
+    )]
+    instance.network_interfaces = [network_interface]
+    return instance
+
+def create_instance(project, zone, instance_name, machine_type, source_image, network='default', labels=None):
     """
     Create a Compute Engine instance.
 
@@ -72,54 +195,256 @@ def create_instance(project, zone, instance_name, machine_type, source_image, ne
         machine_type (str): Machine type, e.g., 'n1-standard-1'.
         source_image (str): Image to use for the instance.
         network (str): Network name.
+        labels (dict): Labels to set on the instance.
 
     Returns:
         str: Instance name if created successfully, else None.
     """
+    from google.cloud import compute_v1
+
     try:
         compute_client, _ = initialize_clients()
         if not compute_client:
             return None
 
-        instance = compute_v1.Instance()
-        instance.name = instance_name
-        instance.machine_type = f"zones/{zone}/machineTypes/{machine_type}"
-
-        # Configure the boot disk
-        initialize_params = compute_v1.AttachedDiskInitializeParams()
-        initialize_params.source_image = source_image
-        initialize_params.disk_size_gb = 10
-
-        disk = compute_v1.AttachedDisk()
-        disk.boot = True
-        disk.auto_delete = True
-        disk.type_ = compute_v1.AttachedDisk.Type.PERSISTENT
-        disk.initialize_params = initialize_params
-
-        instance.disks = [disk]
-
-        # Configure the network interface
-        network_interface = compute_v1.NetworkInterface()
-        network_interface.network = f"projects/{project}/global/networks/{network}"
-        network_interface.access_configs = [compute_v1.AccessConfig(
-            name="External NAT",
-            type_=compute_v1.AccessConfig.Type.ONE_TO_ONE_NAT
-        )]
-        instance.network_interfaces = [network_interface]
-
-        # Insert the instance
-        operation = compute_client.insert(
-            project=project,
-            zone=zone,
-            instance_resource=instance
-        )
+        instance = build_instance_resource(project, zone, instance_name, machine_type, source_image, network, labels)
+
+        # Insert the instance; the request ID makes retried inserts idempotent
+        request = compute_v1.InsertInstanceRequest(
+            project=project, zone=zone, instance_resource=instance, request_id=str(uuid.uuid4()))
+        operation = ratelimit.call('compute', project, compute_client.insert, request=request)
         wait_for_operation(compute_client, project, zone, operation.name)
         logger.info(f"Successfully created instance: {instance_name}")
+        notify_mutation('instances', project, zone)
         return instance_name
     except Exception as e:
         logger.error(f"Failed to create instance: {e}")
         return None
 
+def _run_zone_operations(specs, start, max_in_flight, timeout, limiter=None):
+    """
+    Start a zone operation per spec and track all of them together.
+
+    At most max_in_flight specs are outstanding at once (either being submitted or
+    waiting on their operation). Pending operations are handed to the shared
+    operation poller rather than each getting its own polling loop.
+
+    Args:
+        specs (iterable): Items passed to start().
+        start (callable): start(spec) -> (project, zone, operation_name); runs on the pool.
+        max_in_flight (int): Maximum number of outstanding specs.
+        timeout (float): Per-operation deadline in seconds, or None for the poller default.
+        limiter (threading.Semaphore): Optional bound shared with other batches; a slot is
+            taken on the pool before each start() and given back when its operation ends.
+
+    Yields:
+        tuple: (spec, error) as each operation finishes; error is None on success.
+    """
+    poller = operations.get_poller(current_target()[0])
+    specs = iter(specs)
+    exhausted = False
+    submitting = {}  # insert/delete call future -> spec
+    pending = {}     # operation future -> spec
+
+    def limited_start(spec):
+        # Waits on a pool thread, so this batch keeps collecting finished operations meanwhile
+        limiter.acquire()
+        try:
+            return start(spec)
+        except BaseException:
+            limiter.release()
+            raise
+
+    def release(future):
+        limiter.release()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        while True:
+            while not exhausted and len(submitting) + len(pending) < max_in_flight:
+                spec = next(specs, None)
+                if spec is None:
+                    exhausted = True
+                    break
+                submitting[pool.submit(start if limiter is None else limited_start, spec)] = spec
+
+            if not submitting and not pending:
+                return
+
+            done, _ = wait(list(submitting) + list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in submitting:
+                    spec = submitting.pop(future)
+                    try:
+                        project, zone, operation_name = future.result()
+                    except Exception as e:
+                        yield spec, e
+                        continue
+                    try:
+                        operation = poller.track(project, operation_name, zone=zone, timeout=timeout)
+                    except Exception as e:
+                        if limiter is not None:
+                            limiter.release()
+                        yield spec, e
+                        continue
+                    if limiter is not None:
+                        operation.add_done_callback(release)
+                    pending[operation] = spec
+                else:
+                    spec = pending.pop(future)
+                    yield spec, future.exception()
+
+def create_instances(specs, max_in_flight=10, timeout=None, limiter=None):
+    """
+    Create many Compute Engine instances concurrently.
+
+    Inserts are submitted through a bounded pool and their zone operations are tracked
+    together, so provisioning time follows the slowest VM rather than the fleet size.
+    A failed instance is reported and does not abort the rest of the batch.
+
+    Args:
+        specs (iterable): Dicts with the create_instance() arguments: project, zone,
+            instance_name, machine_type, source_image and optionally network and labels.
+        max_in_flight (int): Maximum number of inserts outstanding at once.
+        timeout (float): Per-operation deadline in seconds, or None for the poller default.
+        limiter (threading.Semaphore): Optional bound on outstanding inserts shared with other
+            batches running at the same time.
+
+    Yields:
+        dict: {'instance_name', 'zone', 'success', 'error'} per instance, as each completes.
+    """
+    from google.cloud import compute_v1
+
+    compute_client, _ = initialize_clients()
+    if not compute_client:
+        return
+
+    def start(spec):
+        instance = build_instance_resource(
+            spec['project'], spec['zone'], spec['instance_name'], spec['machine_type'],
+            spec['source_image'], spec.get('network', 'default'), spec.get('labels'))
+        request = compute_v1.InsertInstanceRequest(
+            project=spec['project'], zone=spec['zone'], instance_resource=instance, request_id=str(uuid.uuid4()))
+        operation = ratelimit.call('compute', spec['project'], compute_client.insert, request=request)
+        return spec['project'], spec['zone'], operation.name
+
+    for spec, error in _run_zone_operations(specs, start, max_in_flight, timeout, limiter):
+        if error:
+            logger.error(f"Failed to create instance {spec['instance_name']}: {error}")
+        else:
+            logger.info(f"Successfully created instance: {spec['instance_name']}")
+            notify_mutation('instances', spec['project'], spec['zone'])
+        yield {
+            'instance_name': spec['instance_name'],
+            'zone': spec['zone'],
+            'success': error is None,
+            'error': str(error) if error else None,
+        }
+
+# Compact inventory records holding only the fields the portal displays
+InstanceRecord = namedtuple('InstanceRecord', 'name zone status machine_type internal_ip external_ip labels')
+BucketRecord = namedtuple('BucketRecord', 'name location storage_class created labels')
+
+def iter_pages(api, project, fetch):
+    """
+    Fetch a listing one page at a time, each page request going through the quota guard.
+
+    Args:
+        api (str): API name the requests count against.
+        project (str): Project the quota is counted against.
+        fetch (callable): fetch(page_token) -> (items, next_page_token).
+
+    Yields:
+        list: The items of each page.
+    """
+    page_token = None
+    while True:
+        items, page_token = ratelimit.call(api, project, fetch, page_token)
+        yield items
+        if not page_token:
+            return
+
+def _basename(url):
+    return url.rsplit('/', 1)[-1] if url else url
+
+def build_instance_filter(status=None, labels=None, name_prefix=None):
+    """
+    Build a server-side Compute Engine list filter.
+
+    Uses the regular-expression (eq) form so all conditions can be combined.
+
+    Args:
+        status (str): Instance status, e.g. 'RUNNING'.
+        labels (dict): Label key/value pairs that must all match.
+        name_prefix (str): Instance name prefix.
+
+    Returns:
+        str: The filter expression, or None if no condition is given.
+    """
+    expressions = []
+    if status:
+        expressions.append(f"(status eq '{re.escape(status)}')")
+    for key, value in (labels or {}).items():
+        expressions.append(f"(labels.{key} eq '{re.escape(str(value))}')")
+    if name_prefix:
+        expressions.append(f"(name eq '{re.escape(name_prefix)}.*')")
+    return ' '.join(expressions) or None
+
+def _instance_record(instance):
+    interface = instance.network_interfaces[0] if instance.network_interfaces else None
+    access = interface.access_configs[0] if interface and interface.access_configs else None
+    return InstanceRecord(
+        name=instance.name,
+        zone=_basename(instance.zone),
+        status=instance.status,
+        machine_type=_basename(instance.machine_type),
+        internal_ip=interface.network_i_p if interface else None,
+        external_ip=access.nat_i_p if access else None,
+        labels=dict(instance.labels),
+    )
+
+def iter_instances(project, zone=None, status=None, labels=None, name_prefix=None, page_size=500):
+    """
+    Stream Compute Engine instances page by page as compact records.
+
+    Filters are evaluated by the API. Without a zone, a single aggregatedList call
+    covers every zone in the project.
+
+    Args:
+        project (str): GCP project ID.
+        zone (str): Compute Engine zone, or None for all zones.
+        status (str): Instance status to match, e.g. 'RUNNING'.
+        labels (dict): Labels that must all match.
+        name_prefix (str): Instance name prefix.
+        page_size (int): Instances fetched per page.
+
+    Yields:
+        InstanceRecord: One record per matching instance.
+    """
+    from google.cloud import compute_v1
+
+    compute_client, _ = initialize_clients()
+    if not compute_client:
+        return
+    instance_filter = build_instance_filter(status, labels, name_prefix)
+
+    if zone:
+        def fetch(page_token):
+            request = compute_v1.ListInstancesRequest(
+                project=project, zone=zone, filter=instance_filter, max_results=page_size, page_token=page_token)
+            page = compute_client.list(request=request)
+            return list(page.items), page.next_page_token
+    else:
+        def fetch(page_token):
+            request = compute_v1.AggregatedListInstancesRequest(
+                project=project, filter=instance_filter, max_results=page_size, page_token=page_token)
+            page = compute_client.aggregated_list(request=request)
+            instances = [instance for scoped_list in page.items.values() for instance in scoped_list.instances]
+            return instances, page.next_page_token
+
+    for instances in iter_pages('compute', project, fetch):
+        for instance in instances:
+            yield _instance_record(instance)
+
 def list_instances(project, zone):
     """
     List all running Compute Engine instances.
@@ -132,19 +457,9 @@ def list_instances(project, zone):
         list: List of running instance names.
     """
     try:
-        compute_client, _ = initialize_clients()
-        if not compute_client:
-            return []
-
-        request = compute_v1.ListInstancesRequest(project=project, zone=zone)
-        response = compute_client.list(request=request)
-
-        instances = []
-        for instance in response:
-            if instance.status == compute_v1.Instance.Status.RUNNING:
-                instances.append(instance.name)
-
-        logger.info(f"Running instances in zone {zone}: {instances}")
+        instances = [record.name for record in iter_instances(project, zone, status='RUNNING')]
+        logger.info(f"{len(instances)} running instances in zone {zone}.")
+        logger.debug(f"Running instances in zone {zone}: {instances}")
         return instances
     except Exception as e:
         logger.error(f"Failed to list instances: {e}")
@@ -159,22 +474,179 @@ def terminate_instance(project, zone, instance_name):
         zone (str): Compute Engine zone.
         instance_name (str): Name of the instance to terminate.
     """
+    from google.cloud import compute_v1
+
     try:
         compute_client, _ = initialize_clients()
         if not compute_client:
             return
 
-        operation = compute_client.delete(
-            project=project,
-            zone=zone,
-            instance=instance_name
-        )
+        request = compute_v1.DeleteInstanceRequest(
+            project=project, zone=zone, instance=instance_name, request_id=str(uuid.uuid4()))
+        operation = ratelimit.call('compute', project, compute_client.delete, request=request)
         wait_for_operation(compute_client, project, zone, operation.name)
         logger.info(f"Successfully terminated instance: {instance_name}")
+        notify_mutation('instances', project, zone)
     except Exception as e:
         logger.error(f"Failed to terminate instance: {e}")
 
-def create_storage_bucket(bucket_name, location='US', storage_class='STANDARD'):
+def terminate_instances(targets, max_in_flight=10, timeout=None, limiter=None):
+    """
+    Terminate (delete) many Compute Engine instances concurrently.
+
+    Args:
+        targets (iterable): Dicts with project, zone and instance_name.
+        max_in_flight (int): Maximum number of deletes outstanding at once.
+        timeout (float): Per-operation deadline in seconds, or None for the poller default.
+        limiter (threading.Semaphore): Optional bound on outstanding deletes shared with other
+            batches running at the same time.
+
+    Yields:
+        dict: {'instance_name', 'zone', 'success', 'error'} per instance, as each completes.
+    """
+    from google.cloud import compute_v1
+
+    compute_client, _ = initialize_clients()
+    if not compute_client:
+        return
+
+    def start(target):
+        request = compute_v1.DeleteInstanceRequest(
+            project=target['project'], zone=target['zone'], instance=target['instance_name'],
+            request_id=str(uuid.uuid4()))
+        operation = ratelimit.call('compute', target['project'], compute_client.delete, request=request)
+        return target['project'], target['zone'], operation.name
+
+    for target, error in _run_zone_operations(targets, start, max_in_flight, timeout, limiter):
+        if error:
+            logger.error(f"Failed to terminate instance {target['instance_name']}: {error}")
+        else:
+            logger.info(f"Successfully terminated instance: {target['instance_name']}")
+            notify_mutation('instances', target['project'], target['zone'])
+        yield {
+            'instance_name': target['instance_name'],
+            'zone': target['zone'],
+            'success': error is None,
+            'error': str(error) if error else None,
+        }
+
+def set_instance_labels(project, zone, instance_name, labels):
+    """
+    Replace the labels of a Compute Engine instance in place.
+
+    Args:
+        project (str): GCP project ID.
+        zone (str): Compute Engine zone.
+        instance_name (str): Name of the instance.
+        labels (dict): The complete set of labels the instance should have.
+
+    Returns:
+        bool: True if the labels were updated, else False.
+    """
+    from google.cloud import compute_v1
+
+    try:
+        compute_client, _ = initialize_clients()
+        if not compute_client:
+            return False
+
+        # setLabels needs the current fingerprint to guard against concurrent edits
+        instance = ratelimit.call('compute', project, compute_client.get,
+                                  project=project, zone=zone, instance=instance_name)
+        request = compute_v1.SetLabelsInstanceRequest(
+            project=project, zone=zone, instance=instance_name, request_id=str(uuid.uuid4()),
+            instances_set_labels_request_resource=compute_v1.InstancesSetLabelsRequest(
+                label_fingerprint=instance.label_fingerprint, labels=labels))
+        operation = ratelimit.call('compute', project, compute_client.set_labels, request=request)
+        wait_for_operation(compute_client, project, zone, operation.name)
+        logger.info(f"Updated labels of instance: {instance_name}")
+        notify_mutation('instances', project, zone)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to update instance labels: {e}")
+        return False
+
+# Power-state changes: action -> (client method, request type)
+POWER_ACTIONS = {
+    'start': ('start', 'StartInstanceRequest'),
+    'stop': ('stop', 'StopInstanceRequest'),
+    'suspend': ('suspend', 'SuspendInstanceRequest'),
+    'resume': ('resume', 'ResumeInstanceRequest'),
+}
+
+def _power_request(project, zone, instance_name, action):
+    from google.cloud import compute_v1
+
+    _, request_type = POWER_ACTIONS[action]
+    return getattr(compute_v1, request_type)(
+        project=project, zone=zone, instance=instance_name, request_id=str(uuid.uuid4()))
+
+def change_instance_state(project, zone, instance_name, action, timeout=None):
+    """
+    Start, stop, suspend or resume a Compute Engine instance and wait for it.
+
+    Args:
+        project (str): GCP project ID.
+        zone (str): Compute Engine zone.
+        instance_name (str): Name of the instance.
+        action (str): 'start', 'stop', 'suspend' or 'resume'.
+        timeout (float): Seconds to wait for the operation, or None for the poller default.
+
+    Returns:
+        bool: True if the instance reached the new state, else False.
+    """
+    try:
+        compute_client, _ = initialize_clients()
+        if not compute_client:
+            return False
+
+        method, _ = POWER_ACTIONS[action]
+        request = _power_request(project, zone, instance_name, action)
+        operation = ratelimit.call('compute', project, getattr(compute_client, method), request=request)
+        wait_for_operation(compute_client, project, zone, operation.name, timeout=timeout)
+        logger.info(f"Instance {instance_name}: {action} done.")
+        notify_mutation('instances', project, zone)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to {action} instance {instance_name}: {e}")
+        return False
+
+def change_instance_states(targets, action, max_in_flight=10, timeout=None):
+    """
+    Start, stop, suspend or resume many Compute Engine instances concurrently.
+
+    Args:
+        targets (iterable): Dicts with project, zone and instance_name.
+        action (str): 'start', 'stop', 'suspend' or 'resume'.
+        max_in_flight (int): Maximum number of requests outstanding at once.
+        timeout (float): Per-operation deadline in seconds, or None for the poller default.
+
+    Yields:
+        dict: {'instance_name', 'zone', 'success', 'error'} per instance, as each completes.
+    """
+    compute_client, _ = initialize_clients()
+    if not compute_client:
+        return
+    method = getattr(compute_client, POWER_ACTIONS[action][0])
+
+    def start(target):
+        request = _power_request(target['project'], target['zone'], target['instance_name'], action)
+        operation = ratelimit.call('compute', target['project'], method, request=request)
+        return target['project'], target['zone'], operation.name
+
+    for target, error in _run_zone_operations(targets, start, max_in_flight, timeout):
+        if error:
+            logger.error(f"Failed to {action} instance {target['instance_name']}: {error}")
+        else:
+            notify_mutation('instances', target['project'], target['zone'])
+        yield {
+            'instance_name': target['instance_name'],
+            'zone': target['zone'],
+            'success': error is None,
+            'error': str(error) if error else None,
+        }
+
+def create_storage_bucket(bucket_name, location='US', storage_class='STANDARD', labels=None):
     """
     Create a Cloud Storage bucket.
 
@@ -182,100 +654,285 @@ def create_storage_bucket(bucket_name, location='US', storage_class='STANDARD'):
         bucket_name (str): Name of the bucket.
         location (str): Location of the bucket, e.g., 'US', 'EU'.
         storage_class (str): Storage class, e.g., 'STANDARD', 'NEARLINE'.
+        labels (dict): Labels to set on the bucket.
 
     Returns:
         Bucket: The created bucket object or None if failed.
     """
     try:
+        _, project_id = current_target()
         _, storage_client = initialize_clients()
         if not storage_client:
             return None
 
         bucket = storage_client.bucket(bucket_name)
         bucket.storage_class = storage_class
-        new_bucket = storage_client.create_bucket(bucket, location=location)
+        if labels:
+            bucket.labels = labels
+        attempts = []
+
+        def create():
+            attempts.append(True)
+            return storage_client.create_bucket(bucket, location=location)
+
+        try:
+            new_bucket = ratelimit.call('storage', project_id, create)
+        except Exception as e:
+            # A retried insert gets 409 when an earlier attempt that timed out went through
+            if ratelimit.error_status(e) != 409 or len(attempts) < 2:
+                raise
+            new_bucket = _created_bucket(storage_client, project_id, bucket_name, location, storage_class, labels)
+            if new_bucket is None:
+                raise
         logger.info(f"Successfully created bucket: {new_bucket.name}")
+        notify_mutation('buckets', project_id)
         return new_bucket
     except Exception as e:
         logger.error(f"Failed to create bucket: {e}")
         return None
 
-def list_storage_buckets():
+def _created_bucket(storage_client, project_id, bucket_name, location, storage_class, labels):
     """
-    List all Cloud Storage buckets in the project.
+    Return the bucket an earlier attempt of a retried create made, or None if it is not ours.
+
+    The bucket counts as ours when it is readable from our project and has the
+    location, storage class and labels that were asked for.
+    """
+    try:
+        bucket = ratelimit.call('storage', project_id, storage_client.get_bucket, bucket_name)
+    except Exception as e:
+        logger.warning(f"Could not look up bucket {bucket_name} after a conflicting create: {e}")
+        return None
+    if ((bucket.location or '').upper() != location.upper() or bucket.storage_class != storage_class
+            or (bucket.labels or {}) != (labels or {})):
+        return None
+    logger.info(f"Bucket {bucket_name} was created by an earlier attempt")
+    return bucket
+
+def update_storage_bucket(bucket_name, storage_class=None, labels=None):
+    """
+    Change the default storage class and/or labels of a bucket with a single patch.
+
+    Args:
+        bucket_name (str): Name of the bucket.
+        storage_class (str): New default storage class, or None to leave it.
+        labels (dict): The complete set of labels the bucket should have, or None to leave them.
 
     Returns:
-        list: List of bucket names.
+        bool: True if the bucket was updated, else False.
     """
     try:
+        _, project_id = current_target()
         _, storage_client = initialize_clients()
         if not storage_client:
-            return []
+            return False
+
+        bucket = storage_client.bucket(bucket_name)
+        if storage_class is not None:
+            bucket.storage_class = storage_class
+        if labels is not None:
+            bucket.labels = labels
+        ratelimit.call('storage', project_id, bucket.patch)
+        logger.info(f"Successfully updated bucket: {bucket_name}")
+        notify_mutation('buckets', project_id)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to update bucket: {e}")
+        return False
+
+def iter_buckets(prefix=None, labels=None, page_size=1000):
+    """
+    Stream Cloud Storage buckets page by page as compact records.
+
+    The name prefix is applied by the API; labels are matched locally because the
+    bucket listing has no label filter.
+
+    Args:
+        prefix (str): Bucket name prefix.
+        labels (dict): Labels that must all match.
+        page_size (int): Buckets fetched per page.
+
+    Yields:
+        BucketRecord: One record per matching bucket.
+    """
+    _, project_id = current_target()
+    _, storage_client = initialize_clients()
+    if not storage_client:
+        return
+    def fetch(page_token):
+        iterator = storage_client.list_buckets(
+            prefix=prefix, page_size=page_size, page_token=page_token,
+            fields='items(name,location,storageClass,timeCreated,labels),nextPageToken')
+        return list(next(iterator.pages, [])), iterator.next_page_token
+
+    buckets = (bucket for page in iter_pages('storage', project_id, fetch) for bucket in page)
+    for bucket in buckets:
+        bucket_labels = bucket.labels or {}
+        if labels and any(bucket_labels.get(key) != value for key, value in labels.items()):
+            continue
+        yield BucketRecord(
+            name=bucket.name,
+            location=bucket.location,
+            storage_class=bucket.storage_class,
+            created=bucket.time_created,
+            labels=bucket_labels,
+        )
+
+def list_storage_buckets():
+    """
+    List all Cloud Storage buckets in the project.
 
-        buckets = list(storage_client.list_buckets())
-        bucket_names = [bucket.name for bucket in buckets]
-        logger.info(f"Cloud Storage Buckets: {bucket_names}")
+    Returns:
+        list: List of bucket names.
+    """
+    try:
+        bucket_names = [record.name for record in iter_buckets()]
+        logger.info(f"{len(bucket_names)} Cloud Storage buckets.")
+        logger.debug(f"Cloud Storage Buckets: {bucket_names}")
         return bucket_names
     except Exception as e:
         logger.error(f"Failed to list buckets: {e}")
         return []
 
-def upload_file_to_storage(bucket_name, source_file, destination_blob_name=None):
+def upload_file_to_storage(bucket_name, source_file, destination_blob_name=None, skip_unchanged=True,
+                           **upload_options):
     """
     Upload a file to a Cloud Storage bucket.
 
+    Uses the upload engine in uploads.py: large files go up as parallel parts and an
+    interrupted upload resumes from its persisted session state. If the object already
+    holds the file's content the upload is skipped; the local checksums come from the
+    content index, so an unchanged file is not even rehashed.
+
     Args:
         bucket_name (str): Name of the bucket.
         source_file (str): Path to the source file.
         destination_blob_name (str): Destination blob name. If None, uses the source file name.
+        skip_unchanged (bool): Skip the upload when the object's size and checksum already match.
+        **upload_options: Extra arguments for uploads.upload_file(), e.g. chunk_size.
 
     Returns:
-        bool: True if uploaded successfully, else False.
+        bool: True if uploaded (or already up to date), else False.
     """
-    try:
-        _, storage_client = initialize_clients()
-        if not storage_client:
-            return False
-
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(destination_blob_name or os.path.basename(source_file))
+    import uploads
 
-        blob.upload_from_filename(source_file)
+    try:
+        blob_name = destination_blob_name or os.path.basename(source_file)
+        if skip_unchanged:
+            # One metadata GET; a prefix listing would page through every object sharing the name
+            if uploads.is_current(source_file, uploads.remote_object(bucket_name, blob_name)):
+                logger.info(f"'{blob_name}' in bucket '{bucket_name}' is already up to date; skipped upload.")
+                return True
+        blob = uploads.upload_file(bucket_name, source_file, blob_name, **upload_options)
         logger.info(f"Successfully uploaded {source_file} to bucket '{bucket_name}' as '{blob.name}'.")
         return True
     except Exception as e:
         logger.error(f"Failed to upload file to storage: {e}")
         return False
 
-def delete_storage_bucket(bucket_name):
+def _delete_blob_batch(storage_client, bucket, blob_names, project_id=PROJECT_ID):
+    """
+    Delete a group of objects with one storage batch request.
+
+    The batch goes through the quota guard, which retries transient failures. If it
+    still fails, the objects are deleted one by one so a single bad object cannot
+    block the rest; objects that are already gone are ignored.
+
+    Args:
+        storage_client: Cloud Storage client.
+        bucket: Bucket the objects belong to.
+        blob_names (list): Names of the objects to delete.
+        project_id (str): Project the requests count against.
+
+    Returns:
+        int: Number of objects deleted.
+    """
+    from google.api_core.exceptions import NotFound
+
+    def send_batch():
+        with storage_client.batch():
+            for name in blob_names:
+                bucket.delete_blob(name)
+
+    try:
+        ratelimit.call('storage', project_id, send_batch)
+        return len(blob_names)
+    except Exception as e:
+        logger.warning(f"Batch delete of {len(blob_names)} objects failed, deleting one by one: {e}")
+
+    deleted = 0
+    for name in blob_names:
+        try:
+            ratelimit.call('storage', project_id, bucket.delete_blob, name)
+            deleted += 1
+        except NotFound:
+            pass
+    return deleted
+
+def delete_storage_bucket(bucket_name, dry_run=False, batch_size=100, max_workers=8, page_size=1000):
     """
     Delete a Cloud Storage bucket and all its contents.
 
+    Objects are listed one page at a time and deleted in storage batch requests on a
+    bounded worker pool, so memory use does not grow with the number of objects.
+
     Args:
         bucket_name (str): Name of the bucket.
+        dry_run (bool): Only count the objects that would be deleted.
+        batch_size (int): Objects per batch request (at most 100).
+        max_workers (int): Number of batch requests in flight at once.
+        page_size (int): Objects fetched per listing page.
+
+    Returns:
+        int: Number of objects deleted (or counted in a dry run), or None if failed.
     """
     try:
+        _, project_id = current_target()
         _, storage_client = initialize_clients()
         if not storage_client:
-            return
+            return None
 
         bucket = storage_client.bucket(bucket_name)
-        # Delete all objects in the bucket
-        blobs = list(bucket.list_blobs())
-        for blob in blobs:
-            blob.delete()
-            logger.info(f"Deleted blob: {blob.name}")
+        def fetch(page_token):
+            iterator = storage_client.list_blobs(
+                bucket_name, page_size=page_size, page_token=page_token, fields='items(name),nextPageToken')
+            return [blob.name for blob in next(iterator.pages, [])], iterator.next_page_token
+        total = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            in_flight = set()
+            for names in iter_pages('storage', project_id, fetch):
+                if dry_run:
+                    total += len(names)
+                    continue
+                for start in range(0, len(names), batch_size):
+                    if len(in_flight) >= max_workers * 2:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        total += sum(future.result() for future in done)
+                    in_flight.add(pool.submit(
+                        _delete_blob_batch, storage_client, bucket, names[start:start + batch_size], project_id))
+                logger.info(f"Deleted {total} objects from bucket '{bucket_name}' so far.")
+            total += sum(future.result() for future in in_flight)
+
+        if dry_run:
+            logger.info(f"Dry run: bucket '{bucket_name}' holds {total} objects.")
+            return total
 
         # Delete the bucket
-        bucket.delete()
-        logger.info(f"Successfully deleted bucket: {bucket_name}")
+        ratelimit.call('storage', project_id, bucket.delete)
+        logger.info(f"Successfully deleted bucket: {bucket_name} ({total} objects removed)")
+        notify_mutation('buckets', project_id)
+        return total
     except Exception as e:
         logger.error(f"Failed to delete bucket: {e}")
+        return None
 
 def create_load_balancer(project, bucket_name, backend_bucket_name, domain_name):
     """
     Create a load balancer with Cloud CDN enabled to serve content from a Cloud Storage bucket.
 
+    The backend bucket, URL map, HTTP proxy, static IP and forwarding rule are created
+    as a dependency graph by loadbalancer.py, with existing resources reused.
+
     Args:
         project (str): GCP project ID.
         bucket_name (str): Name of the Cloud Storage bucket.
@@ -285,79 +942,44 @@ def create_load_balancer(project, bucket_name, backend_bucket_name, domain_name)
     Returns:
         str: Load balancer's IP address or None if failed.
     """
-    try:
-        service = discovery.build('compute', 'v1')
-
-        # Step 1: Create Backend Bucket
-        backend_bucket_body = {
-            "name": backend_bucket_name,
-            "bucketName": bucket_name,
-            "enableCdn": True
-        }
-        service.backendBuckets().insert(project=project, body=backend_bucket_body).execute()
-        logger.info(f"Backend bucket '{backend_bucket_name}' created.")
+    import loadbalancer
 
-        # Step 2: Create URL Map
-        url_map_body = {
-            "name": "url-map-" + backend_bucket_name,
-            "defaultService": f"projects/{project}/global/backendBuckets/{backend_bucket_name}"
-        }
-        service.urlMaps().insert(project=project, body=url_map_body).execute()
-        logger.info(f"URL map 'url-map-{backend_bucket_name}' created.")
-
-        # Step 3: Create Target HTTP Proxy
-        target_http_proxy_body = {
-            "name": "target-http-proxy-" + backend_bucket_name,
-            "urlMap": f"projects/{project}/global/urlMaps/url-map-{backend_bucket_name}"
-        }
-        service.targetHttpProxies().insert(project=project, body=target_http_proxy_body).execute()
-        logger.info(f"Target HTTP proxy 'target-http-proxy-{backend_bucket_name}' created.")
-
-        # Step 4: Allocate Global Static IP
-        ip_name = "ip-" + backend_bucket_name
-        address_body = {
-            "name": ip_name,
-            "addressType": "EXTERNAL",
-            "scope": "GLOBAL",
-            "description": "Load balancer IP"
-        }
-        service.addresses().insert(project=project, region='global', body=address_body).execute()
-        logger.info(f"Allocated global IP address '{ip_name}'.")
-
-        # Step 5: Get the IP Address
-        ip_address = None
-        while True:
-            try:
-                response = service.addresses().get(project=project, region='global', address=ip_name).execute()
-                ip_address = response.get('address')
-                if ip_address:
-                    break
-            except HttpError as e:
-                if e.resp.status == 404:
-                    logger.info("Waiting for IP allocation...")
-                    time.sleep(1)
-                else:
-                    raise e
+    try:
+        results, errors = loadbalancer.create_load_balancer(project, bucket_name, backend_bucket_name)
+        if errors:
+            for node, error in errors.items():
+                logger.error(f"Failed to create load balancer {node}: {error}")
+            return None
+        ip_address = results['address']['address']
+        logger.info(f"Load balancer ready at IP address: {ip_address}")
+        return ip_address
+    except Exception as e:
+        logger.error(f"Failed to create load balancer: {e}")
+        return None
 
-        logger.info(f"Allocated IP address: {ip_address}")
+def delete_load_balancer(project, backend_bucket_name):
+    """
+    Delete a load balancer created by create_load_balancer(), in reverse dependency order.
 
-        # Step 6: Create Global Forwarding Rule
-        forwarding_rule_body = {
-            "name": "forwarding-rule-" + backend_bucket_name,
-            "IPAddress": ip_address,
-            "IPProtocol": "TCP",
-            "portRange": "80",
-            "target": f"projects/{project}/global/targetHttpProxies/target-http-proxy-{backend_bucket_name}"
-        }
-        service.globalForwardingRules().insert(project=project, body=forwarding_rule_body).execute()
-        logger.info(f"Forwarding rule 'forwarding-rule-{backend_bucket_name}' created.")
+    Args:
+        project (str): GCP project ID.
+        backend_bucket_name (str): Name of the backend bucket the load balancer serves.
 
-        # Return the IP address
-        return ip_address
+    Returns:
+        bool: True if every resource is gone, else False.
+    """
+    import loadbalancer
 
-    except HttpError as e:
-        logger.error(f"Failed to create load balancer: {e}")
-        return None
+    try:
+        _, errors = loadbalancer.delete_load_balancer(project, backend_bucket_name)
+        for node, error in errors.items():
+            logger.error(f"Failed to delete load balancer {node}: {error}")
+        if not errors:
+            logger.info(f"Successfully deleted load balancer for '{backend_bucket_name}'.")
+        return not errors
+    except Exception as e:
+        logger.error(f"Failed to delete load balancer: {e}")
+        return False
 
 def main():
     """Main function to orchestrate GCP operations."""
@@ -428,6 +1050,7 @@ def main():
         delete_storage_bucket(bucket_name)
 
     logger.info("Resource cleanup completed.")
+    clients.close()
 
 if __name__ == "__main__":
     main()
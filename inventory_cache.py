@@ -0,0 +1,217 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import gcp
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Record type used to rebuild entries loaded from disk, per resource type
+RECORD_TYPES = {
+    'instances': gcp.InstanceRecord,
+    'buckets': gcp.BucketRecord,
+}
+
+
+class InventoryCache:
+    """
+    Read-through cache of inventory listings keyed by (project, zone, resource type).
+
+    Entries expire after ttl seconds and the least recently used entry is evicted
+    once max_entries is reached. Successful create/delete calls made through gcp.py
+    invalidate the affected entries. With db_path set, entries are also stored in
+    SQLite so a restarted process can serve fresh entries without a cold scan.
+    """
+
+    def __init__(self, ttl=60.0, max_entries=256, db_path=None):
+        """
+        Args:
+            ttl (float): Seconds an entry stays fresh.
+            max_entries (int): Maximum number of entries held in memory.
+            db_path (str): Optional SQLite file backing the cache.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (stored_at, records)
+        self._generations = {}  # key -> invalidations seen, to drop listings that raced one
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS inventory ('
+                'project TEXT, zone TEXT, resource_type TEXT, stored_at REAL, records TEXT, '
+                'PRIMARY KEY (project, zone, resource_type))')
+            self._db.commit()
+        gcp.add_mutation_listener(self._on_mutation)
+
+    def get(self, project, zone, resource_type, loader):
+        """
+        Return cached records, calling loader() to refresh them when missing or stale.
+
+        Args:
+            project (str): GCP project ID.
+            zone (str): Compute Engine zone, or None for project-wide listings.
+            resource_type (str): 'instances' or 'buckets'.
+            loader (callable): Returns an iterable of records for the key.
+
+        Returns:
+            list: The records.
+        """
+        key = (project, zone or '', resource_type)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                entry = self._load(key)
+                if entry is not None:
+                    self._store(key, entry)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                return entry[1]
+            generation = self._generations.setdefault(key, 0)
+
+        records = list(loader())
+        with self._lock:
+            if self._generations.get(key) != generation:
+                # Invalidated while loading: the listing may predate the change, so do not cache it
+                return records
+            self._store(key, (now, records))
+            if self._db is not None:
+                self._save(key, now, records)
+        return records
+
+    def invalidate(self, project=None, zone=None, resource_type=None):
+        """
+        Drop entries matching every given field; omitted fields match anything.
+
+        Args:
+            project (str): GCP project ID.
+            zone (str): Compute Engine zone.
+            resource_type (str): 'instances' or 'buckets'.
+        """
+        def matches(key):
+            return ((project is None or key[0] == project)
+                    and (zone is None or key[1] == zone)
+                    and (resource_type is None or key[2] == resource_type))
+
+        with self._lock:
+            for key in [key for key in self._entries if matches(key)]:
+                del self._entries[key]
+            for key in [key for key in self._generations if matches(key)]:
+                self._generations[key] += 1
+            if self._db is not None:
+                self._db.execute(
+                    'DELETE FROM inventory WHERE (? IS NULL OR project = ?) AND (? IS NULL OR zone = ?) '
+                    'AND (? IS NULL OR resource_type = ?)',
+                    (project, project, zone, zone, resource_type, resource_type))
+                self._db.commit()
+
+    def close(self):
+        """Stop listening for mutations and close the SQLite backing, if any."""
+        gcp.remove_mutation_listener(self._on_mutation)
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _on_mutation(self, resource_type, project, zone):
+        # A zonal change also makes the project-wide (aggregated) listing stale
+        if zone:
+            self.invalidate(project, zone, resource_type)
+        self.invalidate(project, '', resource_type)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key):
+        row = self._db.execute(
+            'SELECT stored_at, records FROM inventory WHERE project = ? AND zone = ? AND resource_type = ?',
+            key).fetchone()
+        if row is None:
+            return None
+        record_type = RECORD_TYPES.get(key[2])
+        records = json.loads(row[1])
+        if record_type is not None:
+            records = [record_type(**record) for record in records]
+        return row[0], records
+
+    def _save(self, key, stored_at, records):
+        payload = json.dumps([r._asdict() if hasattr(r, '_asdict') else r for r in records], default=str)
+        self._db.execute(
+            'INSERT OR REPLACE INTO inventory (project, zone, resource_type, stored_at, records) '
+            'VALUES (?, ?, ?, ?, ?)', key + (stored_at, payload))
+        self._db.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache(**options):
+    """
+    Return the process-wide inventory cache, creating it on first use.
+
+    Args:
+        **options: InventoryCache arguments, used only when the cache is created.
+
+    Returns:
+        InventoryCache: The shared cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = InventoryCache(**options)
+        return _cache
+
+
+def list_instances(project, zone=None, status=None, cache=None):
+    """
+    List instances through the inventory cache.
+
+    The full listing for (project, zone) is cached and status is matched locally, so
+    every status view shares one cached entry.
+
+    Args:
+        project (str): GCP project ID.
+        zone (str): Compute Engine zone, or None for all zones.
+        status (str): Optional instance status to match, e.g. 'RUNNING'.
+        cache (InventoryCache): Cache to use; defaults to the shared cache.
+
+    Returns:
+        list: InstanceRecord entries.
+    """
+    cache = cache or get_cache()
+    records = cache.get(project, zone, 'instances', lambda: gcp.iter_instances(project, zone))
+    if status:
+        records = [record for record in records if record.status == status]
+    return records
+
+
+def list_buckets(project=None, cache=None):
+    """
+    List buckets through the inventory cache.
+
+    Args:
+        project (str): GCP project ID the storage client is bound to; defaults to the
+            current target's (see gcp.use_target()).
+        cache (InventoryCache): Cache to use; defaults to the shared cache.
+
+    Returns:
+        list: BucketRecord entries.
+    """
+    cache = cache or get_cache()
+    key_path, default_project = gcp.current_target()
+    project = project or default_project
+
+    def load():
+        with gcp.use_target(key_path, project):
+            return list(gcp.iter_buckets())
+    return cache.get(project, None, 'buckets', load)
@@ -0,0 +1,489 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import gcp
+import metrics
+import operations
+import ratelimit
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.path.join(os.path.expanduser('~'), '.cloud-portal', 'jobs.db')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+WAITING = 'waiting'  # a cloud operation is in flight; no worker is held
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+Job = namedtuple('Job', 'id type params state result error attempts created updated')
+
+# How a job type runs. Plain jobs have run(params) -> result. Jobs backed by a Compute
+# Engine operation have start(params, job_id) -> operation reference, which is persisted
+# so polling can resume after a restart, and finish(params) -> result once it is done.
+JobType = namedtuple('JobType', 'run start finish', defaults=(None, None, None))
+
+# Jobs of a type running at once, per queue; types not listed share max_workers
+DEFAULT_LIMITS = {
+    'create_instance': 8,
+    'terminate_instance': 8,
+    'create_bucket': 4,
+    'delete_bucket': 2,
+    'upload_file': 2,
+    'upload_directory': 1,
+    'transcribe': 2,
+    'transcribe_gcs': 2,
+}
+
+
+def _compute_client():
+    compute_client, _ = gcp.initialize_clients()
+    if not compute_client:
+        raise RuntimeError("Compute Engine client is not available")
+    return compute_client
+
+
+def _start_create_instance(params, job_id):
+    from google.cloud import compute_v1
+
+    compute_client = _compute_client()
+    instance = gcp.build_instance_resource(
+        params['project'], params['zone'], params['instance_name'], params['machine_type'],
+        params['source_image'], params.get('network', 'default'), params.get('labels'))
+    # The job ID doubles as the request ID, so rerunning an interrupted job cannot insert twice
+    request = compute_v1.InsertInstanceRequest(
+        project=params['project'], zone=params['zone'], instance_resource=instance, request_id=job_id)
+    operation = ratelimit.call('compute', params['project'], compute_client.insert, request=request)
+    return {'project': params['project'], 'zone': params['zone'], 'name': operation.name}
+
+
+def _start_terminate_instance(params, job_id):
+    from google.cloud import compute_v1
+
+    compute_client = _compute_client()
+    request = compute_v1.DeleteInstanceRequest(
+        project=params['project'], zone=params['zone'], instance=params['instance_name'], request_id=job_id)
+    operation = ratelimit.call('compute', params['project'], compute_client.delete, request=request)
+    return {'project': params['project'], 'zone': params['zone'], 'name': operation.name}
+
+
+def _finish_instance(params):
+    gcp.notify_mutation('instances', params['project'], params['zone'])
+    return {'instance_name': params['instance_name']}
+
+
+def _create_bucket(params):
+    options = {key: value for key, value in params.items() if key != 'bucket_name'}
+    bucket = gcp.create_storage_bucket(params['bucket_name'], **options)
+    if bucket is None:
+        raise RuntimeError(f"Failed to create bucket {params['bucket_name']}")
+    return {'bucket_name': bucket.name}
+
+
+def _delete_bucket(params):
+    options = {key: value for key, value in params.items() if key != 'bucket_name'}
+    deleted = gcp.delete_storage_bucket(params['bucket_name'], **options)
+    if deleted is None:
+        raise RuntimeError(f"Failed to delete bucket {params['bucket_name']}")
+    return {'objects_deleted': deleted}
+
+
+def _upload_file(params):
+    import uploads
+
+    # Resumable-session state is persisted by uploads.py, so a rerun continues the upload
+    blob = uploads.upload_file(**params)
+    return {'blob_name': blob.name}
+
+
+def _upload_directory(params):
+    import uploads
+
+    return uploads.upload_directory(**params)
+
+
+def _transcribe(params):
+    import sppechtotext
+
+    return sppechtotext.transcribe_long_audio(**params)
+
+
+def _transcribe_gcs(params):
+    import sppechtotext
+
+    return sppechtotext.transcribe_gcs_audio(**params)
+
+
+JOB_TYPES = {
+    'create_instance': JobType(start=_start_create_instance, finish=_finish_instance),
+    'terminate_instance': JobType(start=_start_terminate_instance, finish=_finish_instance),
+    'create_bucket': JobType(run=_create_bucket),
+    'delete_bucket': JobType(run=_delete_bucket),
+    'upload_file': JobType(run=_upload_file),
+    'upload_directory': JobType(run=_upload_directory),
+    'transcribe': JobType(run=_transcribe),
+    'transcribe_gcs': JobType(run=_transcribe_gcs),
+}
+
+
+class JobQueue:
+    """
+    Durable queue of portal jobs with a thread pool that runs them in the background.
+
+    Jobs are stored in SQLite, so submit() returns a job ID at once and the job
+    outlives the process. Each job type has its own concurrency limit. Jobs backed by
+    a Compute Engine operation release their worker once the operation is started and
+    are finished by the shared operation poller; the operation reference is persisted,
+    so start() resumes polling it after a restart. Jobs that were running when the
+    process died are queued again (insert/delete request IDs and resumable uploads make
+    that safe), up to max_attempts times. One process should run the workers for a
+    database; any number may submit and read jobs.
+    """
+
+    def __init__(self, db_path=DB_PATH, max_workers=8, limits=None, key_path=None, max_attempts=3,
+                 operation_timeout=None, poll_interval=1.0):
+        """
+        Args:
+            db_path (str): SQLite file holding the jobs.
+            max_workers (int): Jobs running at once across all types.
+            limits (dict): Job type -> jobs of that type running at once; defaults to DEFAULT_LIMITS.
+            key_path (str): Service account key file the jobs run with, or None for gcp.KEY_PATH.
+            max_attempts (int): Times a job is started before an interruption fails it.
+            operation_timeout (float): Deadline for each cloud operation, or None for the poller default.
+            poll_interval (float): Seconds between checks for jobs submitted by other processes.
+        """
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.max_workers = max_workers
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.key_path = key_path
+        self.max_attempts = max_attempts
+        self.operation_timeout = operation_timeout
+        self.poll_interval = poll_interval
+        self._cond = threading.Condition(threading.RLock())
+        self._running = defaultdict(int)  # job type -> jobs holding a worker
+        self._pool = None
+        self._thread = None
+        self._closed = False
+        self._generation = 0  # bumped by every start(), so callbacks from an earlier run are ignored
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, type TEXT NOT NULL, params TEXT NOT NULL, state TEXT NOT NULL, '
+            'result TEXT, error TEXT, operation TEXT, attempts INTEGER NOT NULL DEFAULT 0, '
+            'created REAL NOT NULL, updated REAL NOT NULL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created)')
+        self._db.commit()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def submit(self, job_type, **params):
+        """
+        Queue a job and return without waiting for it.
+
+        Args:
+            job_type (str): One of JOB_TYPES.
+            **params: Arguments for the job; they must be JSON-serializable.
+
+        Returns:
+            str: The job ID.
+        """
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Unknown job type: {job_type}")
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._cond:
+            self._db.execute(
+                'INSERT INTO jobs (id, type, params, state, created, updated) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, job_type, json.dumps(params), QUEUED, now, now))
+            self._db.commit()
+            self._cond.notify_all()
+        logger.info(f"Queued {job_type} job {job_id}.")
+        return job_id
+
+    def get(self, job_id):
+        """
+        Return a job's current state.
+
+        Args:
+            job_id (str): The job ID.
+
+        Returns:
+            Job: The job, or None if there is no such job.
+        """
+        with self._cond:
+            row = self._db.execute(
+                'SELECT id, type, params, state, result, error, attempts, created, updated FROM jobs WHERE id = ?',
+                (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def list_jobs(self, state=None, job_type=None, limit=100):
+        """
+        Return the most recently submitted jobs.
+
+        Args:
+            state (str): Only jobs in this state.
+            job_type (str): Only jobs of this type.
+            limit (int): Maximum number of jobs returned.
+
+        Returns:
+            list: Job entries, newest first.
+        """
+        clauses, args = [], []
+        if state:
+            clauses.append('state = ?')
+            args.append(state)
+        if job_type:
+            clauses.append('type = ?')
+            args.append(job_type)
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        with self._cond:
+            rows = self._db.execute(
+                'SELECT id, type, params, state, result, error, attempts, created, updated FROM jobs'
+                f'{where} ORDER BY created DESC LIMIT ?', args + [limit]).fetchall()
+        return [self._job(row) for row in rows]
+
+    def cancel(self, job_id):
+        """
+        Cancel a job that has not started yet.
+
+        Returns:
+            bool: True if the job was cancelled.
+        """
+        with self._cond:
+            cursor = self._db.execute(
+                'UPDATE jobs SET state = ?, updated = ? WHERE id = ? AND state = ?',
+                (CANCELLED, time.time(), job_id, QUEUED))
+            self._db.commit()
+            self._cond.notify_all()
+        return cursor.rowcount == 1
+
+    def wait(self, job_id, timeout=None):
+        """
+        Block until a job finishes or the timeout passes.
+
+        Args:
+            job_id (str): The job ID.
+            timeout (float): Seconds to wait, or None to wait indefinitely.
+
+        Returns:
+            Job: The job in its latest state.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                job = self.get(job_id)
+                if job is None:
+                    raise KeyError(job_id)
+                if job.state in FINISHED:
+                    return job
+                remaining = self.poll_interval if deadline is None else deadline - time.monotonic()
+                if remaining <= 0:
+                    return job
+                self._cond.wait(min(remaining, self.poll_interval))
+
+    def start(self):
+        """
+        Recover jobs interrupted by a previous run and start the workers.
+
+        After stop(wait=False) this first waits for jobs still running on the old workers;
+        operations tracked by the old run are ignored once they finish, as recovery tracks
+        them again.
+        """
+        with self._cond:
+            if self._thread is not None:
+                return self
+            previous, self._pool = self._pool, None
+        if previous is not None:
+            # Let jobs still running after stop(wait=False) finish, or recovery would run them again
+            previous.shutdown(wait=True)
+        with self._cond:
+            if self._thread is not None:
+                return self
+            self._closed = False
+            self._generation += 1
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='jobs')
+            self._recover()
+            self._thread = threading.Thread(target=self._dispatch, name='job-dispatcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        """
+        Stop taking new jobs. Running jobs finish if wait is set; jobs waiting on an
+        operation stay in the database and are resumed by the next start().
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+            self._pool.shutdown(wait=wait)
+
+    def close(self):
+        """Stop the workers and close the database."""
+        self.stop()
+        with self._cond:
+            self._db.close()
+
+    @staticmethod
+    def _job(row):
+        job_id, job_type, params, state, result, error, attempts, created, updated = row
+        return Job(job_id, job_type, json.loads(params), state, json.loads(result) if result else None,
+                   error, attempts, created, updated)
+
+    def _update(self, job_id, state, result=None, error=None, operation=None):
+        with self._cond:
+            self._db.execute(
+                'UPDATE jobs SET state = ?, result = ?, error = ?, operation = ?, updated = ? WHERE id = ?',
+                (state, json.dumps(result, default=str) if result is not None else None, error,
+                 json.dumps(operation) if operation is not None else None, time.time(), job_id))
+            self._db.commit()
+            self._cond.notify_all()
+
+    def _recover(self):
+        now = time.time()
+        self._db.execute(
+            'UPDATE jobs SET state = ?, error = ?, updated = ? WHERE state = ? AND attempts >= ?',
+            (FAILED, 'Interrupted too many times', now, RUNNING, self.max_attempts))
+        requeued = self._db.execute(
+            'UPDATE jobs SET state = ?, updated = ? WHERE state = ?', (QUEUED, now, RUNNING)).rowcount
+        self._db.commit()
+        waiting = self._db.execute(
+            'SELECT id, type, params, operation FROM jobs WHERE state = ?', (WAITING,)).fetchall()
+        for job_id, job_type, params, operation in waiting:
+            self._track(self._generation, job_id, job_type, json.loads(params), json.loads(operation))
+        if requeued or waiting:
+            logger.info(f"Recovered jobs: {requeued} requeued, {len(waiting)} operations resumed.")
+
+    def _claim(self):
+        """Mark the oldest queued job whose type has capacity as running and return it."""
+        if sum(self._running.values()) >= self.max_workers:
+            return None
+        full = [job_type for job_type, count in self._running.items()
+                if count >= self.limits.get(job_type, self.max_workers)]
+        exclude = f" AND type NOT IN ({','.join('?' * len(full))})" if full else ''
+        row = self._db.execute(
+            'SELECT id, type, params, state, result, error, attempts, created, updated FROM jobs '
+            f'WHERE state = ?{exclude} ORDER BY created LIMIT 1', [QUEUED] + full).fetchone()
+        if row is None:
+            return None
+        job = self._job(row)
+        self._db.execute(
+            'UPDATE jobs SET state = ?, attempts = attempts + 1, updated = ? WHERE id = ?',
+            (RUNNING, time.time(), job.id))
+        self._db.commit()
+        self._running[job.type] += 1
+        return job
+
+    def _dispatch(self):
+        generation = self._generation
+        while True:
+            with self._cond:
+                job = None
+                while not self._closed:
+                    job = self._claim()
+                    if job is not None:
+                        break
+                    self._cond.wait(self.poll_interval)
+                if self._closed:
+                    return
+            self._pool.submit(self._execute, job, generation)
+
+    def _execute(self, job, generation):
+        job_type = JOB_TYPES[job.type]
+        try:
+            with gcp.use_target(self.key_path):
+                if job_type.start is not None:
+                    operation = job_type.start(job.params, job.id)
+                    self._update(job.id, WAITING, operation=operation)
+                    self._track(generation, job.id, job.type, job.params, operation)
+                else:
+                    self._succeeded(job.id, job.type, job_type.run(job.params))
+        except Exception as e:
+            self._failed(job.id, job.type, e)
+        finally:
+            with self._cond:
+                self._running[job.type] -= 1
+                self._cond.notify_all()
+
+    def _track(self, generation, job_id, job_type, params, operation):
+        poller = operations.get_poller(self.key_path or gcp.KEY_PATH)
+        future = poller.track(operation['project'], operation['name'], zone=operation.get('zone'),
+                              region=operation.get('region'), timeout=self.operation_timeout)
+        future.add_done_callback(partial(self._operation_done, generation, job_id, job_type, params))
+
+    def _operation_done(self, generation, job_id, job_type, params, future):
+        if self._closed or generation != self._generation:
+            # Left in the waiting state; the next start() resumes polling, or already has
+            return
+        try:
+            future.result()
+            finish = JOB_TYPES[job_type].finish
+            self._succeeded(job_id, job_type, finish(params) if finish else None)
+        except Exception as e:
+            self._failed(job_id, job_type, e)
+
+    def _succeeded(self, job_id, job_type, result):
+        self._update(job_id, SUCCEEDED, result=result)
+        if metrics.enabled:
+            metrics.JOBS.inc(1, job_type, SUCCEEDED)
+        logger.info(f"Job {job_id} ({job_type}) succeeded.")
+
+    def _failed(self, job_id, job_type, error):
+        self._update(job_id, FAILED, error=str(error))
+        if metrics.enabled:
+            metrics.JOBS.inc(1, job_type, FAILED)
+        logger.error(f"Job {job_id} ({job_type}) failed: {error}")
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue(**options):
+    """
+    Return the process-wide job queue, creating and starting it on first use.
+
+    Args:
+        **options: JobQueue arguments, used only when the queue is first created.
+
+    Returns:
+        JobQueue: The shared, running queue.
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(**options).start()
+        return _queue
+
+
+def submit(job_type, **params):
+    """
+    Queue a job on the shared queue.
+
+    Args:
+        job_type (str): One of JOB_TYPES.
+        **params: Arguments for the job.
+
+    Returns:
+        str: The job ID.
+    """
+    return get_queue().submit(job_type, **params)
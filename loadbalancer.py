@@ -0,0 +1,225 @@
+import logging
+import threading
+
+import clients
+import dag
+import gcp
+import operations
+import ratelimit
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Discovery collection and the name of its resource-name parameter, per graph node
+COLLECTIONS = {
+    'backend_bucket': ('backendBuckets', 'backendBucket'),
+    'url_map': ('urlMaps', 'urlMap'),
+    'http_proxy': ('targetHttpProxies', 'targetHttpProxy'),
+    'address': ('globalAddresses', 'address'),
+    'forwarding_rule': ('globalForwardingRules', 'forwardingRule'),
+}
+
+# Which nodes each node needs before it can be created. The static IP does not
+# depend on the bucket -> URL map -> proxy chain, so it is allocated alongside it.
+DEPENDENCIES = {
+    'backend_bucket': [],
+    'url_map': ['backend_bucket'],
+    'http_proxy': ['url_map'],
+    'address': [],
+    'forwarding_rule': ['http_proxy', 'address'],
+}
+
+# Service account credentials cannot be refreshed without an explicit scope
+SCOPES = ['https://www.googleapis.com/auth/compute']
+
+_local = threading.local()
+
+
+def _http(key_path):
+    """Return this thread's authorized HTTP object for a key file; httplib2 connections are not thread-safe."""
+    https = getattr(_local, 'https', None)
+    if https is None:
+        https = _local.https = {}
+    http = https.get(key_path)
+    if http is None:
+        import google_auth_httplib2
+        import httplib2
+        credentials = clients.registry.credentials(key_path, SCOPES)
+        http = https[key_path] = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+    return http
+
+
+def _service(project):
+    """Return the discovery service and key file for the current target; tasks run on other threads."""
+    key_path, _ = gcp.current_target()
+    return clients.get_client('compute_discovery', source=key_path, project=project, scopes=SCOPES), key_path
+
+
+def resource_names(backend_bucket_name):
+    """
+    Return the resource name used for each node of a load balancer stack.
+
+    Args:
+        backend_bucket_name (str): Name for the backend bucket; other names derive from it.
+
+    Returns:
+        dict: Node -> resource name.
+    """
+    return {
+        'backend_bucket': backend_bucket_name,
+        'url_map': "url-map-" + backend_bucket_name,
+        'http_proxy': "target-http-proxy-" + backend_bucket_name,
+        'address': "ip-" + backend_bucket_name,
+        'forwarding_rule': "forwarding-rule-" + backend_bucket_name,
+    }
+
+
+def _bodies(project, bucket_name, names):
+    """Return callables building each node's insert body from the results of its dependencies."""
+    return {
+        'backend_bucket': lambda results: {
+            "name": names['backend_bucket'],
+            "bucketName": bucket_name,
+            "enableCdn": True
+        },
+        'url_map': lambda results: {
+            "name": names['url_map'],
+            "defaultService": f"projects/{project}/global/backendBuckets/{names['backend_bucket']}"
+        },
+        'http_proxy': lambda results: {
+            "name": names['http_proxy'],
+            "urlMap": f"projects/{project}/global/urlMaps/{names['url_map']}"
+        },
+        'address': lambda results: {
+            "name": names['address'],
+            "addressType": "EXTERNAL",
+            "description": "Load balancer IP"
+        },
+        'forwarding_rule': lambda results: {
+            "name": names['forwarding_rule'],
+            "IPAddress": results['address']['address'],
+            "IPProtocol": "TCP",
+            "portRange": "80",
+            "target": f"projects/{project}/global/targetHttpProxies/{names['http_proxy']}"
+        },
+    }
+
+
+def _get(service, key_path, node, project, name):
+    from googleapiclient.errors import HttpError
+
+    collection, param = COLLECTIONS[node]
+    try:
+        request = getattr(service, collection)().get(project=project, **{param: name})
+        return ratelimit.call('compute', project, request.execute, http=_http(key_path))
+    except HttpError as e:
+        if e.resp.status == 404:
+            return None
+        raise
+
+
+def _ensure(service, key_path, node, project, name, build_body, timeout):
+    """Create a node's resource unless it already exists, wait for it, and return the resource."""
+    def task(results):
+        from googleapiclient.errors import HttpError
+
+        existing = _get(service, key_path, node, project, name)
+        if existing is not None:
+            logger.info(f"Reusing existing {node} '{name}'.")
+            return existing
+        collection, _ = COLLECTIONS[node]
+        try:
+            request = getattr(service, collection)().insert(project=project, body=build_body(results))
+            operation = ratelimit.call('compute', project, request.execute, http=_http(key_path))
+            operations.get_poller(key_path).wait(project, operation['name'], timeout=timeout)
+        except HttpError as e:
+            # Another run created it between our get and insert
+            if e.resp.status != 409:
+                raise
+        logger.info(f"Created {node} '{name}'.")
+        return _get(service, key_path, node, project, name)
+    return task
+
+
+def _remove(service, key_path, node, project, name, timeout):
+    """Delete a node's resource if it exists and wait for the deletion to finish."""
+    def task(results):
+        from googleapiclient.errors import HttpError
+
+        collection, param = COLLECTIONS[node]
+        try:
+            request = getattr(service, collection)().delete(project=project, **{param: name})
+            operation = ratelimit.call('compute', project, request.execute, http=_http(key_path))
+        except HttpError as e:
+            if e.resp.status == 404:
+                return False
+            raise
+        operations.get_poller(key_path).wait(project, operation['name'], timeout=timeout)
+        logger.info(f"Deleted {node} '{name}'.")
+        return True
+    return task
+
+
+def existing_resources(project, backend_bucket_name):
+    """
+    Look up which resources of a load balancer stack already exist, without changing anything.
+
+    Args:
+        project (str): GCP project ID.
+        backend_bucket_name (str): Name of the backend bucket the stack is built for.
+
+    Returns:
+        dict: Node -> resource dict, or None for nodes that do not exist.
+    """
+    service, key_path = _service(project)
+    names = resource_names(backend_bucket_name)
+    return {node: _get(service, key_path, node, project, names[node]) for node in DEPENDENCIES}
+
+
+def create_load_balancer(project, bucket_name, backend_bucket_name, timeout=None, max_workers=5):
+    """
+    Create (or complete) a CDN-enabled HTTP load balancer in front of a Cloud Storage bucket.
+
+    The resources form a dependency graph: independent branches run concurrently and
+    each node waits for its own global operation. Resources that already exist are
+    reused, so rerunning after a partial failure picks up where it stopped.
+
+    Args:
+        project (str): GCP project ID.
+        bucket_name (str): Name of the Cloud Storage bucket.
+        backend_bucket_name (str): Name for the backend bucket.
+        timeout (float): Per-operation deadline in seconds.
+        max_workers (int): Nodes created at once.
+
+    Returns:
+        tuple: (results, errors) keyed by node; results hold the resource dicts.
+    """
+    service, key_path = _service(project)
+    names = resource_names(backend_bucket_name)
+    bodies = _bodies(project, bucket_name, names)
+    tasks = {node: _ensure(service, key_path, node, project, names[node], bodies[node], timeout)
+             for node in DEPENDENCIES}
+    return dag.run_dag(tasks, DEPENDENCIES, max_workers=max_workers)
+
+
+def delete_load_balancer(project, backend_bucket_name, timeout=None, max_workers=5):
+    """
+    Tear down a load balancer created by create_load_balancer().
+
+    Walks the graph in reverse: a resource is deleted once everything that refers
+    to it is gone, and independent resources are deleted in parallel. Resources
+    that do not exist are skipped.
+
+    Args:
+        project (str): GCP project ID.
+        backend_bucket_name (str): Name of the backend bucket the stack was built for.
+        timeout (float): Per-operation deadline in seconds.
+        max_workers (int): Nodes deleted at once.
+
+    Returns:
+        tuple: (results, errors) keyed by node; results are True if the node was deleted.
+    """
+    service, key_path = _service(project)
+    names = resource_names(backend_bucket_name)
+    tasks = {node: _remove(service, key_path, node, project, names[node], timeout) for node in DEPENDENCIES}
+    return dag.run_dag(tasks, dag.reverse_dependencies(DEPENDENCIES), max_workers=max_workers)
@@ -0,0 +1,205 @@
+import bisect
+import contextlib
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Set CLOUD_PORTAL_METRICS=0 to turn instrumentation off; callers then skip all bookkeeping
+enabled = os.environ.get('CLOUD_PORTAL_METRICS', '1') != '0'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_metrics = []
+_tracer = None
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount=1, *labels):
+        """Add amount to the series identified by the label values, in labelnames order."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets and labels."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, *labels):
+        """Record one observation for the series identified by the label values."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+API_CALLS = Counter('cloud_api_calls_total', 'API call attempts by outcome.', ('api', 'method', 'outcome'))
+API_LATENCY = Histogram('cloud_api_call_duration_seconds', 'Latency of individual API call attempts.',
+                        ('api', 'method'))
+API_RETRIES = Counter('cloud_api_retries_total', 'API call attempts that were retried.', ('api', 'method'))
+RATE_LIMIT_WAIT = Histogram('cloud_ratelimit_wait_seconds', 'Time spent waiting for a rate-limit token.', ('api',))
+OPERATION_WAIT = Histogram('cloud_operation_wait_seconds', 'Time from tracking an operation to its completion.',
+                           ('scope', 'outcome'))
+OPERATION_POLLS = Counter('cloud_operation_polls_total', 'Operation status polls.', ('scope',))
+UPLOADED_BYTES = Counter('cloud_storage_uploaded_bytes_total', 'Bytes uploaded to Cloud Storage.')
+TRANSCRIBED_BYTES = Counter('cloud_speech_audio_bytes_total', 'Audio bytes sent for transcription.')
+TRANSCRIBED_SECONDS = Counter('cloud_speech_audio_seconds_total', 'Seconds of audio sent for transcription.')
+JOBS = Counter('cloud_portal_jobs_total', 'Background jobs finished, by type and outcome.', ('type', 'outcome'))
+WARM_POOL_HANDOUTS = Counter('cloud_warm_pool_handouts_total', 'Instances handed out, from the pool (hit) or created (miss).',
+                             ('zone', 'outcome'))
+WARM_POOL_HANDOUT_LATENCY = Histogram('cloud_warm_pool_handout_seconds', 'Time to hand out a running instance.',
+                                      ('outcome',))
+
+
+def method_name(func):
+    """
+    Return a readable method label for an API call.
+
+    googleapiclient requests expose their methodId (e.g. 'compute.urlMaps.insert');
+    other callables use their qualified name (e.g. 'InstancesClient.insert').
+    """
+    owner = getattr(func, '__self__', None)
+    method_id = getattr(owner, 'methodId', None)
+    if method_id:
+        return method_id
+    name = getattr(func, '__qualname__', None) or type(func).__name__
+    return name.replace('<locals>.', '')
+
+
+def enable_tracing(tracer_name='cloud-portal'):
+    """
+    Emit OpenTelemetry spans around API calls, if opentelemetry-api is installed.
+
+    Returns:
+        bool: True if tracing was enabled.
+    """
+    global _tracer
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.warning("opentelemetry-api is not installed; tracing stays off.")
+        return False
+    _tracer = trace.get_tracer(tracer_name)
+    return True
+
+
+def disable_tracing():
+    """Stop emitting OpenTelemetry spans."""
+    global _tracer
+    _tracer = None
+
+
+def span(name, **attributes):
+    """Return a span context manager, or a shared no-op one when tracing is off."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def render():
+    """
+    Render every metric in the Prometheus text exposition format.
+
+    Returns:
+        str: The exposition text.
+    """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def serve(port=9464, address=''):
+    """
+    Serve /metrics over HTTP from a daemon thread.
+
+    Args:
+        port (int): Port to listen on.
+        address (str): Address to bind; all interfaces by default.
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it.
+    """
+    server = ThreadingHTTPServer((address, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f"Serving metrics on port {server.server_address[1]}.")
+    return server
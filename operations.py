@@ -0,0 +1,246 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+
+import clients
+import metrics
+import ratelimit
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class OperationError(Exception):
+    """Raised when a Compute Engine operation finishes with an error."""
+
+
+class OperationTimeout(OperationError, TimeoutError):
+    """Raised when an operation does not finish before its deadline."""
+
+
+class _PendingOperation:
+    def __init__(self, project, name, zone, region, deadline, interval):
+        self.project = project
+        self.name = name
+        self.zone = zone
+        self.region = region
+        self.deadline = deadline
+        self.interval = interval
+        self.next_poll = time.monotonic()
+        self.started = self.next_poll
+        self.future = Future()
+
+    @property
+    def scope(self):
+        return 'zone' if self.zone else 'region' if self.region else 'global'
+
+
+def _is_done(result):
+    """True once an operation has finished; Status enums and plain strings both carry the name."""
+    return getattr(result.status, 'name', result.status) == 'DONE'
+
+
+def _resolve(future, result=None, exception=None):
+    """Resolve a future unless the caller cancelled it first."""
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+def _operation_error(result):
+    """Return an OperationError for a finished operation, or None if it succeeded."""
+    errors = getattr(result.error, 'errors', None) if result.error else None
+    if not errors:
+        return None
+    messages = '; '.join(f"{e.code}: {e.message}" for e in errors)
+    return OperationError(f"Operation {result.name} failed: {messages}")
+
+
+class OperationPoller:
+    """
+    Shared tracker for pending zone, region and global Compute Engine operations.
+
+    One background thread polls every pending operation together. Each operation
+    backs off exponentially (with jitter) between polls, up to max_interval, and
+    fails with OperationTimeout once its deadline passes. Callers get a
+    concurrent.futures.Future that resolves to the finished Operation or raises.
+    """
+
+    def __init__(self, source=None, min_interval=0.5, max_interval=10.0, timeout=600.0, max_workers=8):
+        """
+        Args:
+            source (str): Service account key file for the operations clients, or None for ADC.
+            min_interval (float): Delay before the first poll of an operation, in seconds.
+            max_interval (float): Upper bound on the delay between polls, in seconds.
+            timeout (float): Default per-operation deadline, in seconds.
+            max_workers (int): Number of polls issued in parallel.
+        """
+        self.source = source
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self._pending = []
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._thread = None
+        self._closed = False
+
+    def track(self, project, operation_name, zone=None, region=None, timeout=None):
+        """
+        Start tracking an operation.
+
+        Args:
+            project (str): GCP project ID.
+            operation_name (str): Name of the operation.
+            zone (str): Zone for zonal operations.
+            region (str): Region for regional operations. Global if neither is set.
+            timeout (float): Per-operation deadline in seconds; defaults to the poller's.
+
+        Returns:
+            Future: Resolves to the finished Operation, or raises OperationError.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        pending = _PendingOperation(project, operation_name, zone, region,
+                                    time.monotonic() + timeout, self.min_interval)
+        pending.next_poll += self.min_interval
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Operation poller is closed")
+            self._pending.append(pending)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='operation-poller', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return pending.future
+
+    def wait(self, project, operation_name, zone=None, region=None, timeout=None):
+        """
+        Block until an operation finishes.
+
+        Returns:
+            Operation: The finished operation; raises OperationError on failure or timeout.
+        """
+        return self.track(project, operation_name, zone=zone, region=region, timeout=timeout).result()
+
+    def close(self):
+        """Stop the polling thread and fail any operations still pending."""
+        with self._cond:
+            self._closed = True
+            pending, self._pending = self._pending, []
+            self._cond.notify()
+        for op in pending:
+            _resolve(op.future, exception=OperationError(f"Poller closed while waiting for {op.name}"))
+        if self._thread is not None:
+            self._thread.join()
+        self._pool.shutdown(wait=False)
+
+    def _get(self, op):
+        if op.zone:
+            client = clients.get_client('zone_operations', source=self.source, project=op.project)
+            return ratelimit.call('compute', op.project, client.get,
+                                  project=op.project, zone=op.zone, operation=op.name)
+        if op.region:
+            client = clients.get_client('region_operations', source=self.source, project=op.project)
+            return ratelimit.call('compute', op.project, client.get,
+                                  project=op.project, region=op.region, operation=op.name)
+        client = clients.get_client('global_operations', source=self.source, project=op.project)
+        return ratelimit.call('compute', op.project, client.get, project=op.project, operation=op.name)
+
+    def _poll(self, op):
+        if metrics.enabled:
+            metrics.OPERATION_POLLS.inc(1, op.scope)
+        try:
+            return self._get(op), None
+        except Exception as e:
+            return None, e
+
+    def _run(self):
+        try:
+            self._loop()
+        except Exception as e:
+            # Without this thread nothing would ever resolve the pending futures
+            logger.error(f"Operation poller failed: {e}")
+            with self._cond:
+                pending, self._pending = self._pending, []
+                # The next track() starts a fresh thread
+                self._thread = None
+            for op in pending:
+                _resolve(op.future, exception=OperationError(f"Poller failed while waiting for {op.name}: {e}"))
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    self._pending = [op for op in self._pending if not op.future.cancelled()]
+                    if self._pending:
+                        now = time.monotonic()
+                        wake = min(min(op.next_poll, op.deadline) for op in self._pending)
+                        if wake <= now:
+                            break
+                        self._cond.wait(wake - now)
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+                now = time.monotonic()
+                expired = [op for op in self._pending if op.deadline <= now]
+                due = [op for op in self._pending if op.next_poll <= now and op.deadline > now]
+
+            for op in expired:
+                self._finish(op, exception=OperationTimeout(f"Timed out waiting for operation {op.name}"))
+
+            for op, (result, error) in zip(due, self._pool.map(self._poll, due)):
+                if error is not None:
+                    logger.error(f"Error while polling operation {op.name}: {error}")
+                    self._finish(op, exception=error)
+                elif _is_done(result):
+                    failure = _operation_error(result)
+                    if failure:
+                        self._finish(op, exception=failure)
+                    else:
+                        self._finish(op, result=result)
+                else:
+                    op.interval = min(op.interval * 2, self.max_interval)
+                    op.next_poll = time.monotonic() + random.uniform(op.interval / 2, op.interval)
+
+    def _finish(self, op, result=None, exception=None):
+        with self._cond:
+            # Whoever takes the op off the pending list resolves it; close() may have got there first
+            if op not in self._pending:
+                return
+            self._pending.remove(op)
+        if op.future.done():
+            return
+        if metrics.enabled:
+            # Time spent waiting on GCP to finish the work, separate from API call latency
+            outcome = 'timeout' if isinstance(exception, OperationTimeout) else 'error' if exception else 'done'
+            metrics.OPERATION_WAIT.observe(time.monotonic() - op.started, op.scope, outcome)
+        # The caller may have cancelled it since the check above
+        _resolve(op.future, result, exception)
+
+
+_pollers = {}
+_pollers_lock = threading.Lock()
+
+
+def get_poller(source=None):
+    """
+    Return the shared operation poller for a credentials source.
+
+    Args:
+        source (str): Service account key file, or None for ADC.
+
+    Returns:
+        OperationPoller: The process-wide poller for that source.
+    """
+    with _pollers_lock:
+        poller = _pollers.get(source)
+        if poller is None:
+            poller = _pollers[source] = OperationPoller(source)
+        return poller
@@ -0,0 +1,277 @@
+import logging
+import random
+import threading
+import time
+
+import metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Default (requests per second, burst) per API; tune to the project's quotas
+DEFAULT_RATES = {
+    'compute': (20.0, 40),
+    'storage': (100.0, 200),
+    'sheets': (1.0, 10),
+    'translate': (10.0, 20),
+    'speech': (5.0, 10),
+}
+
+# HTTP statuses worth retrying
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+QUOTA_STATUSES = {429}
+
+
+class CircuitOpenError(Exception):
+    """Raised when calls to an API are short-circuited after sustained failures."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with additive-increase / multiplicative-decrease.
+
+    The refill rate halves on every quota error and creeps back towards the
+    configured rate on success, so callers settle just under the real quota.
+    """
+
+    def __init__(self, rate, burst, min_rate=0.1):
+        """
+        Args:
+            rate (float): Tokens added per second.
+            burst (int): Maximum tokens held.
+            min_rate (float): Floor for the adaptive rate.
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available, then take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+
+    def throttle(self):
+        """Halve the rate after a quota error."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def relax(self):
+        """Raise the rate slightly after a success, up to the configured rate."""
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive server or connection failures and
+    lets a single trial call through once reset_timeout has passed.
+    """
+
+    def __init__(self, failure_threshold=10, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before_call(self, name):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial:
+                raise CircuitOpenError(f"Circuit open for {name} after {self._failures} consecutive failures")
+            self._trial = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+def error_status(error):
+    """
+    Return the HTTP status of an API error, or None.
+
+    Handles google.api_core exceptions (code) and googleapiclient HttpError (resp.status).
+    """
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    return int(status) if status is not None else None
+
+
+def retry_after(error):
+    """Return the Retry-After delay in seconds carried by an API error, or None."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or getattr(error, 'resp', None)
+    value = headers.get('retry-after') or headers.get('Retry-After') if headers else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    """True for quota, server and connection errors."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if type(error).__name__ in ('ConnectionError', 'Timeout', 'ConnectTimeout', 'ReadTimeout'):
+        return True
+    return error_status(error) in RETRYABLE_STATUSES
+
+
+class QuotaGuard:
+    """
+    Per-API, per-project rate limiting, retries and circuit breaking.
+
+    Every call first takes a token from the (api, project) bucket. Retryable errors
+    are retried with decorrelated-jitter backoff, never sooner than the server's
+    Retry-After. Quota errors slow the bucket down instead of counting towards the
+    circuit breaker, which only trips on sustained server or connection failures.
+    """
+
+    def __init__(self, rates=None, max_attempts=8, base_delay=0.5, max_delay=60.0,
+                 failure_threshold=10, reset_timeout=30.0):
+        self.rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._buckets = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def configure(self, api, rate, burst, project=None):
+        """
+        Set the rate for an API, for one project or (without project) as the default.
+
+        Args:
+            api (str): API name, e.g. 'compute'.
+            rate (float): Requests per second.
+            burst (int): Maximum burst size.
+            project (str): GCP project ID, or None for the API default.
+        """
+        with self._lock:
+            if project is None:
+                self.rates[api] = (rate, burst)
+                for key in [key for key in self._buckets if key[0] == api]:
+                    del self._buckets[key]
+            else:
+                self._buckets[(api, project)] = TokenBucket(rate, burst)
+
+    def _state(self, api, project):
+        key = (api, project)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate, burst = self.rates.get(api, (10.0, 20))
+                bucket = self._buckets[key] = TokenBucket(rate, burst)
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return bucket, breaker
+
+    def call(self, api, project, func, /, *args, **kwargs):
+        """
+        Call func(*args, **kwargs) under the (api, project) quota.
+
+        Args:
+            api (str): API name, e.g. 'compute', 'storage', 'sheets'.
+            project (str): Project the quota is counted against, or None.
+            func (callable): The API call.
+
+        Returns:
+            The call's return value; the last error is raised if retries run out.
+        """
+        bucket, breaker = self._state(api, project)
+        name = f"{api}/{project}" if project else api
+        instrumented = metrics.enabled
+        method = metrics.method_name(func) if instrumented else None
+        delay = self.base_delay
+        for attempt in range(1, self.max_attempts + 1):
+            breaker.before_call(name)
+            if instrumented:
+                start = time.perf_counter()
+                bucket.acquire()
+                metrics.RATE_LIMIT_WAIT.observe(time.perf_counter() - start, api)
+                start = time.perf_counter()
+            else:
+                bucket.acquire()
+            try:
+                with metrics.span(f"{api}.call", api=api, project=project or '', attempt=attempt):
+                    result = func(*args, **kwargs)
+            except Exception as e:
+                if instrumented:
+                    metrics.API_LATENCY.observe(time.perf_counter() - start, api, method)
+                    metrics.API_CALLS.inc(1, api, method, str(error_status(e) or type(e).__name__))
+                if not is_retryable(e):
+                    breaker.record_success()
+                    raise
+                status = error_status(e)
+                if status in QUOTA_STATUSES:
+                    bucket.throttle()
+                else:
+                    breaker.record_failure()
+                if attempt == self.max_attempts:
+                    raise
+                if instrumented:
+                    metrics.API_RETRIES.inc(1, api, method)
+                delay = min(self.max_delay, random.uniform(self.base_delay, delay * 3))
+                wait = max(delay, retry_after(e) or 0)
+                logger.warning(f"{name} call failed ({status or type(e).__name__}), "
+                               f"retrying in {wait:.1f}s (attempt {attempt}/{self.max_attempts})")
+                time.sleep(wait)
+            else:
+                if instrumented:
+                    metrics.API_LATENCY.observe(time.perf_counter() - start, api, method)
+                    metrics.API_CALLS.inc(1, api, method, 'ok')
+                breaker.record_success()
+                bucket.relax()
+                return result
+
+
+guard = QuotaGuard()
+
+
+def call(api, project, func, /, *args, **kwargs):
+    """
+    Call func through the process-wide QuotaGuard.
+
+    Args:
+        api (str): API name, e.g. 'compute', 'storage', 'sheets', 'translate', 'speech'.
+        project (str): Project the quota is counted against, or None.
+        func (callable): The API call.
+
+    Returns:
+        The call's return value.
+    """
+    return guard.call(api, project, func, *args, **kwargs)
+
+
+def configure(api, rate, burst, project=None):
+    """Set the rate for an API on the process-wide QuotaGuard."""
+    guard.configure(api, rate, burst, project)
@@ -0,0 +1,445 @@
+import argparse
+import json
+import logging
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import dag
+import gcp
+import inventory_cache
+import uploads
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Label marking resources the reconciler owns; only these are ever pruned
+MANAGED_LABEL = ('managed-by', 'cloud-portal')
+
+# One planned change. kind is 'create', 'update', 'replace', 'delete' or 'upload';
+# changes maps field -> (current, desired); run() applies it and raises on failure.
+Action = namedtuple('Action', 'key kind resource name changes depends_on run')
+
+_SYMBOLS = {'create': '+', 'update': '~', 'replace': '-/+', 'delete': '-', 'upload': '^'}
+
+
+def load_spec(path):
+    """
+    Read a desired-state spec from a JSON file.
+
+    A spec looks like:
+        {
+            "project": "my-project",
+            "prune": false,
+            "instances": [{"name", "zone", "machine_type", "source_image", "network", "labels"}],
+            "buckets": [{"name", "location", "storage_class", "labels"}],
+            "uploads": [{"bucket", "source", "prefix"}],
+            "load_balancers": [{"bucket", "backend_bucket"}]
+        }
+
+    Args:
+        path (str): Path to the JSON file.
+
+    Returns:
+        dict: The spec.
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+# Fields identifying an entry of each spec section; no two entries may share them
+_IDENTITY = {
+    'instances': lambda item: f"instance:{item['zone']}/{item['name']}",
+    'buckets': lambda item: f"bucket:{item['name']}",
+    'uploads': lambda item: f"upload:{item['bucket']}/{item.get('prefix', '')}",
+    'load_balancers': lambda item: f"load_balancer:{item['backend_bucket']}",
+}
+
+
+def validate_spec(spec):
+    """
+    Reject a spec that lists the same resource twice.
+
+    Each resource becomes one action keyed by its identity, so a duplicate would
+    silently replace the other entry's action.
+
+    Args:
+        spec (dict): Desired state; see load_spec().
+
+    Raises:
+        ValueError: If two entries of a section share an identity.
+    """
+    for section, identity in _IDENTITY.items():
+        seen = set()
+        for item in spec.get(section, []):
+            key = identity(item)
+            if key in seen:
+                raise ValueError(f"Duplicate {section} entry in spec: {key}")
+            seen.add(key)
+
+
+def _managed(labels):
+    labels = {key: str(value) for key, value in (labels or {}).items()}
+    labels[MANAGED_LABEL[0]] = MANAGED_LABEL[1]
+    return labels
+
+
+def _is_managed(labels):
+    return (labels or {}).get(MANAGED_LABEL[0]) == MANAGED_LABEL[1]
+
+
+def _check(result, message):
+    if not result:
+        raise RuntimeError(message)
+    return result
+
+
+def _single(results, message):
+    """Return the one result of create_instances()/terminate_instances(), raising if it failed."""
+    results = list(results)
+    if not results or not results[0]['success']:
+        raise RuntimeError(f"{message}: {results[0]['error'] if results else 'Compute client unavailable'}")
+    return results[0]
+
+
+def _create_instance(spec):
+    return _single(gcp.create_instances([spec]), f"Failed to create {spec['instance_name']}")
+
+
+def _delete_instance(project, zone, name):
+    target = {'project': project, 'zone': zone, 'instance_name': name}
+    return _single(gcp.terminate_instances([target]), f"Failed to delete {name}")
+
+
+def _replace_instance(spec):
+    _delete_instance(spec['project'], spec['zone'], spec['instance_name'])
+    return _create_instance(spec)
+
+
+def _update_instance_labels(project, zone, name, labels):
+    return _check(gcp.set_instance_labels(project, zone, name, labels), f"Failed to update labels of {name}")
+
+
+def _create_bucket(name, location, storage_class, labels):
+    return _check(gcp.create_storage_bucket(name, location, storage_class, labels), f"Failed to create bucket {name}")
+
+
+def _update_bucket(name, storage_class, labels):
+    return _check(gcp.update_storage_bucket(name, storage_class, labels), f"Failed to update bucket {name}")
+
+
+def _delete_bucket(name):
+    deleted = gcp.delete_storage_bucket(name)
+    return _check(deleted is not None, f"Failed to delete bucket {name}") and deleted
+
+
+def _create_load_balancer(project, bucket, backend, domain):
+    return _check(gcp.create_load_balancer(project, bucket, backend, domain),
+                  f"Failed to create load balancer {backend}")
+
+
+def plan_instances(project, desired, current, prune=False):
+    """
+    Diff desired instances against inventory records.
+
+    A different machine type replaces the instance; different labels are updated in
+    place. With prune, managed instances missing from the spec are deleted.
+
+    Args:
+        project (str): GCP project ID.
+        desired (list): Instance entries from the spec.
+        current (list): InstanceRecord entries for the project.
+        prune (bool): Delete managed instances that are not in the spec.
+
+    Returns:
+        list: Actions.
+    """
+    existing = {(record.zone, record.name): record for record in current}
+    actions = []
+    for item in desired:
+        zone, name = item['zone'], item['name']
+        labels = _managed(item.get('labels'))
+        spec = {
+            'project': project, 'zone': zone, 'instance_name': name, 'machine_type': item['machine_type'],
+            'source_image': item['source_image'], 'network': item.get('network', 'default'), 'labels': labels,
+        }
+        key = f"instance:{zone}/{name}"
+        record = existing.pop((zone, name), None)
+        if record is None:
+            actions.append(Action(key, 'create', 'instance', f"{zone}/{name}", {}, (), partial(_create_instance, spec)))
+        elif record.machine_type != item['machine_type']:
+            changes = {'machine_type': (record.machine_type, item['machine_type'])}
+            actions.append(Action(key, 'replace', 'instance', f"{zone}/{name}", changes, (),
+                                  partial(_replace_instance, spec)))
+        elif dict(record.labels) != labels:
+            changes = {'labels': (dict(record.labels), labels)}
+            actions.append(Action(key, 'update', 'instance', f"{zone}/{name}", changes, (),
+                                  partial(_update_instance_labels, project, zone, name, labels)))
+
+    if prune:
+        for (zone, name), record in existing.items():
+            if _is_managed(record.labels):
+                actions.append(Action(f"instance:{zone}/{name}", 'delete', 'instance', f"{zone}/{name}", {}, (),
+                                      partial(_delete_instance, project, zone, name)))
+    return actions
+
+
+def plan_buckets(desired, current, prune=False):
+    """
+    Diff desired buckets against inventory records.
+
+    Storage class and labels are patched in place. A bucket cannot move location, so
+    a location mismatch is only reported. With prune, managed buckets missing from the
+    spec are emptied and deleted.
+
+    Args:
+        desired (list): Bucket entries from the spec.
+        current (list): BucketRecord entries.
+        prune (bool): Delete managed buckets that are not in the spec.
+
+    Returns:
+        list: Actions.
+    """
+    existing = {record.name: record for record in current}
+    actions = []
+    for item in desired:
+        name = item['name']
+        location = item.get('location', 'US')
+        storage_class = item.get('storage_class', 'STANDARD')
+        labels = _managed(item.get('labels'))
+        key = f"bucket:{name}"
+        record = existing.pop(name, None)
+        if record is None:
+            actions.append(Action(key, 'create', 'bucket', name, {}, (),
+                                  partial(_create_bucket, name, location, storage_class, labels)))
+            continue
+        if (record.location or '').upper() != location.upper():
+            logger.warning(f"Bucket {name} is in {record.location}, not {location}; buckets cannot be moved.")
+        changes = {}
+        if record.storage_class != storage_class:
+            changes['storage_class'] = (record.storage_class, storage_class)
+        if dict(record.labels or {}) != labels:
+            changes['labels'] = (dict(record.labels or {}), labels)
+        if changes:
+            run = partial(_update_bucket, name,
+                          storage_class if 'storage_class' in changes else None,
+                          labels if 'labels' in changes else None)
+            actions.append(Action(key, 'update', 'bucket', name, changes, (), run))
+
+    if prune:
+        for name, record in existing.items():
+            if _is_managed(record.labels):
+                actions.append(Action(f"bucket:{name}", 'delete', 'bucket', name, {}, (),
+                                      partial(_delete_bucket, name)))
+    return actions
+
+
+def _upload(bucket, files):
+    result = uploads.upload_files(bucket, files)
+    if result['failed']:
+        raise RuntimeError(f"{len(result['failed'])} of {len(files)} uploads to {bucket} failed")
+    return result
+
+
+def plan_uploads(desired, created_buckets, max_workers=8):
+    """
+    Find the local files whose remote copy is missing or different.
+
+    Each entry costs one paged listing; files are hashed only when their size matches
+    the remote object. Files going to a bucket the plan creates all need uploading.
+
+    Args:
+        desired (list): Upload entries from the spec.
+        created_buckets (set): Names of buckets the plan creates.
+        max_workers (int): Files hashed at once.
+
+    Returns:
+        list: Actions.
+    """
+    actions = []
+    for item in desired:
+        bucket, prefix = item['bucket'], item.get('prefix', '')
+        files = uploads.local_files(item['source'], prefix)
+        if bucket in created_buckets:
+            stale = files
+        else:
+            try:
+                remote = uploads.list_remote_objects(bucket, prefix)
+            except Exception as e:
+                logger.warning(f"Could not list gs://{bucket}/{prefix}: {e}")
+                remote = {}
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                current = list(pool.map(lambda file: uploads.is_current(file[0], remote.get(file[1])), files))
+            stale = [file for file, is_current in zip(files, current) if not is_current]
+        if stale:
+            depends_on = (f"bucket:{bucket}",) if bucket in created_buckets else ()
+            changes = {'files': (len(files) - len(stale), len(files))}
+            actions.append(Action(f"upload:{bucket}/{prefix}", 'upload', 'upload', f"gs://{bucket}/{prefix}",
+                                  changes, depends_on, partial(_upload, bucket, stale)))
+    return actions
+
+
+def plan_load_balancers(project, desired, created_buckets):
+    """
+    Find load balancer stacks with missing resources.
+
+    Creation reuses whatever already exists, so a partial stack is completed rather
+    than rebuilt.
+
+    Args:
+        project (str): GCP project ID.
+        desired (list): Load balancer entries from the spec.
+        created_buckets (set): Names of buckets the plan creates.
+
+    Returns:
+        list: Actions.
+    """
+    import loadbalancer
+
+    actions = []
+    for item in desired:
+        bucket, backend = item['bucket'], item['backend_bucket']
+        missing = [node for node, resource in loadbalancer.existing_resources(project, backend).items()
+                   if resource is None]
+        if missing:
+            depends_on = (f"bucket:{bucket}",) if bucket in created_buckets else ()
+            run = partial(_create_load_balancer, project, bucket, backend, item.get('domain', ''))
+            actions.append(Action(f"load_balancer:{backend}", 'create', 'load_balancer', backend,
+                                  {'missing': (None, missing)}, depends_on, run))
+    return actions
+
+
+def _in_target(key_path, project, run):
+    # Actions run on dag worker threads, which do not inherit the caller's gcp.use_target()
+    with gcp.use_target(key_path, project):
+        return run()
+
+
+def plan(spec, cache=None, refresh=False, max_workers=8):
+    """
+    Diff a desired-state spec against current inventory and return the changes to make.
+
+    Instances and buckets are read through the inventory cache, so planning right
+    after another plan or apply in the same process costs no extra listings. Everything
+    is read from, and every action applies to, the spec's project (by default the
+    current target's, see gcp.use_target()).
+
+    Args:
+        spec (dict): Desired state; see load_spec().
+        cache (InventoryCache): Cache to read inventory through; defaults to the shared cache.
+        refresh (bool): Drop cached inventory for the project first.
+        max_workers (int): Files hashed at once when comparing uploads.
+
+    Returns:
+        list: Actions; empty when everything matches.
+
+    Raises:
+        ValueError: If the spec lists a resource twice.
+    """
+    validate_spec(spec)
+    key_path, default_project = gcp.current_target()
+    project = spec.get('project') or default_project
+    prune = spec.get('prune', False)
+    cache = cache or inventory_cache.get_cache()
+    if refresh:
+        cache.invalidate(project)
+
+    actions = []
+    with gcp.use_target(key_path, project):
+        if spec.get('instances') or prune:
+            current = inventory_cache.list_instances(project, cache=cache)
+            actions += plan_instances(project, spec.get('instances', []), current, prune)
+        if spec.get('buckets') or prune:
+            current = inventory_cache.list_buckets(project, cache=cache)
+            actions += plan_buckets(spec.get('buckets', []), current, prune)
+        created_buckets = {action.name for action in actions
+                           if action.resource == 'bucket' and action.kind == 'create'}
+        actions += plan_uploads(spec.get('uploads', []), created_buckets, max_workers)
+        actions += plan_load_balancers(project, spec.get('load_balancers', []), created_buckets)
+    return [action._replace(run=partial(_in_target, key_path, project, action.run)) for action in actions]
+
+
+def describe(actions):
+    """
+    Render a plan as one line per action.
+
+    Returns:
+        list: Lines such as '~ bucket logs: storage_class STANDARD -> NEARLINE'.
+    """
+    lines = []
+    for action in actions:
+        details = ', '.join(f"{field} {current} -> {desired}" for field, (current, desired) in action.changes.items())
+        lines.append(f"{_SYMBOLS[action.kind]} {action.resource} {action.name}" + (f": {details}" if details else ''))
+    return lines
+
+
+def apply(actions, max_workers=16):
+    """
+    Run a plan concurrently, each action once the actions it depends on have succeeded.
+
+    Args:
+        actions (list): Actions from plan().
+        max_workers (int): Actions run at once.
+
+    Returns:
+        tuple: (results, errors) keyed by action key.
+    """
+    if not actions:
+        return {}, {}
+    keys = {action.key for action in actions}
+    tasks = {action.key: (lambda results, action=action: action.run()) for action in actions}
+    dependencies = {action.key: [key for key in action.depends_on if key in keys] for action in actions}
+    return dag.run_dag(tasks, dependencies, max_workers=max_workers)
+
+
+def reconcile(spec, dry_run=False, cache=None, refresh=False, max_workers=16):
+    """
+    Bring the project to the desired state with the fewest mutating calls.
+
+    Args:
+        spec (dict): Desired state; see load_spec().
+        dry_run (bool): Only plan.
+        cache (InventoryCache): Cache to read inventory through.
+        refresh (bool): Ignore cached inventory.
+        max_workers (int): Actions run at once.
+
+    Returns:
+        tuple: (actions, results, errors).
+    """
+    actions = plan(spec, cache=cache, refresh=refresh)
+    for line in describe(actions):
+        logger.info(f"Plan: {line}")
+    if not actions:
+        logger.info("Everything is up to date.")
+    if dry_run or not actions:
+        return actions, {}, {}
+    results, errors = apply(actions, max_workers=max_workers)
+    logger.info(f"Applied {len(results)} of {len(actions)} changes, {len(errors)} failed.")
+    return actions, results, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcile GCP resources with a desired-state spec.")
+    parser.add_argument('spec', help="Path to the JSON spec.")
+    parser.add_argument('--dry-run', action='store_true', help="Print the plan without applying it.")
+    parser.add_argument('--prune', action='store_true', help="Delete managed resources missing from the spec.")
+    parser.add_argument('--refresh', action='store_true', help="Ignore cached inventory.")
+    args = parser.parse_args(argv)
+
+    spec = load_spec(args.spec)
+    if args.prune:
+        spec['prune'] = True
+    try:
+        actions, _, errors = reconcile(spec, dry_run=args.dry_run, refresh=args.refresh)
+    except ValueError as e:
+        parser.error(str(e))
+    for line in describe(actions):
+        print(line)
+    for key, error in errors.items():
+        print(f"! {key}: {error}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,36 +1,373 @@
-from google.cloud import speech
-import io
-from pydub import AudioSegment
+import glob
+import logging
+import mmap
+import os
+import struct
+import time
+import wave
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def convert_to_mono(input_path, output_path):
-    audio = AudioSegment.from_file(input_path)
-    mono_audio = audio.set_channels(1)
-    mono_audio.export(output_path, format="wav")
+import clients
+import metrics
+import ratelimit
 
-def transcribe_audio(file_path):
-    client = speech.SpeechClient()
+logger = logging.getLogger(__name__)
 
-    with io.open(file_path, "rb") as audio_file:
-        content = audio_file.read()
+WavInfo = namedtuple('WavInfo', 'channels sample_rate sample_width data_offset data_size')
 
-    audio = speech.RecognitionAudio(content=content)
-    config = speech.RecognitionConfig(
+# streaming_recognize accepts about 5 minutes of audio per stream
+STREAMING_WINDOW_SECONDS = 240
+# How far back from a window boundary to look for a quiet point to split on
+SILENCE_SEARCH_SECONDS = 5
+SILENCE_BLOCK_SECONDS = 0.02
+# Frames processed per preprocessing block (16 KiB of mono 16-bit audio)
+BLOCK_FRAMES = 8192
+
+def read_wav_header(file_path):
+    """
+    Read the format and data location of a PCM WAV file from its RIFF header.
+
+    Args:
+        file_path (str): Path to the WAV file.
+
+    Returns:
+        WavInfo: Channels, sample rate, bytes per sample, and the offset / size of the PCM data.
+    """
+    with open(file_path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError(f"{file_path} is not a RIFF/WAVE file")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{file_path} has no data chunk")
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', f.read(16))
+                f.seek(chunk_size - 16 + (chunk_size & 1), os.SEEK_CUR)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"{file_path} has no fmt chunk before its data")
+                audio_format, channels, sample_rate, _, _, bits = fmt
+                # 1 = PCM, 0xFFFE = WAVE_FORMAT_EXTENSIBLE
+                if audio_format not in (1, 0xFFFE):
+                    raise ValueError(f"{file_path} is not PCM (format {audio_format})")
+                data_size = min(chunk_size, os.path.getsize(file_path) - f.tell())
+                return WavInfo(channels, sample_rate, bits // 8, f.tell(), data_size)
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+class _Resampler:
+    """Streaming linear-interpolation resampler that carries its phase across blocks."""
+
+    def __init__(self, source_rate, target_rate):
+        import numpy as np
+
+        self.step = source_rate / target_rate
+        self.position = 0.0
+        self.tail = np.zeros(0, dtype=np.float32)
+
+    def process(self, samples):
+        import numpy as np
+
+        data = np.concatenate([self.tail, samples]) if len(self.tail) else samples
+        if len(data) < 2:
+            self.tail = data
+            return data[:0]
+        positions = np.arange(self.position, len(data) - 1, self.step)
+        output = np.interp(positions, np.arange(len(data)), data).astype(np.float32)
+        next_position = self.position + len(positions) * self.step
+        consumed = min(int(next_position), len(data) - 1)
+        self.tail = data[consumed:]
+        self.position = next_position - consumed
+        return output
+
+def iter_pcm_blocks(buffer, info, start_frame=0, end_frame=None, target_rate=None, block_frames=BLOCK_FRAMES):
+    """
+    Yield mono 16-bit PCM from a memory-mapped WAV file, block by block.
+
+    Each fixed-size block is read straight from the mapped buffer, downmixed by
+    averaging channels and, if target_rate differs from the file's rate, resampled
+    by linear interpolation, so memory use does not depend on the file length.
+
+    Args:
+        buffer: Memory-mapped file contents.
+        info (WavInfo): Header of the file; must be 16-bit PCM.
+        start_frame (int): First frame to read.
+        end_frame (int): One past the last frame to read; defaults to the end of the data.
+        target_rate (int): Output sample rate, or None to keep the file's rate.
+        block_frames (int): Input frames per block.
+
+    Yields:
+        bytes: Little-endian 16-bit mono samples.
+    """
+    import numpy as np
+
+    if info.sample_width != 2:
+        raise ValueError(f"Only 16-bit PCM is supported, got {info.sample_width * 8}-bit")
+    frame_bytes = info.channels * info.sample_width
+    total_frames = info.data_size // frame_bytes
+    end_frame = total_frames if end_frame is None else min(end_frame, total_frames)
+    resampler = _Resampler(info.sample_rate, target_rate) if target_rate and target_rate != info.sample_rate else None
+
+    for block_start in range(start_frame, end_frame, block_frames):
+        frames = min(block_frames, end_frame - block_start)
+        samples = np.frombuffer(buffer, dtype='<i2', count=frames * info.channels,
+                                offset=info.data_offset + block_start * frame_bytes)
+        if info.channels > 1:
+            mono = samples.reshape(frames, info.channels).mean(axis=1, dtype=np.float32)
+        elif resampler is not None:
+            mono = samples.astype(np.float32)
+        else:
+            yield samples.tobytes()
+            continue
+        if resampler is not None:
+            mono = resampler.process(mono)
+        yield np.clip(np.rint(mono), -32768, 32767).astype('<i2').tobytes()
+
+def convert_to_mono(input_path, output_path, target_rate=None):
+    """
+    Write a mono (optionally resampled) copy of a 16-bit WAV file.
+
+    Transcription no longer needs this intermediate file; it is kept for callers
+    that want the converted audio on disk.
+
+    Args:
+        input_path (str): Source WAV file.
+        output_path (str): Destination WAV file.
+        target_rate (int): Output sample rate, or None to keep the source rate.
+    """
+    info = read_wav_header(input_path)
+    with open(input_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer, \
+            wave.open(output_path, 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(target_rate or info.sample_rate)
+        for block in iter_pcm_blocks(buffer, info, target_rate=target_rate):
+            out.writeframes(block)
+
+def _recognition_config(sample_rate, language_code, channels=1):
+    from google.cloud import speech
+
+    return speech.RecognitionConfig(
         encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-        sample_rate_hertz=44100,  # Ensure this matches your audio file's sample rate
-        language_code="en-US",
+        sample_rate_hertz=sample_rate,
+        audio_channel_count=channels,
+        language_code=language_code,
+    )
+
+def _quietest_frame(buffer, info, start_frame, end_frame):
+    """Return the frame at the start of the quietest block between two frames."""
+    import numpy as np
+
+    frame_bytes = info.channels * info.sample_width
+    block = max(1, int(info.sample_rate * SILENCE_BLOCK_SECONDS))
+    count = (end_frame - start_frame) // block
+    if count < 2:
+        return end_frame
+    samples = np.frombuffer(buffer, dtype='<i2', count=count * block * info.channels,
+                            offset=info.data_offset + start_frame * frame_bytes)
+    energy = np.square(samples.reshape(count, block * info.channels).astype(np.float32)).mean(axis=1)
+    return start_frame + int(np.argmin(energy)) * block
+
+def plan_chunks(buffer, info, window_seconds=STREAMING_WINDOW_SECONDS, split_on_silence=True):
+    """
+    Split a WAV file's frames into chunks no longer than window_seconds.
+
+    With split_on_silence, each boundary moves back to the quietest short block in
+    the last few seconds of the window so words are not cut in half. Only 16-bit
+    audio is analysed; other widths use fixed windows.
+
+    Args:
+        buffer: Memory-mapped file contents.
+        info (WavInfo): Header of the file.
+        window_seconds (float): Maximum chunk length.
+        split_on_silence (bool): Align boundaries to quiet points.
+
+    Returns:
+        list: (start_frame, end_frame) pairs covering the whole file.
+    """
+    total_frames = info.data_size // (info.channels * info.sample_width)
+    window = int(window_seconds * info.sample_rate)
+    search = int(min(SILENCE_SEARCH_SECONDS, window_seconds / 2) * info.sample_rate)
+    analyse = split_on_silence and info.sample_width == 2
+    chunks = []
+    start = 0
+    while start < total_frames:
+        end = min(start + window, total_frames)
+        if analyse and end < total_frames:
+            end = _quietest_frame(buffer, info, end - search, end)
+        chunks.append((start, end))
+        start = end
+    return chunks
+
+def _record_audio(num_bytes, seconds):
+    if metrics.enabled:
+        metrics.TRANSCRIBED_BYTES.inc(num_bytes)
+        metrics.TRANSCRIBED_SECONDS.inc(seconds)
+
+def _stream_chunk(client, buffer, info, start_frame, end_frame, language_code, target_rate):
+    """Stream one chunk, downmixed in-process, and return its segments with absolute timestamps."""
+    from google.cloud import speech
+
+    offset_seconds = start_frame / info.sample_rate
+
+    def requests():
+        for block in iter_pcm_blocks(buffer, info, start_frame, end_frame, target_rate):
+            yield speech.StreamingRecognizeRequest(audio_content=block)
+
+    config = _recognition_config(target_rate or info.sample_rate, language_code)
+    streaming_config = speech.StreamingRecognitionConfig(config=config)
+    segments = []
+    previous_end = 0.0
+    # A retry restarts the stream with a fresh request generator
+    responses = ratelimit.call('speech', None, lambda: list(client.streaming_recognize(streaming_config, requests())))
+    seconds = (end_frame - start_frame) / info.sample_rate
+    _record_audio(round(seconds * (target_rate or info.sample_rate)) * 2, seconds)
+    for response in responses:
+        for result in response.results:
+            if not result.is_final or not result.alternatives:
+                continue
+            result_end = result.result_end_time.total_seconds()
+            segments.append({
+                'start': offset_seconds + previous_end,
+                'end': offset_seconds + result_end,
+                'text': result.alternatives[0].transcript.strip(),
+            })
+            previous_end = result_end
+    return segments
+
+def _stitch(segments):
+    segments = sorted(segments, key=lambda segment: segment['start'])
+    return {'text': ' '.join(segment['text'] for segment in segments if segment['text']), 'segments': segments}
+
+def transcribe_long_audio(file_path, language_code="en-US", window_seconds=STREAMING_WINDOW_SECONDS,
+                          split_on_silence=True, max_workers=4, target_rate=None):
+    """
+    Transcribe a WAV file of any length by streaming chunks of it concurrently.
+
+    The file is memory-mapped rather than read, its format comes from the header, and
+    each chunk is downmixed to mono in-process and goes through its own
+    streaming_recognize call, so no converted copy is written to disk. The per-chunk results
+    are stitched back together with timestamps relative to the start of the file.
+
+    Args:
+        file_path (str): Path to a LINEAR16 WAV file.
+        language_code (str): BCP-47 language code.
+        window_seconds (float): Maximum chunk length in seconds.
+        split_on_silence (bool): Split chunks at quiet points instead of exact windows.
+        max_workers (int): Chunks streamed at once.
+        target_rate (int): Resample to this rate before sending, or None to keep the file's rate.
+
+    Returns:
+        dict: {'text': full transcript, 'segments': [{'start', 'end', 'text'}, ...]}.
+    """
+    client = clients.get_client('speech')
+    info = read_wav_header(file_path)
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        chunks = plan_chunks(buffer, info, window_seconds, split_on_silence)
+        segments = []
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_stream_chunk, client, buffer, info, start, end, language_code, target_rate)
+                       for start, end in chunks]
+            for future in as_completed(futures):
+                segments.extend(future.result())
+    logger.info(f"Transcribed {file_path} in {len(chunks)} chunks.")
+    return _stitch(segments)
+
+def transcribe_gcs_audio(file_path, bucket_name, language_code="en-US", timeout=3600):
+    """
+    Transcribe a large WAV file with long-running recognition, staging it in Cloud Storage.
+
+    Args:
+        file_path (str): Path to a LINEAR16 WAV file.
+        bucket_name (str): Bucket to stage the audio in.
+        language_code (str): BCP-47 language code.
+        timeout (float): Seconds to wait for the recognition operation.
+
+    Returns:
+        dict: {'text': full transcript, 'segments': [{'start', 'end', 'text'}, ...]}.
+    """
+    from google.cloud import speech
+
+    import uploads
+
+    info = read_wav_header(file_path)
+    blob = uploads.upload_file(bucket_name, file_path, f"transcription/{os.path.basename(file_path)}")
+    client = clients.get_client('speech')
+    operation = ratelimit.call(
+        'speech', None, client.long_running_recognize,
+        config=_recognition_config(info.sample_rate, language_code, info.channels),
+        audio=speech.RecognitionAudio(uri=f"gs://{bucket_name}/{blob.name}"),
     )
+    started = time.monotonic()
+    response = operation.result(timeout=timeout)
+    if metrics.enabled:
+        metrics.OPERATION_WAIT.observe(time.monotonic() - started, 'speech', 'done')
+    _record_audio(info.data_size, info.data_size / (info.channels * info.sample_width * info.sample_rate))
+    segments = []
+    previous_end = 0.0
+    for result in response.results:
+        if not result.alternatives:
+            continue
+        result_end = result.result_end_time.total_seconds()
+        segments.append({'start': previous_end, 'end': result_end, 'text': result.alternatives[0].transcript.strip()})
+        previous_end = result_end
+    return _stitch(segments)
+
+def transcribe_directory(directory, pattern='*.wav', max_workers=4, **options):
+    """
+    Transcribe every matching file in a directory on a worker pool.
+
+    Args:
+        directory (str): Directory to scan.
+        pattern (str): Glob pattern for audio files.
+        max_workers (int): Files transcribed at once.
+        **options: Extra arguments for transcribe_long_audio().
+
+    Returns:
+        dict: File path -> transcript dict, or the error message if it failed.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, pattern)))
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(transcribe_long_audio, path, **options): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to transcribe {path}: {e}")
+                results[path] = str(e)
+    return results
 
-    response = client.recognize(config=config, audio=audio)
+def transcribe_audio(file_path, target_rate=None):
+    from google.cloud import speech
 
+    client = clients.get_client('speech')
+    info = read_wav_header(file_path)
+
+    # Downmix in-process instead of reading back a converted copy of the file
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        content = b''.join(iter_pcm_blocks(buffer, info, target_rate=target_rate))
+
+    audio = speech.RecognitionAudio(content=content)
+    config = _recognition_config(target_rate or info.sample_rate, "en-US")
+
+    response = ratelimit.call('speech', None, client.recognize, config=config, audio=audio)
+    _record_audio(len(content), len(content) / 2 / (target_rate or info.sample_rate))
+
+    transcripts = []
     for result in response.results:
+        transcripts.append(result.alternatives[0].transcript)
         print("Transcript: {}".format(result.alternatives[0].transcript))
+    return transcripts
 
 if __name__ == "__main__":
     original_audio_path = "C:\\Users\\naman\\OneDrive\\Desktop\\GCP\\harvard.wav"
-    mono_audio_path = "C:\\Users\\naman\\OneDrive\\Desktop\\GCP\\harvard_mono.wav"
-    
-    # Convert to mono
-    convert_to_mono(original_audio_path, mono_audio_path)
-    
-    # Transcribe the mono audio
-    transcribe_audio(mono_audio_path)
+
+    # Transcribe the audio, downmixed to mono in-process, however long it is
+    transcript = transcribe_long_audio(original_audio_path)
+    print("Transcript: {}".format(transcript['text']))
@@ -1,7 +1,9 @@
 import logging
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+import re
+import threading
+
+import clients
+import ratelimit
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -13,56 +15,351 @@ SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 # Path to your service account key file
 SERVICE_ACCOUNT_FILE = "C:\\Users\\naman\\Downloads\\watchful-slice-443014-f0-d76a3b946911.json"
 
-# Create credentials using the service account file
-credentials = service_account.Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-
 # The ID of the spreadsheet to access (only the ID, not the full URL)
 SPREADSHEET_ID = '1uNJAXOhewG7DxIVBGY1ppGv3e74AUvSbmYz_zmCaN8E'
 
-# Initialize the Sheets API service
-service = build('sheets', 'v4', credentials=credentials)
+def get_service():
+    """Return the shared Sheets API service from the process-wide client registry."""
+    return clients.get_client('sheets', source=SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+
+_A1_PATTERN = re.compile(r"^(?:(?P<sheet>'(?:[^']|'')+'|[^!]+)!)?(?P<ref>.*)$")
+# Cell ('B2'), cell range ('B2:D'), column range ('A:C') or row range ('2:5'); columns go up to ZZZ
+_REF_PATTERN = re.compile(r"^(?P<col>[A-Za-z]{1,3})?(?P<row>\d+)?(?P<end>:[A-Za-z]{0,3}\d*)?$")
+
+def column_index(letters):
+    """Convert column letters ('A', 'AB') to a zero-based index."""
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+def column_letters(index):
+    """Convert a zero-based column index to letters."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+def parse_anchor(range_name):
+    """
+    Parse the sheet and top-left cell of an A1 range.
+
+    Besides cell ranges such as 'Sheet1!B2:D9', column ranges ('A:C'), row ranges
+    ('Sheet1!2:5') and whole sheets ('Sheet1') are accepted; a missing row or column
+    anchors at the first one.
+
+    Returns:
+        tuple: (sheet, row, col), with zero-based row and column.
+    """
+    match = _A1_PATTERN.match(range_name)
+    sheet, ref = match.group('sheet') or '', match.group('ref')
+    cell = _REF_PATTERN.match(ref)
+    if cell:
+        col, row, end = cell.group('col'), cell.group('row'), cell.group('end')
+        # A lone column or row is not a range ('AB' could be a sheet name); it needs the ':' part
+        if (col and row) or ((col or row) and end and len(end) > 1):
+            return sheet, int(row) - 1 if row else 0, column_index(col) if col else 0
+    if ref and not sheet:
+        # No cell reference at all: the whole sheet, anchored at A1
+        return ref, 0, 0
+    raise ValueError(f"Unsupported A1 range: {range_name}")
+
+def _a1(sheet, top, left, bottom, right):
+    prefix = f"{sheet}!" if sheet else ''
+    return f"{prefix}{column_letters(left)}{top + 1}:{column_letters(right)}{bottom + 1}"
+
+def _touching(a, b):
+    """True if two (top, left, bottom, right) boxes overlap or share an edge."""
+    return a[0] <= b[2] + 1 and b[0] <= a[2] + 1 and a[1] <= b[3] + 1 and b[1] <= a[3] + 1
+
+def coalesce_writes(writes):
+    """
+    Merge queued writes into as few ranges as possible.
+
+    Later writes win where they overlap earlier ones. Writes that overlap or touch
+    are merged into their bounding box; cells inside the box that nobody wrote are
+    sent as null, which the API leaves unchanged.
+
+    Args:
+        writes (list): (range_name, values) pairs in the order they were made.
+
+    Returns:
+        list: ValueRange dicts for values.batchUpdate.
+    """
+    cells = {}
+    boxes = {}
+    for range_name, values in writes:
+        sheet, top, left = parse_anchor(range_name)
+        width = max((len(row) for row in values), default=0)
+        if not values or not width:
+            continue
+        for r, row in enumerate(values):
+            for c, value in enumerate(row):
+                cells[(sheet, top + r, left + c)] = value
+        boxes.setdefault(sheet, []).append((top, left, top + len(values) - 1, left + width - 1))
+
+    data = []
+    for sheet, sheet_boxes in boxes.items():
+        merged = True
+        while merged:
+            merged = False
+            result = []
+            for box in sheet_boxes:
+                for i, other in enumerate(result):
+                    if _touching(box, other):
+                        result[i] = (min(box[0], other[0]), min(box[1], other[1]),
+                                     max(box[2], other[2]), max(box[3], other[3]))
+                        merged = True
+                        break
+                else:
+                    result.append(box)
+            sheet_boxes = result
+        for top, left, bottom, right in sheet_boxes:
+            values = [[cells.get((sheet, r, c)) for c in range(left, right + 1)] for r in range(top, bottom + 1)]
+            data.append({'range': _a1(sheet, top, left, bottom, right), 'values': values})
+    return data
+
+class SheetsClient:
+    """
+    Batched Sheets values client.
+
+    Reads go through values.batchGet, large sheets can be streamed in row blocks,
+    and writes are queued and coalesced for flush_interval seconds before being
+    sent as a single values.batchUpdate. Writes from a failed batchUpdate stay queued
+    for the next flush; if that was a background flush, its error is raised by the
+    next flush() or close() unless the retried writes go through.
+    """
+
+    def __init__(self, spreadsheet_id=SPREADSHEET_ID, flush_interval=1.0, value_input_option='RAW'):
+        """
+        Args:
+            spreadsheet_id (str): ID of the spreadsheet.
+            flush_interval (float): Seconds queued writes wait before being sent; 0 sends on every write.
+            value_input_option (str): 'RAW' or 'USER_ENTERED'.
+        """
+        self.spreadsheet_id = spreadsheet_id
+        self.flush_interval = flush_interval
+        self.value_input_option = value_input_option
+        self._pending = []
+        self._lock = threading.Lock()
+        # The discovery service shares one HTTP connection, so calls are serialized
+        self._io_lock = threading.Lock()
+        self._timer = None
+        self._error = None  # exception from a failed background flush
+
+    def batch_get(self, ranges, value_render_option='FORMATTED_VALUE'):
+        """
+        Read several ranges in one request.
+
+        Args:
+            ranges (list): A1 ranges to read.
+            value_render_option (str): How values are rendered.
+
+        Returns:
+            list: Rows (lists of values) for each range, in request order.
+        """
+        if not ranges:
+            return []
+        with self._io_lock:
+            request = get_service().spreadsheets().values().batchGet(
+                spreadsheetId=self.spreadsheet_id, ranges=list(ranges), valueRenderOption=value_render_option)
+            result = ratelimit.call('sheets', None, request.execute)
+        return [value_range.get('values', []) for value_range in result.get('valueRanges', [])]
+
+    def iter_rows(self, sheet, first_column='A', last_column='Z', start_row=1, block_rows=1000, blocks_per_request=5):
+        """
+        Stream a sheet's rows in blocks instead of loading the whole sheet.
+
+        The API trims trailing empty rows from every range, so a short block does not
+        mean the data has ended; reading stops once a whole request comes back empty,
+        i.e. after blocks_per_request * block_rows empty rows. Empty rows between
+        data rows are yielded as [].
+
+        Args:
+            sheet (str): Sheet name.
+            first_column (str): First column to read.
+            last_column (str): Last column to read.
+            start_row (int): One-based row to start at.
+            block_rows (int): Rows per block.
+            blocks_per_request (int): Blocks fetched per batchGet call.
+
+        Yields:
+            list: One row of values at a time.
+        """
+        row = start_row
+        gap = 0  # empty rows seen since the last data row
+        while True:
+            ranges = []
+            for block in range(blocks_per_request):
+                top = row + block * block_rows
+                ranges.append(f"{sheet}!{first_column}{top}:{last_column}{top + block_rows - 1}")
+            found = False
+            for rows in self.batch_get(ranges):
+                if rows:
+                    found = True
+                    for _ in range(gap):
+                        yield []
+                    yield from rows
+                    gap = 0
+                gap += block_rows - len(rows)
+            if not found:
+                return
+            row += blocks_per_request * block_rows
+
+    def read_columns(self, range_name, header=True, as_numpy=False):
+        """
+        Read a range into a columnar buffer.
+
+        Args:
+            range_name (str): A1 range to read.
+            header (bool): Use the first row as column names; otherwise columns are
+                named by their letters.
+            as_numpy (bool): Return NumPy arrays instead of lists.
+
+        Returns:
+            dict: Column name -> values, usable directly with pandas.DataFrame.
+        """
+        rows = self.batch_get([range_name])[0]
+        _, _, left = parse_anchor(range_name)
+        if header and rows:
+            names, rows = rows[0], rows[1:]
+        else:
+            width = max((len(row) for row in rows), default=0)
+            names = [column_letters(left + i) for i in range(width)]
+        columns = {name: [row[i] if i < len(row) else None for row in rows] for i, name in enumerate(names)}
+        if as_numpy:
+            import numpy as np
+            columns = {name: np.asarray(values) for name, values in columns.items()}
+        return columns
+
+    def write(self, range_name, values):
+        """
+        Queue a write; it is sent with other queued writes on the next flush.
+
+        Args:
+            range_name (str): A1 range whose top-left cell anchors the values.
+            values (list): Rows of values.
+
+        Raises:
+            ValueError: If range_name is not an A1 range; nothing is queued.
+        """
+        parse_anchor(range_name)
+        with self._lock:
+            self._pending.append((range_name, values))
+            if self.flush_interval <= 0:
+                flush_now = True
+            else:
+                flush_now = False
+                if self._timer is None:
+                    self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if flush_now:
+            self.flush()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception as e:
+            # Nobody is waiting on the timer thread; hand the error to the next flush() or close()
+            logger.error(f"Background flush of queued writes failed; they will be retried on the next flush: {e}")
+            with self._lock:
+                self._error = e
+
+    def flush(self):
+        """
+        Send all queued writes as one values.batchUpdate.
+
+        On failure the writes are queued again, ahead of any made since, and the
+        error is raised.
+
+        Returns:
+            dict: The API response, or None if nothing was queued.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            writes, self._pending = self._pending, []
+            previous_error, self._error = self._error, None
+        try:
+            data = coalesce_writes(writes)
+            if not data:
+                return None
+            body = {'valueInputOption': self.value_input_option, 'data': data}
+            with self._io_lock:
+                request = get_service().spreadsheets().values().batchUpdate(
+                    spreadsheetId=self.spreadsheet_id, body=body)
+                result = ratelimit.call('sheets', None, request.execute)
+        except Exception as e:
+            with self._lock:
+                self._pending[:0] = writes
+            if previous_error is not None:
+                raise e from previous_error
+            raise
+        if previous_error is not None:
+            logger.info(f"Writes from the failed background flush were sent ({previous_error}).")
+        logger.info(f"Flushed {len(writes)} writes as {len(data)} ranges "
+                    f"({result.get('totalUpdatedCells')} cells updated).")
+        return result
+
+    def close(self):
+        """Flush queued writes and stop the flush timer."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
 # Example: Reading data from a sheet
 def read_sheet(range_name):
+    from googleapiclient.errors import HttpError
+
     try:
-        sheet = service.spreadsheets()
-        result = sheet.values().get(
+        sheet = get_service().spreadsheets()
+        request = sheet.values().get(
             spreadsheetId=SPREADSHEET_ID,
             range=range_name
-        ).execute()
-        values = result.get('values', [])
-        if not values:
-            print('No data found.')
-        else:
-            print('Data:')
-            for row in values:
-                print(row)
+        )
+        result = ratelimit.call('sheets', None, request.execute)
+        return result.get('values', [])
     except HttpError as err:
         logger.error(f"An error occurred: {err}")
-        print(f"An error occurred: {err}")
 
 # Example: Writing data to a sheet
 def write_sheet(range_name, values):
+    from googleapiclient.errors import HttpError
+
     try:
-        sheet = service.spreadsheets()
+        sheet = get_service().spreadsheets()
         body = {'values': values}
-        result = sheet.values().update(
+        request = sheet.values().update(
             spreadsheetId=SPREADSHEET_ID,
             range=range_name,
             valueInputOption='RAW',
             body=body
-        ).execute()
-        print(f"{result.get('updatedCells')} cells updated.")
+        )
+        result = ratelimit.call('sheets', None, request.execute)
+        logger.info(f"{result.get('updatedCells')} cells updated.")
+        return result
     except HttpError as err:
         logger.error(f"An error occurred: {err}")
-        print(f"An error occurred: {err}")
 
 # Example Usage
 if __name__ == '__main__':
     # Replace with your desired range, e.g., 'Sheet1!A1:C10'
     read_range = 'Sheet1!A1:C10'
-    read_sheet(read_range)
+    values = read_sheet(read_range)
+    if values:
+        print('Data:')
+        for row in values:
+            print(row)
+    elif values is not None:
+        print('No data found.')
 
     # Data to write (list of lists)
     write_values = [
@@ -0,0 +1,54 @@
+import pytest
+
+import benchmarks
+
+
+def _result(name='provision', throughput=100.0, p99=1.0):
+    return benchmarks.BenchmarkResult(name, 10, 'instances', 0.1, throughput, 0.5, p99)
+
+
+def test_expect_success_raises_on_any_failure():
+    results = [{'success': True}, {'success': False, 'error': 'quota'}, {'success': True}]
+
+    with pytest.raises(benchmarks.BenchmarkFailed, match='1 failed, first error: quota'):
+        benchmarks._expect_success('provision', results)
+
+
+def test_expect_success_returns_a_latency_per_result():
+    assert len(benchmarks._expect_success('provision', [{'success': True}] * 3)) == 3
+
+
+def test_expect_raises_on_short_count():
+    benchmarks._expect('listed', 5, 5)
+    with pytest.raises(benchmarks.BenchmarkFailed, match='got 4, expected 5'):
+        benchmarks._expect('listed', 4, 5)
+
+
+def test_compare_flags_throughput_and_p99_regressions():
+    baseline = {'provision': {'throughput': 100.0, 'p99': 1.0}}
+
+    assert benchmarks.compare([_result(throughput=80.0, p99=1.2)], baseline, 0.25) == []
+    assert len(benchmarks.compare([_result(throughput=70.0, p99=1.3)], baseline, 0.25)) == 2
+    assert benchmarks.compare([_result(name='new')], baseline, 0.25) == []
+
+
+def test_main_reports_missing_sdks(monkeypatch, capsys):
+    monkeypatch.setattr(benchmarks, 'missing_sdks', lambda: ['google-cloud-compute'])
+
+    assert benchmarks.main(['provision']) == 2
+    assert 'google-cloud-compute' in capsys.readouterr().err
+
+
+def test_main_reports_failed_benchmark_and_continues(monkeypatch, capsys):
+    def run_benchmark(name, *args):
+        if name == 'provision':
+            raise benchmarks.BenchmarkFailed('lost work')
+        return _result(name)
+
+    monkeypatch.setattr(benchmarks, 'missing_sdks', lambda: [])
+    monkeypatch.setattr(benchmarks, 'run_benchmark', run_benchmark)
+
+    assert benchmarks.main(['provision', 'terminate']) == 1
+    output = capsys.readouterr().out
+    assert 'FAILED: lost work' in output
+    assert 'terminate' in output
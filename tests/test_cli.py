@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+import cli
+import spread
+import trans
+
+
+@pytest.mark.parametrize('flags', [['--input', 'in.jsonl'], ['--output', 'out.jsonl']])
+def test_translate_needs_input_and_output_together(flags, capsys):
+    assert cli.main(['translate', *flags, 'fr']) == 2
+    assert '--input and --output' in capsys.readouterr().err
+
+
+def test_key_file_reaches_translate(monkeypatch, capsys):
+    monkeypatch.setattr(trans, 'SERVICE_ACCOUNT_FILE', trans.SERVICE_ACCOUNT_FILE)
+    used = []
+
+    def translate_batch(texts, target):
+        used.append(trans.SERVICE_ACCOUNT_FILE)
+        return [text.upper() for text in texts]
+
+    monkeypatch.setattr(trans, 'translate_batch', translate_batch)
+
+    assert cli.main(['--key-file', 'key.json', 'translate', 'fr', 'hello']) == 0
+    assert used == ['key.json']
+    assert json.loads(capsys.readouterr().out) == {'text': 'hello', 'translation': 'HELLO'}
+
+
+def test_sheets_read_emits_rows_and_uses_key_file(monkeypatch, capsys):
+    monkeypatch.setattr(spread, 'SERVICE_ACCOUNT_FILE', spread.SERVICE_ACCOUNT_FILE)
+    monkeypatch.setattr(spread, 'read_sheet', lambda range_name: [['a', '1'], ['b', '2']])
+
+    assert cli.main(['--key-file', 'key.json', 'sheets', 'read', 'Sheet1!A1:B2']) == 0
+    assert [json.loads(line) for line in capsys.readouterr().out.splitlines()] == [['a', '1'], ['b', '2']]
+    assert spread.SERVICE_ACCOUNT_FILE == 'key.json'
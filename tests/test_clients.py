@@ -0,0 +1,137 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import clients
+
+
+class FakeClient:
+    def __init__(self, credentials, project):
+        self.credentials = credentials
+        self.project = project
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class BrokenClient(FakeClient):
+    def close(self):
+        raise RuntimeError('boom')
+
+
+class FakeTransport:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = clients.ClientRegistry()
+    built = []
+
+    def credentials(source=None, scopes=None):
+        return ('credentials', source, tuple(sorted(scopes)) if scopes else ())
+
+    def build(credentials, project):
+        built.append((credentials, project))
+        return FakeClient(credentials, project)
+
+    monkeypatch.setattr(registry, 'credentials', credentials)
+    monkeypatch.setitem(clients.BUILDERS, 'compute', build)
+    monkeypatch.setitem(clients.BUILDERS, 'storage', build)
+    registry.built = built
+    return registry
+
+
+def test_same_key_shares_one_client(registry):
+    first = registry.get('compute', source='key.json', project='p', scopes=['b', 'a'])
+    second = registry.get('compute', source='key.json', project='p', scopes=['a', 'b'])
+
+    assert first is second
+    assert len(registry.built) == 1
+
+
+@pytest.mark.parametrize('other', [
+    {'kind': 'storage'},
+    {'source': 'other.json'},
+    {'project': 'q'},
+    {'scopes': ['c']},
+])
+def test_each_key_component_gets_its_own_client(registry, other):
+    key = {'kind': 'compute', 'source': 'key.json', 'project': 'p', 'scopes': ['a']}
+
+    first = registry.get(**key)
+    second = registry.get(**{**key, **other})
+
+    assert first is not second
+    assert len(registry.built) == 2
+
+
+def test_unknown_kind(registry):
+    with pytest.raises(ValueError):
+        registry.get('no-such-api')
+
+
+def test_override_wins_until_removed(registry):
+    fake = object()
+    registry.override('compute', fake)
+
+    assert registry.get('compute', source='key.json', project='p') is fake
+    registry.override('compute', None)
+    assert registry.get('compute', source='key.json', project='p') is not fake
+
+
+def test_concurrent_get_builds_once(registry, monkeypatch):
+    build = clients.BUILDERS['compute']
+
+    def slow_build(credentials, project):
+        time.sleep(0.05)
+        return build(credentials, project)
+
+    monkeypatch.setitem(clients.BUILDERS, 'compute', slow_build)
+    start = threading.Barrier(16)
+
+    def get(_):
+        start.wait()
+        return registry.get('compute', project='p')
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(get, range(16)))
+
+    assert len(registry.built) == 1
+    assert all(client is results[0] for client in results)
+
+
+def test_close_closes_clients_and_forgets_them(registry, monkeypatch):
+    transport = FakeTransport()
+    monkeypatch.setitem(clients.BUILDERS, 'storage', lambda credentials, project: type(
+        'GrpcClient', (), {'transport': transport})())
+    client = registry.get('compute', project='p')
+    registry.get('storage', project='p')
+
+    registry.close()
+
+    assert client.closed
+    assert transport.closed
+    assert registry.get('compute', project='p') is not client
+
+
+def test_close_survives_failing_client(registry, monkeypatch):
+    monkeypatch.setitem(clients.BUILDERS, 'storage', BrokenClient)
+    registry.get('storage', project='p')
+    client = registry.get('compute', project='p')
+
+    registry.close()
+
+    assert client.closed
+
+
+def test_missing_key_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        clients.ClientRegistry().credentials(str(tmp_path / 'missing.json'))
@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+import dag
+
+
+def test_run_dag_passes_results_in_dependency_order():
+    order = []
+
+    def task(name, value):
+        def run(results):
+            order.append(name)
+            return value + sum(results.values())
+        return run
+
+    tasks = {'a': task('a', 1), 'b': task('b', 10), 'c': task('c', 100)}
+    results, errors = dag.run_dag(tasks, {'b': ['a'], 'c': ['b']})
+
+    assert errors == {}
+    assert order == ['a', 'b', 'c']
+    assert results == {'a': 1, 'b': 11, 'c': 112}
+
+
+def test_run_dag_runs_independent_tasks_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    tasks = {'a': lambda results: barrier.wait(), 'b': lambda results: barrier.wait()}
+
+    results, errors = dag.run_dag(tasks, {}, max_workers=2)
+
+    assert errors == {}
+    assert set(results) == {'a', 'b'}
+
+
+def test_run_dag_skips_dependents_of_failed_task():
+    def fail(results):
+        raise RuntimeError('boom')
+
+    tasks = {'a': fail, 'b': lambda results: 'b', 'c': lambda results: 'c', 'd': lambda results: 'd'}
+    results, errors = dag.run_dag(tasks, {'b': ['a'], 'c': ['b'], 'd': []})
+
+    assert results == {'d': 'd'}
+    assert isinstance(errors['a'], RuntimeError)
+    assert isinstance(errors['b'], dag.DependencyFailed)
+    assert isinstance(errors['c'], dag.DependencyFailed)
+
+
+def test_run_dag_rejects_unknown_dependency_and_cycle():
+    tasks = {'a': lambda results: None, 'b': lambda results: None}
+
+    with pytest.raises(ValueError, match='Unknown'):
+        dag.run_dag(tasks, {'a': ['missing']})
+    with pytest.raises(ValueError, match='cycle'):
+        dag.run_dag(tasks, {'a': ['b'], 'b': ['a']})
+
+
+def test_reverse_dependencies():
+    assert dag.reverse_dependencies({'a': [], 'b': ['a'], 'c': ['a', 'b']}) == {'a': ['b', 'c'], 'b': ['c'], 'c': []}
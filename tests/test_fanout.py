@@ -0,0 +1,128 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+import fanout
+import gcp
+
+
+class TimedPoller:
+    """Finishes every tracked operation after a short delay."""
+
+    def __init__(self, counter):
+        self.counter = counter
+
+    def track(self, project, operation_name, zone=None, timeout=None):
+        future = Future()
+
+        def finish():
+            self.counter.leave()
+            future.set_result(operation_name)
+
+        threading.Timer(0.02, finish).start()
+        return future
+
+
+class Counter:
+    """Counts operations between start and finish, remembering the peak."""
+
+    def __init__(self):
+        self.current = self.peak = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def leave(self):
+        with self._lock:
+            self.current -= 1
+
+
+@pytest.fixture
+def counter(monkeypatch):
+    counter = Counter()
+    monkeypatch.setattr(gcp.operations, 'get_poller', lambda source: TimedPoller(counter))
+    return counter
+
+
+def _batch(counter, zone, count, limiter):
+    def start(spec):
+        counter.enter()
+        return 'p', zone, spec
+    specs = [f"{zone}-{index}" for index in range(count)]
+    return list(gcp._run_zone_operations(specs, start, max_in_flight=4, timeout=None, limiter=limiter))
+
+
+@pytest.mark.parametrize('limit', [1, 3, 6])
+def test_shared_limiter_bounds_operations_across_batches(counter, limit):
+    limiter = threading.BoundedSemaphore(limit)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        batches = list(pool.map(lambda zone: _batch(counter, zone, 8, limiter), ['a', 'b', 'c', 'd']))
+
+    assert [len(results) for results in batches] == [8, 8, 8, 8]
+    assert all(error is None for results in batches for _, error in results)
+    assert counter.peak <= limit
+
+
+def test_batches_without_limiter_are_bounded_per_batch(counter):
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda zone: _batch(counter, zone, 8, None), ['a', 'b', 'c', 'd']))
+
+    assert 4 < counter.peak <= 16
+
+
+def test_failed_start_gives_its_slot_back(counter):
+    limiter = threading.BoundedSemaphore(1)
+
+    def start(spec):
+        raise RuntimeError(spec)
+
+    results = list(gcp._run_zone_operations(['x', 'y'], start, max_in_flight=2, timeout=None, limiter=limiter))
+
+    assert sorted(str(error) for _, error in results) == ['x', 'y']
+    assert limiter.acquire(blocking=False)
+
+
+def test_fanout_batches_share_one_limiter(monkeypatch):
+    limiters = []
+
+    def create_instances(specs, max_in_flight, timeout, limiter):
+        limiters.append(limiter)
+        return [{'instance_name': spec['instance_name'], 'success': True} for spec in specs]
+
+    monkeypatch.setattr(fanout.gcp, 'create_instances', create_instances)
+    specs = [{'project': 'p', 'zone': zone, 'instance_name': f"vm-{zone}"} for zone in ('a', 'b', 'c')]
+
+    results = list(fanout.create_instances(specs, max_total_in_flight=5))
+
+    assert len(results) == 3
+    assert len(limiters) == 3 and len({id(limiter) for limiter in limiters}) == 1
+    assert limiters[0] is not None
+    list(fanout.create_instances(specs))
+    assert limiters[3:] == [None, None, None]
+
+
+def test_targets_cross_product():
+    assert fanout.targets(['p', 'q'], ['a', 'b'], key_paths={'q': 'q.json'}) == [
+        fanout.Target('p', 'a'), fanout.Target('p', 'b'), fanout.Target('q', 'a', 'q.json'),
+        fanout.Target('q', 'b', 'q.json')]
+
+
+def test_fan_out_reports_failed_targets_and_keeps_others():
+    def operation(target):
+        if target.project == 'bad':
+            raise RuntimeError('denied')
+        return [f"{target.project}-1", f"{target.project}-2"]
+
+    report = fanout.FanOutReport()
+    results = list(fanout.fan_out(operation, fanout.targets(['good', 'bad', 'fine']), report=report))
+
+    assert sorted(result.item for result in results if result.error is None) == ['fine-1', 'fine-2', 'good-1', 'good-2']
+    assert [str(result.error) for result in results if result.error is not None] == ['denied']
+    assert report.items == 4 and not report.complete
+    assert sorted(target.project for target in report.succeeded) == ['fine', 'good']
@@ -0,0 +1,87 @@
+import pytest
+
+import gcp
+import ratelimit
+
+
+class ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class Bucket:
+    def __init__(self, name, location='US', storage_class='STANDARD', labels=None):
+        self.name = name
+        self.location = location
+        self.storage_class = storage_class
+        self.labels = labels
+
+
+class FlakyStorage:
+    """Creates the bucket but reports a 503 the first time, like a timed-out insert."""
+
+    def __init__(self, existing=None):
+        self.buckets = {existing.name: existing} if existing else {}
+        self.inserts = 0
+
+    def bucket(self, name):
+        return Bucket(name)
+
+    def create_bucket(self, bucket, location='US'):
+        self.inserts += 1
+        if bucket.name in self.buckets:
+            raise ApiError(409)
+        bucket.location = location
+        self.buckets[bucket.name] = bucket
+        if self.inserts == 1:
+            raise ApiError(503)
+        return bucket
+
+    def get_bucket(self, name):
+        if name not in self.buckets:
+            raise ApiError(404)
+        return self.buckets[name]
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, 'sleep', lambda delay: None)
+    monkeypatch.setattr(gcp, 'notify_mutation', lambda *args: None)
+
+    def install(storage):
+        monkeypatch.setattr(gcp, 'initialize_clients', lambda: (None, storage))
+        return storage
+    return install
+
+
+def test_create_bucket_returns_bucket_made_by_timed_out_attempt(storage):
+    client = storage(FlakyStorage())
+
+    bucket = gcp.create_storage_bucket('data', location='EU', labels={'managed-by': 'reconciler'})
+
+    assert bucket is client.buckets['data']
+    assert client.inserts == 2
+
+
+def test_create_bucket_conflict_without_retry_fails(storage):
+    client = storage(FlakyStorage(existing=Bucket('data')))
+    client.inserts = 1
+
+    assert gcp.create_storage_bucket('data') is None
+
+
+def test_create_bucket_conflict_on_retry_with_foreign_bucket_fails(storage):
+    client = storage(FlakyStorage())
+    original = client.create_bucket
+
+    def create_bucket(bucket, location='US'):
+        # Someone else takes the name between our two attempts
+        if client.inserts == 0:
+            client.inserts += 1
+            client.buckets[bucket.name] = Bucket(bucket.name, storage_class='NEARLINE')
+            raise ApiError(503)
+        return original(bucket, location=location)
+    client.create_bucket = create_bucket
+
+    assert gcp.create_storage_bucket('data') is None
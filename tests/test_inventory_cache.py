@@ -0,0 +1,140 @@
+from types import SimpleNamespace
+
+import pytest
+
+import gcp
+import inventory_cache
+
+
+class Loader:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.results.pop(0) if len(self.results) > 1 else self.results[0]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(inventory_cache, 'time', SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def make_cache():
+    caches = []
+
+    def make_cache(**options):
+        cache = inventory_cache.InventoryCache(**options)
+        caches.append(cache)
+        return cache
+
+    yield make_cache
+    for cache in caches:
+        cache.close()
+
+
+def _instance(name, zone='us-central1-a', status='RUNNING'):
+    return gcp.InstanceRecord(name, zone, status, 'e2-medium', '10.0.0.2', None, {})
+
+
+def test_serves_fresh_entries_and_reloads_stale_ones(clock, make_cache):
+    cache = make_cache(ttl=60.0)
+    loader = Loader(['a'], ['b'])
+
+    assert cache.get('p', 'z', 'instances', loader) == ['a']
+    clock.now += 59
+    assert cache.get('p', 'z', 'instances', loader) == ['a']
+    clock.now += 2
+    assert cache.get('p', 'z', 'instances', loader) == ['b']
+    assert loader.calls == 2
+
+
+def test_evicts_least_recently_used(clock, make_cache):
+    cache = make_cache(max_entries=2)
+    loaders = {zone: Loader([zone]) for zone in ('a', 'b', 'c')}
+    for zone in ('a', 'b'):
+        cache.get('p', zone, 'instances', loaders[zone])
+    cache.get('p', 'a', 'instances', loaders['a'])
+    cache.get('p', 'c', 'instances', loaders['c'])
+
+    cache.get('p', 'a', 'instances', loaders['a'])
+    cache.get('p', 'b', 'instances', loaders['b'])
+
+    assert loaders['a'].calls == 1
+    assert loaders['b'].calls == 2
+
+
+def test_invalidate_matches_given_fields(clock, make_cache):
+    cache = make_cache()
+    loaders = {key: Loader([key]) for key in [('p', 'a'), ('p', 'b'), ('q', 'a')]}
+    for (project, zone), loader in loaders.items():
+        cache.get(project, zone, 'instances', loader)
+
+    cache.invalidate(zone='a')
+    for (project, zone), loader in loaders.items():
+        cache.get(project, zone, 'instances', loader)
+
+    assert {key: loader.calls for key, loader in loaders.items()} == {('p', 'a'): 2, ('p', 'b'): 1, ('q', 'a'): 2}
+
+
+def test_mutation_invalidates_zone_and_aggregated_listing(clock, make_cache):
+    cache = make_cache()
+    loaders = {zone: Loader([zone]) for zone in ('a', 'b', None)}
+    for zone, loader in loaders.items():
+        cache.get('p', zone, 'instances', loader)
+
+    gcp.notify_mutation('instances', 'p', 'a')
+    for zone, loader in loaders.items():
+        cache.get('p', zone, 'instances', loader)
+
+    assert {zone: loader.calls for zone, loader in loaders.items()} == {'a': 2, 'b': 1, None: 2}
+
+
+def test_listing_that_races_an_invalidation_is_not_cached(clock, make_cache):
+    cache = make_cache()
+
+    def stale_listing():
+        # The portal mutates the project while the listing is in flight
+        gcp.notify_mutation('instances', 'p', 'z')
+        return ['before']
+
+    assert cache.get('p', 'z', 'instances', stale_listing) == ['before']
+    assert cache.get('p', 'z', 'instances', Loader(['after'])) == ['after']
+    assert cache.get('p', 'z', 'instances', Loader(['unused'])) == ['after']
+
+
+def test_sqlite_backing_survives_restart(clock, make_cache, tmp_path):
+    db_path = str(tmp_path / 'inventory.db')
+    records = [_instance('vm-1'), _instance('vm-2', status='TERMINATED')]
+    make_cache(db_path=db_path).get('p', 'us-central1-a', 'instances', Loader(records))
+
+    restarted = make_cache(db_path=db_path)
+    loader = Loader([])
+
+    assert restarted.get('p', 'us-central1-a', 'instances', loader) == records
+    assert loader.calls == 0
+
+
+def test_close_stops_listening_for_mutations(clock, make_cache):
+    cache = make_cache()
+    loader = Loader(['a'])
+    cache.get('p', 'z', 'instances', loader)
+    cache.close()
+
+    gcp.notify_mutation('instances', 'p', 'z')
+
+    assert cache.get('p', 'z', 'instances', loader) == ['a']
+    assert loader.calls == 1
+
+
+def test_list_instances_filters_status_locally(clock, make_cache):
+    cache = make_cache()
+    records = [_instance('vm-1'), _instance('vm-2', status='TERMINATED')]
+    cache.get('p', 'z', 'instances', Loader(records))
+
+    assert inventory_cache.list_instances('p', 'z', status='RUNNING', cache=cache) == records[:1]
+    assert inventory_cache.list_instances('p', 'z', cache=cache) == records
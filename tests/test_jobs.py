@@ -0,0 +1,177 @@
+import json
+import threading
+import time
+
+import pytest
+
+import jobs
+
+
+class FakeFuture:
+    def __init__(self):
+        self.callbacks = []
+
+    def add_done_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def result(self):
+        return None
+
+
+class FakePoller:
+    def __init__(self):
+        self.tracked = []
+
+    def track(self, project, name, zone=None, region=None, timeout=None):
+        future = FakeFuture()
+        self.tracked.append(((project, name, zone), future))
+        return future
+
+
+@pytest.fixture
+def poller(monkeypatch):
+    poller = FakePoller()
+    monkeypatch.setattr(jobs.operations, 'get_poller', lambda source: poller)
+    return poller
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = jobs.JobQueue(db_path=str(tmp_path / 'jobs.db'), max_attempts=3, key_path='key.json')
+    yield queue
+    queue.close()
+
+
+def _insert(queue, job_id, state, attempts=0, job_type='create_bucket', operation=None):
+    # Distinct creation times keep the claim order deterministic
+    now = time.time() + queue._db.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+    queue._db.execute(
+        'INSERT INTO jobs (id, type, params, state, operation, attempts, created, updated) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        (job_id, job_type, json.dumps({'project': 'p'}), state,
+         json.dumps(operation) if operation else None, attempts, now, now))
+    queue._db.commit()
+
+
+def test_recover_requeues_interrupted_jobs(queue, poller):
+    _insert(queue, 'interrupted', jobs.RUNNING, attempts=1)
+    _insert(queue, 'queued', jobs.QUEUED)
+    _insert(queue, 'done', jobs.SUCCEEDED, attempts=1)
+
+    queue._recover()
+
+    assert queue.get('interrupted').state == jobs.QUEUED
+    assert queue.get('queued').state == jobs.QUEUED
+    assert queue.get('done').state == jobs.SUCCEEDED
+    assert poller.tracked == []
+
+
+def test_recover_fails_jobs_interrupted_too_often(queue, poller):
+    _insert(queue, 'crashy', jobs.RUNNING, attempts=3)
+
+    queue._recover()
+
+    job = queue.get('crashy')
+    assert job.state == jobs.FAILED
+    assert job.error == 'Interrupted too many times'
+
+
+def test_recover_resumes_polling_waiting_jobs(queue, poller):
+    operation = {'project': 'p', 'zone': 'us-central1-a', 'name': 'operation-1'}
+    _insert(queue, 'waiting', jobs.WAITING, attempts=1, job_type='terminate_instance', operation=operation)
+
+    queue._recover()
+
+    assert [tracked for tracked, _ in poller.tracked] == [('p', 'operation-1', 'us-central1-a')]
+    assert queue.get('waiting').state == jobs.WAITING
+
+
+def test_resumed_operation_finishes_job(queue, poller, monkeypatch):
+    monkeypatch.setitem(jobs.JOB_TYPES, 'terminate_instance',
+                        jobs.JobType(start=None, finish=lambda params: {'project': params['project']}))
+    operation = {'project': 'p', 'zone': 'us-central1-a', 'name': 'operation-1'}
+    _insert(queue, 'waiting', jobs.WAITING, attempts=1, job_type='terminate_instance', operation=operation)
+    queue._recover()
+
+    (_, future), = poller.tracked
+    for callback in future.callbacks:
+        callback(future)
+
+    job = queue.get('waiting')
+    assert job.state == jobs.SUCCEEDED
+    assert job.result == {'project': 'p'}
+
+
+def test_claim_respects_type_limits(queue):
+    queue.limits = {'create_bucket': 1}
+    _insert(queue, 'first', jobs.QUEUED)
+    _insert(queue, 'second', jobs.QUEUED)
+    _insert(queue, 'upload', jobs.QUEUED, job_type='upload_file')
+
+    claimed = [queue._claim(), queue._claim(), queue._claim()]
+
+    assert [job.id if job else None for job in claimed] == ['first', 'upload', None]
+    assert queue.get('first').state == jobs.RUNNING
+    assert queue.get('first').attempts == 1
+    assert queue.get('second').state == jobs.QUEUED
+
+
+def test_submit_and_cancel(queue):
+    job_id = queue.submit('create_bucket', bucket_name='b')
+
+    assert queue.get(job_id).params == {'bucket_name': 'b'}
+    assert queue.cancel(job_id)
+    assert queue.get(job_id).state == jobs.CANCELLED
+    assert not queue.cancel(job_id)
+    with pytest.raises(ValueError):
+        queue.submit('no_such_job')
+
+
+def test_restart_finishes_resumed_operation_once(queue, poller, monkeypatch):
+    finished = []
+
+    def finish(params):
+        finished.append(params)
+        return {}
+
+    monkeypatch.setitem(jobs.JOB_TYPES, 'terminate_instance', jobs.JobType(start=None, finish=finish))
+    operation = {'project': 'p', 'zone': 'us-central1-a', 'name': 'operation-1'}
+    _insert(queue, 'waiting', jobs.WAITING, attempts=1, job_type='terminate_instance', operation=operation)
+
+    queue.start()
+    queue.stop(wait=False)
+    queue.start()
+    # The operation is tracked by both runs; only the current run's callback may finish the job
+    for _, future in poller.tracked:
+        for callback in future.callbacks:
+            callback(future)
+
+    assert len(poller.tracked) == 2
+    assert len(finished) == 1
+    assert queue.get('waiting').state == jobs.SUCCEEDED
+
+
+def test_restart_waits_for_running_jobs_instead_of_rerunning_them(queue, monkeypatch):
+    started, release, runs = threading.Event(), threading.Event(), []
+
+    def run(params):
+        runs.append(params)
+        started.set()
+        release.wait(5)
+        return {}
+
+    monkeypatch.setitem(jobs.JOB_TYPES, 'create_bucket', jobs.JobType(run=run))
+    queue.poll_interval = 0.01
+    job_id = queue.start().submit('create_bucket', bucket_name='b')
+    assert started.wait(5)
+    queue.stop(wait=False)
+
+    restart = threading.Thread(target=queue.start)
+    restart.start()
+    time.sleep(0.05)
+    assert restart.is_alive()
+    release.set()
+    restart.join(5)
+
+    assert queue.wait(job_id, timeout=5).state == jobs.SUCCEEDED
+    assert len(runs) == 1
@@ -0,0 +1,141 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import operations
+
+
+class FakeOperations:
+    """Answers polls with RUNNING until an operation has been polled `polls` times."""
+
+    def __init__(self, polls=1, error=None):
+        self.polls = polls
+        self.error = error
+        self.times = []
+        self._lock = threading.Lock()
+
+    def __call__(self, op):
+        with self._lock:
+            self.times.append(time.monotonic())
+            done = len(self.times) >= self.polls
+        if not done:
+            return SimpleNamespace(name=op.name, status='RUNNING', error=None)
+        error = SimpleNamespace(errors=[SimpleNamespace(code='QUOTA', message=self.error)]) if self.error else None
+        return SimpleNamespace(name=op.name, status='DONE', error=error)
+
+
+@pytest.fixture
+def make_poller(monkeypatch):
+    pollers = []
+
+    def make_poller(fake, **options):
+        poller = operations.OperationPoller(**{'min_interval': 0.01, 'max_interval': 0.04, 'timeout': 5.0, **options})
+        monkeypatch.setattr(poller, '_get', fake)
+        pollers.append(poller)
+        return poller
+
+    yield make_poller
+    for poller in pollers:
+        poller.close()
+
+
+def test_resolves_to_finished_operation(make_poller):
+    poller = make_poller(FakeOperations(polls=3))
+
+    result = poller.wait('p', 'operation-1', zone='us-central1-a')
+
+    assert result.status == 'DONE'
+
+
+def test_backs_off_between_polls_up_to_max_interval(make_poller):
+    fake = FakeOperations(polls=6)
+    poller = make_poller(fake)
+
+    poller.wait('p', 'operation-1', zone='us-central1-a')
+
+    gaps = [later - earlier for earlier, later in zip(fake.times, fake.times[1:])]
+    # Each delay is drawn from [interval / 2, interval], the interval doubling from 0.02 to the 0.04 cap
+    intervals = [0.02, 0.04, 0.04, 0.04, 0.04]
+    assert all(gap >= interval / 2 - 0.002 for gap, interval in zip(gaps, intervals))
+    assert max(gaps) < 0.5
+
+
+def test_failed_operation_raises_operation_error(make_poller):
+    poller = make_poller(FakeOperations(error='Quota exceeded'))
+
+    with pytest.raises(operations.OperationError, match='QUOTA: Quota exceeded'):
+        poller.wait('p', 'operation-1', region='us-central1')
+
+
+def test_poll_error_is_raised_to_the_caller(make_poller):
+    def fail(op):
+        raise ConnectionError('unreachable')
+
+    poller = make_poller(fail)
+
+    with pytest.raises(ConnectionError):
+        poller.wait('p', 'operation-1')
+
+
+def test_deadline_raises_operation_timeout(make_poller):
+    poller = make_poller(FakeOperations(polls=10 ** 6))
+
+    started = time.monotonic()
+    with pytest.raises(operations.OperationTimeout):
+        poller.wait('p', 'operation-1', zone='us-central1-a', timeout=0.1)
+    assert time.monotonic() - started < 1.0
+
+
+def test_close_fails_pending_and_rejects_new_operations(make_poller):
+    poller = make_poller(FakeOperations(polls=10 ** 6))
+    future = poller.track('p', 'operation-1', zone='us-central1-a')
+
+    poller.close()
+
+    with pytest.raises(operations.OperationError, match='closed'):
+        future.result(timeout=1)
+    with pytest.raises(RuntimeError):
+        poller.track('p', 'operation-2')
+
+
+def test_cancelled_operation_is_dropped(make_poller):
+    fake = FakeOperations(polls=10 ** 6)
+    poller = make_poller(fake, min_interval=0.05)
+    future = poller.track('p', 'operation-1', zone='us-central1-a')
+
+    assert future.cancel()
+    time.sleep(0.15)
+
+    assert fake.times == []
+    poller.close()
+
+
+def test_cancel_racing_close_does_not_raise(make_poller):
+    poller = make_poller(FakeOperations(polls=10 ** 6), min_interval=10.0)
+    future = poller.track('p', 'operation-1', zone='us-central1-a')
+    future.cancel()
+
+    poller.close()
+
+    assert future.cancelled()
+
+
+def test_unexpected_error_fails_pending_and_restarts(make_poller, monkeypatch):
+    poller = make_poller(FakeOperations(polls=2))
+    broken = [True]
+    is_done = operations._is_done
+
+    def fragile_is_done(result):
+        if broken[0]:
+            raise RuntimeError('unexpected')
+        return is_done(result)
+
+    monkeypatch.setattr(operations, '_is_done', fragile_is_done)
+
+    with pytest.raises(operations.OperationError, match='Poller failed'):
+        poller.wait('p', 'operation-1', zone='us-central1-a', timeout=1.0)
+
+    broken[0] = False
+    assert poller.wait('p', 'operation-2', zone='us-central1-a', timeout=1.0).status == 'DONE'
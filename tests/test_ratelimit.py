@@ -0,0 +1,127 @@
+import pytest
+
+import ratelimit
+
+
+class ApiError(Exception):
+    def __init__(self, code, retry_after=None):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+        self.response = type('Response', (), {'headers': {'Retry-After': retry_after} if retry_after else {}})()
+
+
+class Flaky:
+    """Raises the given errors in turn, then returns 'ok'."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(ratelimit.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def _guard(**options):
+    return ratelimit.QuotaGuard(rates={'compute': (1000.0, 1000)}, **options)
+
+
+def test_retries_server_errors_with_bounded_backoff(sleeps):
+    guard = _guard(base_delay=0.5, max_delay=2.0)
+    func = Flaky(ApiError(503), ApiError(500), ConnectionError())
+
+    assert guard.call('compute', 'p', func) == 'ok'
+    assert func.calls == 4
+    assert len(sleeps) == 3
+    assert all(0.5 <= delay <= 2.0 for delay in sleeps)
+
+
+def test_backoff_honours_retry_after(sleeps):
+    guard = _guard(base_delay=0.1, max_delay=1.0)
+
+    guard.call('compute', 'p', Flaky(ApiError(429, retry_after='7')))
+
+    assert sleeps == [7.0]
+
+
+def test_non_retryable_error_is_raised_at_once(sleeps):
+    func = Flaky(ApiError(404))
+
+    with pytest.raises(ApiError):
+        _guard().call('compute', 'p', func)
+    assert func.calls == 1
+    assert sleeps == []
+
+
+def test_last_error_is_raised_when_attempts_run_out(sleeps):
+    func = Flaky(*[ApiError(503) for _ in range(5)])
+
+    with pytest.raises(ApiError):
+        _guard(max_attempts=3).call('compute', 'p', func)
+    assert func.calls == 3
+    assert len(sleeps) == 2
+
+
+def test_quota_errors_throttle_bucket_without_tripping_breaker(sleeps):
+    guard = _guard(failure_threshold=1)
+
+    guard.call('compute', 'p', Flaky(ApiError(429), ApiError(429)))
+
+    bucket, _ = guard._state('compute', 'p')
+    # Halved twice, then relaxed by 5% of the configured rate after the success
+    assert bucket.rate == pytest.approx(1000.0 / 4 + 50.0)
+    assert guard.call('compute', 'p', Flaky()) == 'ok'
+
+
+def test_breaker_opens_per_api_and_project(sleeps):
+    guard = _guard(max_attempts=1, failure_threshold=2, reset_timeout=60.0)
+    for _ in range(2):
+        with pytest.raises(ApiError):
+            guard.call('compute', 'p', Flaky(ApiError(503)))
+
+    func = Flaky()
+    with pytest.raises(ratelimit.CircuitOpenError):
+        guard.call('compute', 'p', func)
+    assert func.calls == 0
+    assert guard.call('compute', 'other', func) == 'ok'
+
+
+def test_breaker_success_resets_failure_count(sleeps):
+    guard = _guard(max_attempts=1, failure_threshold=2)
+    for func in (Flaky(ApiError(503)), Flaky(), Flaky(ApiError(503))):
+        try:
+            guard.call('compute', 'p', func)
+        except ApiError:
+            pass
+
+    assert guard.call('compute', 'p', Flaky()) == 'ok'
+
+
+def test_breaker_lets_one_trial_call_through_after_timeout():
+    breaker = ratelimit.CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+
+    breaker.before_call('compute')
+    with pytest.raises(ratelimit.CircuitOpenError):
+        breaker.before_call('compute')
+
+    breaker.record_success()
+    breaker.before_call('compute')
+    breaker.before_call('compute')
+
+
+def test_breaker_stays_open_until_timeout():
+    breaker = ratelimit.CircuitBreaker(failure_threshold=1, reset_timeout=60.0)
+    breaker.record_failure()
+
+    with pytest.raises(ratelimit.CircuitOpenError):
+        breaker.before_call('compute')
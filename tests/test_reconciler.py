@@ -0,0 +1,131 @@
+import pytest
+
+import gcp
+import inventory_cache
+import reconciler
+
+MANAGED = {'managed-by': 'cloud-portal'}
+
+
+def _instance(name, zone='us-central1-a', machine_type='e2-medium', labels=MANAGED):
+    return gcp.InstanceRecord(name, zone, 'RUNNING', machine_type, '10.0.0.2', None, dict(labels))
+
+
+def _bucket(name, location='US', storage_class='STANDARD', labels=MANAGED):
+    return gcp.BucketRecord(name, location, storage_class, None, dict(labels))
+
+
+def _desired_instance(name, zone='us-central1-a', machine_type='e2-medium', **extra):
+    return {'name': name, 'zone': zone, 'machine_type': machine_type, 'source_image': 'debian-12', **extra}
+
+
+@pytest.fixture
+def cache():
+    cache = inventory_cache.InventoryCache()
+    yield cache
+    cache.close()
+
+
+def _seed(cache, project, instances=(), buckets=()):
+    cache.get(project, None, 'instances', lambda: list(instances))
+    cache.get(project, None, 'buckets', lambda: list(buckets))
+
+
+def test_plan_instances_create_replace_update_and_noop():
+    current = [_instance('same'), _instance('resized', machine_type='e2-small'),
+               _instance('relabelled', labels={**MANAGED, 'team': 'old'})]
+    desired = [_desired_instance('same'), _desired_instance('resized'),
+               _desired_instance('relabelled', labels={'team': 'new'}), _desired_instance('new')]
+
+    actions = reconciler.plan_instances('p', desired, current)
+
+    assert {action.name: action.kind for action in actions} == {
+        'us-central1-a/resized': 'replace', 'us-central1-a/relabelled': 'update', 'us-central1-a/new': 'create'}
+    replace = next(action for action in actions if action.kind == 'replace')
+    assert replace.changes == {'machine_type': ('e2-small', 'e2-medium')}
+
+
+def test_plan_instances_prunes_only_managed():
+    current = [_instance('managed'), _instance('foreign', labels={})]
+
+    actions = reconciler.plan_instances('p', [], current, prune=True)
+
+    assert [(action.kind, action.name) for action in actions] == [('delete', 'us-central1-a/managed')]
+    assert reconciler.plan_instances('p', [], current) == []
+
+
+def test_plan_buckets_patches_in_place_and_ignores_location():
+    current = [_bucket('logs', location='EU'), _bucket('data')]
+    desired = [{'name': 'logs', 'location': 'US', 'storage_class': 'NEARLINE'}, {'name': 'data'},
+               {'name': 'new'}]
+
+    actions = reconciler.plan_buckets(desired, current)
+
+    assert [(action.kind, action.name, action.changes) for action in actions] == [
+        ('update', 'logs', {'storage_class': ('STANDARD', 'NEARLINE')}),
+        ('create', 'new', {}),
+    ]
+
+
+def test_plan_uploads_only_stale_files(tmp_path, monkeypatch):
+    (tmp_path / 'same.txt').write_text('same')
+    (tmp_path / 'changed.txt').write_text('changed')
+    monkeypatch.setattr(reconciler.uploads, 'list_remote_objects', lambda bucket, prefix: {'web/same.txt': {}})
+    monkeypatch.setattr(reconciler.uploads, 'is_current', lambda path, remote: remote is not None)
+
+    actions = reconciler.plan_uploads([{'bucket': 'site', 'source': str(tmp_path), 'prefix': 'web/'}], set())
+
+    (action,) = actions
+    assert action.key == 'upload:site/web/'
+    assert action.changes == {'files': (1, 2)}
+    assert action.depends_on == ()
+
+
+def test_uploads_to_created_bucket_depend_on_it(tmp_path, monkeypatch):
+    (tmp_path / 'index.html').write_text('hi')
+    monkeypatch.setattr(reconciler.uploads, 'list_remote_objects', pytest.fail)
+
+    (action,) = reconciler.plan_uploads([{'bucket': 'site', 'source': str(tmp_path)}], {'site'})
+
+    assert action.depends_on == ('bucket:site',)
+
+
+def test_plan_uses_spec_project_and_runs_actions_in_its_target(cache, monkeypatch):
+    _seed(cache, 'spec-project', buckets=[_bucket('kept')])
+    targets = []
+
+    def create_instances(specs):
+        targets.append((gcp.current_target(), specs[0]['project']))
+        return [{'success': True, 'instance_name': specs[0]['instance_name']}]
+
+    monkeypatch.setattr(gcp, 'create_instances', create_instances)
+    spec = {'project': 'spec-project', 'instances': [_desired_instance('vm')], 'buckets': [{'name': 'kept'}]}
+
+    with gcp.use_target('key.json', 'other-project'):
+        actions = reconciler.plan(spec, cache=cache)
+    results, errors = reconciler.apply(actions)
+
+    assert errors == {}
+    assert list(results) == ['instance:us-central1-a/vm']
+    assert targets == [(('key.json', 'spec-project'), 'spec-project')]
+
+
+@pytest.mark.parametrize('spec', [
+    {'instances': [_desired_instance('vm'), _desired_instance('vm')]},
+    {'buckets': [{'name': 'b'}, {'name': 'b', 'storage_class': 'NEARLINE'}]},
+    {'uploads': [{'bucket': 'b', 'source': 'one'}, {'bucket': 'b', 'source': 'two'}]},
+    {'load_balancers': [{'bucket': 'a', 'backend_bucket': 'lb'}, {'bucket': 'b', 'backend_bucket': 'lb'}]},
+])
+def test_duplicate_entries_are_rejected(spec, cache):
+    with pytest.raises(ValueError, match='Duplicate'):
+        reconciler.plan(spec, cache=cache)
+
+
+def test_same_instance_name_in_two_zones_is_allowed():
+    reconciler.validate_spec({'instances': [_desired_instance('vm'), _desired_instance('vm', zone='europe-west1-b')]})
+
+
+def test_describe():
+    actions = reconciler.plan_buckets([{'name': 'logs', 'storage_class': 'NEARLINE'}], [_bucket('logs')])
+
+    assert reconciler.describe(actions) == ['~ bucket logs: storage_class STANDARD -> NEARLINE']
@@ -0,0 +1,46 @@
+import pytest
+
+import sppechtotext
+
+np = pytest.importorskip('numpy')
+
+
+def _resample(samples, source_rate, target_rate, block):
+    resampler = sppechtotext._Resampler(source_rate, target_rate)
+    return np.concatenate([resampler.process(samples[i:i + block]) for i in range(0, len(samples), block)])
+
+
+def test_resampler_identity_rate():
+    samples = np.arange(100, dtype=np.float32)
+
+    output = _resample(samples, 16000, 16000, 100)
+
+    # The last sample is held back until the next block arrives
+    np.testing.assert_allclose(output, samples[:-1])
+
+
+def test_resampler_downsample_halves():
+    samples = np.arange(1000, dtype=np.float32)
+
+    output = _resample(samples, 32000, 16000, 1000)
+
+    np.testing.assert_allclose(output, samples[:-1:2])
+
+
+@pytest.mark.parametrize('block', [1, 7, 64, 333])
+def test_resampler_blocks_match_one_shot(block):
+    samples = np.sin(np.arange(2000) / 10).astype(np.float32)
+
+    whole = _resample(samples, 44100, 16000, len(samples))
+    blocked = _resample(samples, 44100, 16000, block)
+
+    assert len(blocked) == len(whole)
+    np.testing.assert_allclose(blocked, whole, atol=1e-5)
+
+
+def test_resampler_upsample_interpolates():
+    samples = np.array([0, 2, 4, 6], dtype=np.float32)
+
+    output = _resample(samples, 8000, 16000, 4)
+
+    np.testing.assert_allclose(output, [0, 1, 2, 3, 4, 5])
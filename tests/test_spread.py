@@ -0,0 +1,114 @@
+import re
+
+import pytest
+
+import spread
+
+
+def test_parse_anchor_forms():
+    assert spread.parse_anchor('Sheet1!B2:D9') == ('Sheet1', 1, 1)
+    assert spread.parse_anchor('AB10') == ('', 9, 27)
+    assert spread.parse_anchor('A:C') == ('', 0, 0)
+    assert spread.parse_anchor('Sheet1!C:E') == ('Sheet1', 0, 2)
+    assert spread.parse_anchor('Sheet1!2:5') == ('Sheet1', 1, 0)
+    assert spread.parse_anchor('Sheet1') == ('Sheet1', 0, 0)
+
+
+def test_parse_anchor_rejects_garbage():
+    with pytest.raises(ValueError):
+        spread.parse_anchor('Sheet1!not a range')
+
+
+def test_coalesce_writes_merges_adjacent_ranges():
+    data = spread.coalesce_writes([
+        ('Sheet1!A1', [['a', 'b']]),
+        ('Sheet1!A2', [['c', 'd']]),
+    ])
+
+    assert data == [{'range': 'Sheet1!A1:B2', 'values': [['a', 'b'], ['c', 'd']]}]
+
+
+def test_coalesce_writes_later_write_wins():
+    data = spread.coalesce_writes([
+        ('A1', [['old', 'kept']]),
+        ('A1', [['new']]),
+    ])
+
+    assert data == [{'range': 'A1:B1', 'values': [['new', 'kept']]}]
+
+
+def test_coalesce_writes_fills_gaps_with_none():
+    data = spread.coalesce_writes([
+        ('A1', [['a']]),
+        ('B2', [['b']]),
+    ])
+
+    assert data == [{'range': 'A1:B2', 'values': [['a', None], [None, 'b']]}]
+
+
+def test_coalesce_writes_keeps_distant_ranges_and_sheets_apart():
+    data = spread.coalesce_writes([
+        ('Sheet1!A1', [['a']]),
+        ('Sheet1!D5', [['b']]),
+        ('Sheet2!A1', [['c']]),
+        ('Sheet2!A3', []),
+    ])
+
+    assert sorted(item['range'] for item in data) == ['Sheet1!A1:A1', 'Sheet1!D5:D5', 'Sheet2!A1:A1']
+
+
+def test_coalesce_writes_transitive_merge():
+    # C1 only touches A1:B1 once B2 has widened the box
+    data = spread.coalesce_writes([
+        ('A1', [['a']]),
+        ('C1', [['c']]),
+        ('B1', [['b']]),
+    ])
+
+    assert data == [{'range': 'A1:C1', 'values': [['a', 'b', 'c']]}]
+
+
+class FakeSheet:
+    """Answers batchGet like the API: each range's trailing empty rows are trimmed."""
+
+    def __init__(self, rows):
+        self.rows = rows  # one-based row number -> values
+        self.requests = 0
+
+    def batch_get(self, ranges):
+        self.requests += 1
+        blocks = []
+        for range_name in ranges:
+            top, bottom = (int(re.search(r'\d+', part).group()) for part in range_name.split('!')[1].split(':'))
+            block = [self.rows.get(row, []) for row in range(top, bottom + 1)]
+            while block and not block[-1]:
+                block.pop()
+            blocks.append(block)
+        return blocks
+
+
+def _iter_rows(rows, **options):
+    client = spread.SheetsClient(flush_interval=0)
+    client.batch_get = FakeSheet(rows).batch_get
+    return list(client.iter_rows('Sheet1', **options))
+
+
+def test_iter_rows_reads_across_blocks():
+    rows = {row: [f'r{row}'] for row in range(1, 24)}
+
+    assert _iter_rows(rows, block_rows=5, blocks_per_request=2) == [[f'r{row}'] for row in range(1, 24)]
+
+
+def test_iter_rows_keeps_going_past_an_empty_block():
+    # Rows 4-6 and 7-9 are empty blocks; row 10 is in the second request
+    rows = {1: ['a'], 2: ['b'], 10: ['c']}
+
+    result = _iter_rows(rows, block_rows=3, blocks_per_request=2)
+
+    assert result == [['a'], ['b']] + [[]] * 7 + [['c']]
+
+
+def test_iter_rows_stops_after_an_empty_request():
+    rows = {1: ['a'], 20: ['unreachable']}
+
+    assert _iter_rows(rows, block_rows=3, blocks_per_request=2) == [['a']]
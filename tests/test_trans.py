@@ -0,0 +1,28 @@
+import trans
+
+
+def test_pack_batches_segment_limit():
+    texts = [str(i) for i in range(7)]
+
+    batches = trans.pack_batches(texts, max_segments=3, max_chars=1000)
+
+    assert batches == [['0', '1', '2'], ['3', '4', '5'], ['6']]
+
+
+def test_pack_batches_char_limit():
+    batches = trans.pack_batches(['aaaa', 'bbb', 'cc', 'd'], max_segments=10, max_chars=6)
+
+    assert batches == [['aaaa'], ['bbb', 'cc', 'd']]
+
+
+def test_pack_batches_oversized_text_goes_alone():
+    batches = trans.pack_batches(['a', 'x' * 20, 'b'], max_segments=10, max_chars=5)
+
+    assert batches == [['a'], ['x' * 20], ['b']]
+
+
+def test_pack_batches_preserves_order_and_empty_input():
+    texts = ['t%d' % i for i in range(300)]
+
+    assert [text for batch in trans.pack_batches(texts) for text in batch] == texts
+    assert trans.pack_batches([]) == []
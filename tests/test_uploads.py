@@ -0,0 +1,271 @@
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import uploads
+
+
+def _crc32c(data):
+    """Bitwise CRC32C (Castagnoli), slow but independent of any installed package."""
+    crc = 0xFFFFFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ (0x82F63B78 if crc & 1 else 0)
+    return crc ^ 0xFFFFFFFF
+
+
+class StrictChecksum:
+    """Mimics the google-crc32c C extension, which only accepts read-only bytes."""
+
+    def __init__(self):
+        self.data = b''
+
+    def update(self, data):
+        if not isinstance(data, bytes):
+            raise TypeError(f"argument 2 must be read-only bytes-like object, not {type(data).__name__}")
+        self.data += data
+
+    def digest(self):
+        return _crc32c(self.data).to_bytes(4, 'big')
+
+
+@pytest.fixture
+def strict_crc32c(monkeypatch):
+    monkeypatch.setattr(uploads, '_crc32c_factory', StrictChecksum)
+
+
+def test_crc32c_reference():
+    assert _crc32c(b'123456789') == 0xE3069283
+
+
+def test_file_checksums_hashes_real_file(tmp_path, strict_crc32c):
+    data = bytes(range(256)) * 41 + b'tail'
+    path = tmp_path / 'data.bin'
+    path.write_bytes(data)
+
+    crc32c, md5 = uploads.file_checksums(str(path), block_size=1000)
+
+    assert crc32c == base64.b64encode(_crc32c(data).to_bytes(4, 'big')).decode('ascii')
+    assert md5 == base64.b64encode(hashlib.md5(data).digest()).decode('ascii')
+
+
+def test_file_checksums_empty_file(tmp_path, strict_crc32c):
+    path = tmp_path / 'empty'
+    path.write_bytes(b'')
+
+    crc32c, md5 = uploads.file_checksums(str(path))
+
+    assert crc32c == base64.b64encode(bytes(4)).decode('ascii')
+    assert md5 == base64.b64encode(hashlib.md5(b'').digest()).decode('ascii')
+
+
+def test_file_checksums_with_installed_crc32c(tmp_path):
+    google_crc32c = pytest.importorskip('google_crc32c')
+    data = b'x' * 3000
+    path = tmp_path / 'data.bin'
+    path.write_bytes(data)
+
+    crc32c, _ = uploads.file_checksums(str(path), block_size=1024)
+
+    assert crc32c == base64.b64encode(google_crc32c.Checksum(data).digest()).decode('ascii')
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    hashed = []
+
+    def file_checksums(path):
+        hashed.append(path)
+        return f"crc-{len(hashed)}", f"md5-{len(hashed)}"
+
+    monkeypatch.setattr(uploads, 'file_checksums', file_checksums)
+    return hashed
+
+
+def test_content_index_hashes_unchanged_file_once(tmp_path, hashed):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(b'data')
+    index = uploads.ContentIndex(db_path=str(tmp_path / 'index.db'), batch_size=1)
+
+    first = index.checksums(str(path))
+    second = index.checksums(str(path))
+
+    assert tuple(first) == tuple(second) == ('crc-1', 'md5-1')
+    assert hashed == [str(path)]
+    index.close()
+
+
+def test_content_index_rehashes_changed_file(tmp_path, hashed):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(b'data')
+    index = uploads.ContentIndex(db_path=str(tmp_path / 'index.db'), batch_size=1)
+    index.checksums(str(path))
+
+    path.write_bytes(b'longer data')
+
+    assert tuple(index.checksums(str(path))) == ('crc-2', 'md5-2')
+    index.close()
+
+
+def test_content_index_persists_after_flush(tmp_path, hashed):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(b'data')
+    db_path = str(tmp_path / 'index.db')
+    index = uploads.ContentIndex(db_path=db_path, batch_size=100)
+    index.checksums(str(path))
+    index.close()
+
+    reopened = uploads.ContentIndex(db_path=db_path)
+
+    assert tuple(reopened.checksums(str(path))) == ('crc-1', 'md5-1')
+    assert len(hashed) == 1
+    reopened.close()
+
+
+def test_content_index_buffers_until_batch_size(tmp_path, hashed):
+    index = uploads.ContentIndex(db_path=str(tmp_path / 'index.db'), batch_size=2)
+    for name in ('a', 'b', 'c'):
+        (tmp_path / name).write_bytes(name.encode())
+        index.checksums(str(tmp_path / name))
+
+    count = index._db.execute('SELECT COUNT(*) FROM content').fetchone()[0]
+
+    assert count == 2
+    assert len(index._pending) == 1
+    index.close()
+
+
+def test_upload_state_updates_survive_reload(tmp_path):
+    source = tmp_path / 'data.bin'
+    source.write_bytes(b'data')
+    state = uploads._UploadState(str(tmp_path / 'state'), 'bucket', 'blob', str(source))
+    state.data['parts'] = [{'name': 'blob', 'start': 0, 'end': 4}]
+    state.save()
+
+    state.update(state.data['parts'][0], url='https://session', done=True)
+
+    reloaded = uploads._UploadState(str(tmp_path / 'state'), 'bucket', 'blob', str(source))
+    assert reloaded.data == {'parts': [{'name': 'blob', 'start': 0, 'end': 4, 'url': 'https://session', 'done': True}]}
+
+
+def test_concurrent_part_updates_write_consistent_state(tmp_path):
+    source = tmp_path / 'data.bin'
+    source.write_bytes(b'data')
+    state = uploads._UploadState(str(tmp_path / 'state'), 'bucket', 'blob', str(source))
+    state.data['parts'] = [{'name': f'part-{i}'} for i in range(8)]
+
+    def work(part):
+        for attempt in range(50):
+            state.update(part, **{f'key-{attempt}': attempt})
+        state.update(part, done=True)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(work, state.data['parts']))
+
+    reloaded = uploads._UploadState(str(tmp_path / 'state'), 'bucket', 'blob', str(source))
+    assert all(part['done'] and part['key-49'] == 49 for part in reloaded.data['parts'])
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+
+    def create_resumable_upload_session(self, size):
+        return f"https://session/{self.name}"
+
+    def compose(self, sources):
+        raise RuntimeError('compose failed')
+
+    def delete(self):
+        self.bucket.deleted.append(self.name)
+
+
+class FakeBucket:
+    def __init__(self):
+        self.deleted = []
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+
+def test_failed_compose_deletes_parts_and_state(tmp_path, monkeypatch):
+    bucket = FakeBucket()
+    storage_client = type('StorageClient', (), {'bucket': lambda self, name: bucket})()
+    monkeypatch.setattr(uploads.gcp, 'initialize_clients', lambda: (None, storage_client))
+    monkeypatch.setattr(uploads, '_authorized_session', lambda: None)
+    monkeypatch.setattr(uploads, '_send_range', lambda *args: None)
+    source = tmp_path / 'data.bin'
+    source.write_bytes(b'x' * (600 * 1024))
+    state_dir = tmp_path / 'state'
+
+    with pytest.raises(RuntimeError, match='compose failed'):
+        uploads.upload_file('bucket', str(source), 'data.bin', chunk_size=256 * 1024, parallel_threshold=1024,
+                            state_dir=str(state_dir))
+
+    assert len(bucket.deleted) == 3
+    assert all(name.startswith('data.bin.part-') for name in bucket.deleted)
+    assert list(state_dir.iterdir()) == []
+
+
+class MetadataOnlyBucket:
+    """Serves single-object metadata; any listing fails the test."""
+
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self.gets = []
+
+    def get_blob(self, name):
+        self.gets.append(name)
+        return self.blobs.get(name)
+
+
+class MetadataOnlyStorage:
+    def __init__(self, bucket):
+        self._bucket = bucket
+
+    def bucket(self, name):
+        return self._bucket
+
+    def list_blobs(self, *args, **kwargs):
+        raise AssertionError('a single-object check must not list the bucket')
+
+
+@pytest.fixture
+def metadata_storage(tmp_path, monkeypatch, strict_crc32c):
+    data = b'content'
+    path = tmp_path / 'data'
+    path.write_bytes(data)
+    crc32c, md5 = uploads.file_checksums(str(path))
+    bucket = MetadataOnlyBucket({'data': type('Blob', (), {'size': len(data), 'crc32c': crc32c, 'md5_hash': md5})})
+    monkeypatch.setattr(uploads.gcp, 'initialize_clients', lambda: (None, MetadataOnlyStorage(bucket)))
+    monkeypatch.setattr(uploads, 'get_index', lambda: uploads.ContentIndex(db_path=str(tmp_path / 'index.db')))
+    uploaded = []
+
+    def upload_file(bucket_name, source_file, blob_name, **options):
+        uploaded.append(blob_name)
+        return type('Blob', (), {'name': blob_name})
+
+    monkeypatch.setattr(uploads, 'upload_file', upload_file)
+    return path, bucket, uploaded
+
+
+def test_unchanged_file_skipped_after_one_metadata_get(metadata_storage):
+    path, bucket, uploaded = metadata_storage
+
+    assert uploads.gcp.upload_file_to_storage('bucket', str(path))
+    assert bucket.gets == ['data']
+    assert uploaded == []
+
+
+def test_changed_or_missing_object_is_uploaded(metadata_storage):
+    path, bucket, uploaded = metadata_storage
+    path.write_bytes(b'changed content')
+
+    assert uploads.gcp.upload_file_to_storage('bucket', str(path))
+    assert uploads.gcp.upload_file_to_storage('bucket', str(path), 'elsewhere')
+    assert bucket.gets == ['data', 'elsewhere']
+    assert uploaded == ['data', 'elsewhere']
@@ -0,0 +1,92 @@
+import pytest
+
+import warmpool
+
+KEY = warmpool.PoolKey('project', 'us-central1-a', 'e2-medium', 'debian-12')
+
+
+def _pool(**options):
+    return warmpool.WarmPool(KEY, **{'min_size': 1, 'max_size': 10, 'window': 100.0, 'refill_seconds': 20.0,
+                                     **options})
+
+
+def test_desired_size_without_requests_is_min_size():
+    assert _pool(min_size=2)._desired_size(1000.0) == 2
+
+
+def test_desired_size_follows_request_rate():
+    pool = _pool()
+    # 30 requests in a 100 s window with 20 s refills: 6 expected during a refill
+    pool._requests.extend(950.0 + i for i in range(30))
+
+    assert pool._desired_size(1000.0) == 6
+
+
+def test_desired_size_rounds_up():
+    pool = _pool()
+    pool._requests.append(999.0)
+
+    assert pool._desired_size(1000.0) == 1
+    assert _pool(min_size=0)._desired_size(1000.0) == 0
+
+
+def test_desired_size_capped_at_max_size():
+    pool = _pool(max_size=3)
+    pool._requests.extend([999.0] * 100)
+
+    assert pool._desired_size(1000.0) == 3
+
+
+def test_desired_size_forgets_requests_outside_window():
+    pool = _pool()
+    pool._requests.extend([100.0] * 50 + [950.0] * 10)
+
+    assert pool._desired_size(1000.0) == 2
+    assert list(pool._requests) == [950.0] * 10
+
+
+def test_unknown_standby_mode():
+    with pytest.raises(ValueError):
+        _pool(standby='hibernate')
+
+
+def test_pool_id_is_stable_and_label_safe():
+    assert warmpool.pool_id(KEY) == warmpool.pool_id(warmpool.PoolKey(*KEY))
+    assert warmpool.pool_id(KEY) != warmpool.pool_id(KEY._replace(zone='us-central1-b'))
+    assert len(warmpool.pool_id(KEY)) == 16
+
+
+@pytest.fixture
+def inventory(monkeypatch):
+    """Parked instances by pool ID; records which target each listing ran under."""
+    inventory = {'parked': {}, 'targets': []}
+
+    def iter_instances(project, zone, status=None, labels=None):
+        inventory['targets'].append(warmpool.gcp.current_target())
+        names = inventory['parked'].get(labels[warmpool.POOL_LABEL], [])
+        return [warmpool.gcp.InstanceRecord(name, zone, status, None, None, None, labels) for name in names]
+
+    monkeypatch.setattr(warmpool.gcp, 'iter_instances', iter_instances)
+    return inventory
+
+
+def test_pool_created_after_start_picks_up_parked_instances(inventory):
+    inventory['parked'][warmpool.pool_id(KEY)] = ['warm-1', 'warm-2']
+    manager = warmpool.WarmPoolManager(check_interval=3600, key_path='key.json', min_size=0)
+
+    with manager:
+        pool = manager.pool(*KEY)
+
+    assert pool.available() == 2
+    assert inventory['targets'] == [('key.json', KEY.project)]
+    assert manager.pool(*KEY) is pool
+
+
+def test_configured_pool_is_refreshed_once_running(inventory):
+    inventory['parked'][warmpool.pool_id(KEY)] = ['warm-1']
+    manager = warmpool.WarmPoolManager(check_interval=3600, min_size=0)
+
+    assert manager.configure(*KEY).available() == 0
+    with manager:
+        assert manager.pool(*KEY).available() == 1
+        assert manager.configure(*KEY, max_size=5).available() == 1
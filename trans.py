@@ -1,21 +1,251 @@
-from google.cloud import translate_v2 as translate
-import os
+import csv
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
-# Set the path to your service account key file
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "C:\\Users\\naman\\Downloads\\watchful-slice-443014-f0-ecd3668e9487.json"
+import clients
+import ratelimit
+
+logger = logging.getLogger(__name__)
+
+# Path to your service account key file
+SERVICE_ACCOUNT_FILE = "C:\\Users\\naman\\Downloads\\watchful-slice-443014-f0-ecd3668e9487.json"
+
+# Per-request limits of the Translation API (v2)
+MAX_SEGMENTS = 128
+MAX_CHARS = 30000
+
+def get_client():
+    """Return the shared Translate client from the process-wide client registry."""
+    return clients.get_client('translate', source=SERVICE_ACCOUNT_FILE)
+
+def translate(text, target_language):
+    """Translate text to the target language and return the API result."""
+    return ratelimit.call('translate', None, get_client().translate, text, target_language=target_language)
+
+class TranslationCache:
+    """
+    Content-addressed translation cache keyed by (text hash, source, target).
+
+    Keeps the most recently used entries in memory and, with db_path set, every
+    entry in SQLite so translations survive restarts.
+    """
+
+    def __init__(self, max_entries=100000, db_path=None):
+        """
+        Args:
+            max_entries (int): Maximum number of entries held in memory.
+            db_path (str): Optional SQLite file backing the cache.
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS translations ('
+                'digest TEXT, source TEXT, target TEXT, translation TEXT, '
+                'PRIMARY KEY (digest, source, target))')
+            self._db.commit()
+
+    @staticmethod
+    def key(text, source_language, target_language):
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return digest, source_language or 'auto', target_language
+
+    def get_many(self, keys):
+        """Return {key: translation} for the keys that are cached."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+            missing = [key for key in keys if key not in found]
+            if self._db is not None:
+                for key in missing:
+                    row = self._db.execute(
+                        'SELECT translation FROM translations WHERE digest = ? AND source = ? AND target = ?',
+                        key).fetchone()
+                    if row is not None:
+                        found[key] = row[0]
+                        self._remember(key, row[0])
+        return found
+
+    def put_many(self, items):
+        """Store {key: translation} entries."""
+        with self._lock:
+            for key, translation in items.items():
+                self._remember(key, translation)
+            if self._db is not None:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO translations (digest, source, target, translation) VALUES (?, ?, ?, ?)',
+                    [key + (translation,) for key, translation in items.items()])
+                self._db.commit()
+
+    def _remember(self, key, translation):
+        self._entries[key] = translation
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache(**options):
+    """Return the process-wide translation cache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranslationCache(**options)
+        return _cache
+
+def pack_batches(texts, max_segments=MAX_SEGMENTS, max_chars=MAX_CHARS):
+    """
+    Greedily pack texts into request-sized batches.
+
+    Args:
+        texts (list): Strings to pack, in order.
+        max_segments (int): Maximum strings per request.
+        max_chars (int): Maximum total characters per request; a longer single
+            string is sent on its own.
+
+    Returns:
+        list: Lists of strings, one per request.
+    """
+    batches = []
+    batch, chars = [], 0
+    for text in texts:
+        if batch and (len(batch) >= max_segments or chars + len(text) > max_chars):
+            batches.append(batch)
+            batch, chars = [], 0
+        batch.append(text)
+        chars += len(text)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def _translate_batch(batch, target_language, source_language):
+    results = ratelimit.call('translate', None, get_client().translate, batch,
+                             target_language=target_language, source_language=source_language, format_='text')
+    return [result['translatedText'] for result in results]
+
+def translate_iter(texts, target_language, source_language=None, window=2000, max_workers=4, cache=None):
+    """
+    Translate an iterable of strings, yielding translations in input order.
+
+    Input is consumed a window at a time. Within a window, cached strings and
+    duplicates never reach the API; the rest are packed into maximum-size requests
+    that run concurrently.
+
+    Args:
+        texts (iterable): Strings to translate.
+        target_language (str): Target language code, e.g. 'es'.
+        source_language (str): Source language code, or None to auto-detect.
+        window (int): Strings read from the input per round.
+        max_workers (int): Requests in flight at once.
+        cache (TranslationCache): Cache to use; defaults to the shared cache.
+
+    Yields:
+        str: The translation of each input string.
+    """
+    cache = cache or get_cache()
+    texts = iter(texts)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            chunk = list(islice(texts, window))
+            if not chunk:
+                return
+            keys = [TranslationCache.key(text, source_language, target_language) for text in chunk]
+            known = cache.get_many(keys)
+            pending = list(dict.fromkeys(text for text, key in zip(chunk, keys) if key not in known))
+
+            translated = {}
+            batches = pack_batches(pending)
+            for batch, results in zip(batches, pool.map(
+                    lambda batch: _translate_batch(batch, target_language, source_language), batches)):
+                for text, result in zip(batch, results):
+                    translated[TranslationCache.key(text, source_language, target_language)] = result
+            if translated:
+                cache.put_many(translated)
+                known.update(translated)
+            logger.info(f"Translated {len(chunk)} strings ({len(pending)} sent to the API in {len(batches)} requests).")
+
+            for key in keys:
+                yield known[key]
+
+def translate_batch(texts, target_language, source_language=None, **options):
+    """
+    Translate a list of strings.
+
+    Returns:
+        list: Translations in input order.
+    """
+    return list(translate_iter(texts, target_language, source_language, **options))
+
+def translate_file(input_path, output_path, target_language, field='text', source_language=None, **options):
+    """
+    Translate one field of every record in a JSONL or CSV file, streaming record by record.
+
+    The format is chosen by the input file extension ('.csv' for CSV, JSONL otherwise).
+    Each output record is the input record with the field replaced by its translation.
+
+    Args:
+        input_path (str): JSONL or CSV file to read.
+        output_path (str): File to write, in the same format.
+        target_language (str): Target language code.
+        field (str): Name of the field / column to translate.
+        source_language (str): Source language code, or None to auto-detect.
+        **options: Extra arguments for translate_iter().
+
+    Returns:
+        int: Number of records written.
+    """
+    is_csv = input_path.lower().endswith('.csv')
+    count = 0
+    with open(input_path, newline='', encoding='utf-8') as infile, \
+            open(output_path, 'w', newline='', encoding='utf-8') as outfile:
+        if is_csv:
+            reader = csv.DictReader(infile)
+            writer = csv.DictWriter(outfile, fieldnames=reader.fieldnames)
+            writer.writeheader()
+            records = reader
+        else:
+            records = (json.loads(line) for line in infile if line.strip())
+
+        # Pair each record with its translation lazily so only one window is in memory
+        pending = deque()
+        def texts():
+            for record in records:
+                pending.append(record)
+                yield str(record.get(field) or '')
+
+        for translation in translate_iter(texts(), target_language, source_language, **options):
+            record = pending.popleft()
+            record[field] = translation
+            if is_csv:
+                writer.writerow(record)
+            else:
+                outfile.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+    logger.info(f"Translated {count} records from {input_path} to {output_path}.")
+    return count
 
 def translate_text():
     """Prompt user for text and translate to the target language."""
     try:
-        # Initialize the client
-        client = translate.Client()
-
         # Get user input for text and target language
         text = input("Enter the text to translate: ")
         target_language = input("Enter the target language code (e.g., 'es' for Spanish, 'fr' for French): ")
 
         # Translate the text
-        result = client.translate(text, target_language=target_language)
+        result = translate(text, target_language)
 
         # Display the translation result
         print("\nTranslation Successful!")
@@ -25,4 +255,4 @@ def translate_text():
         print("Error occurred:", e)
 
 if __name__ == "__main__":
-    translate_text()
\ No newline at end of file
+    translate_text()
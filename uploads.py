@@ -0,0 +1,607 @@
+import atexit
+import base64
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import clients
+import gcp
+import metrics
+import ratelimit
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Resumable upload chunks must be a multiple of 256 KiB
+CHUNK_ALIGNMENT = 256 * 1024
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+# Files at least this large are split into parts uploaded in parallel and composed
+PARALLEL_THRESHOLD = 64 * 1024 * 1024
+# Cloud Storage compose accepts at most 32 source objects
+MAX_PARTS = 32
+STATE_DIR = os.path.join(os.path.expanduser('~'), '.cloud-portal', 'uploads')
+INDEX_PATH = os.path.join(os.path.expanduser('~'), '.cloud-portal', 'content-index.db')
+# Block size for hashing; large enough that per-call overhead disappears next to the hashing itself
+HASH_BLOCK_SIZE = 1024 * 1024
+# Service account credentials need an explicit scope before they can be refreshed for raw JSON API calls
+SCOPES = ['https://www.googleapis.com/auth/devstorage.read_write']
+
+
+class UploadError(Exception):
+    """Raised when a resumable upload session cannot make progress."""
+
+
+class UploadHTTPError(UploadError):
+    """A resumable upload request that failed with a retryable HTTP status."""
+
+    def __init__(self, response):
+        super().__init__(f"Resumable upload request returned {response.status_code}")
+        self.code = response.status_code
+        self.response = response
+
+
+def _put(session, url, **kwargs):
+    """PUT to a resumable session through the quota guard, retrying quota and server errors."""
+    def send():
+        response = session.put(url, **kwargs)
+        if response.status_code in ratelimit.RETRYABLE_STATUSES:
+            raise UploadHTTPError(response)
+        return response
+    return ratelimit.call('storage', gcp.current_target()[1], send)
+
+
+def _align(size):
+    return max(CHUNK_ALIGNMENT, -(-size // CHUNK_ALIGNMENT) * CHUNK_ALIGNMENT)
+
+
+_crc32c_factory = None
+
+
+def _crc32c():
+    """
+    Return a new CRC32C hasher, using a native implementation where one is installed.
+
+    google-crc32c uses its C extension (hardware CRC32C instructions) when it was
+    built with one; otherwise the crc32c package is tried before falling back to
+    google-crc32c's pure-Python code, which is far slower on large files.
+    """
+    global _crc32c_factory
+    if _crc32c_factory is None:
+        import google_crc32c
+
+        factory = google_crc32c.Checksum
+        if getattr(google_crc32c, 'implementation', 'c') != 'c':
+            try:
+                import crc32c
+
+                factory = crc32c.CRC32CHash
+            except ImportError:
+                logger.warning("No native CRC32C implementation is installed; hashing will be slow.")
+        _crc32c_factory = factory
+    return _crc32c_factory()
+
+
+def file_checksums(path, block_size=HASH_BLOCK_SIZE):
+    """
+    Compute the base64 CRC32C and MD5 of a file, streaming it in blocks.
+
+    The values use the same encoding as the crc32c / md5Hash object metadata. Blocks
+    are passed to the hashers as bytes: the google-crc32c C extension rejects memoryviews.
+
+    Args:
+        path (str): Path to the file.
+        block_size (int): Bytes read per block.
+
+    Returns:
+        tuple: (crc32c, md5) as base64 strings.
+    """
+    crc = _crc32c()
+    md5 = hashlib.md5(usedforsecurity=False)
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            crc.update(block)
+            md5.update(block)
+    return base64.b64encode(crc.digest()).decode('ascii'), base64.b64encode(md5.digest()).decode('ascii')
+
+
+class ContentIndex:
+    """
+    Persistent map of (path, size, mtime) to a file's CRC32C and MD5.
+
+    A file is only hashed when its size or modification time changed since it was last
+    indexed, so checking a large unchanged tree costs one stat call per file. Entries
+    are written to SQLite in batches.
+    """
+
+    def __init__(self, db_path=INDEX_PATH, batch_size=500):
+        """
+        Args:
+            db_path (str): SQLite file holding the index.
+            batch_size (int): New entries buffered before they are written.
+        """
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = []
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS content ('
+            'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, crc32c TEXT, md5 TEXT)')
+        self._db.commit()
+
+    def checksums(self, path, stat=None):
+        """
+        Return a file's checksums, hashing it only if it changed since it was indexed.
+
+        Args:
+            path (str): Path to the file.
+            stat (os.stat_result): The file's stat, if the caller already has it.
+
+        Returns:
+            tuple: (crc32c, md5) as base64 strings.
+        """
+        path = os.path.abspath(path)
+        stat = stat or os.stat(path)
+        with self._lock:
+            row = self._db.execute(
+                'SELECT crc32c, md5 FROM content WHERE path = ? AND size = ? AND mtime_ns = ?',
+                (path, stat.st_size, stat.st_mtime_ns)).fetchone()
+        if row is not None:
+            return row
+        crc32c, md5 = file_checksums(path)
+        with self._lock:
+            self._pending.append((path, stat.st_size, stat.st_mtime_ns, crc32c, md5))
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+        return crc32c, md5
+
+    def flush(self):
+        """Write buffered entries to disk."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._db.executemany('INSERT OR REPLACE INTO content VALUES (?, ?, ?, ?, ?)', self._pending)
+            self._db.commit()
+            self._pending = []
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._db.close()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index(**options):
+    """
+    Return the process-wide content index, creating it on first use.
+
+    Args:
+        **options: ContentIndex arguments, used only when the index is first created.
+
+    Returns:
+        ContentIndex: The shared index.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ContentIndex(**options)
+            atexit.register(_index.flush)
+        return _index
+
+
+def set_index(index):
+    """
+    Replace the process-wide content index, e.g. to keep it somewhere other than INDEX_PATH.
+
+    Args:
+        index (ContentIndex): Index to use from now on.
+    """
+    global _index
+    with _index_lock:
+        _index = index
+
+
+def remote_matches(remote, size, crc32c, md5):
+    """
+    Check whether remote object metadata matches a local file.
+
+    Composite objects have no MD5, so CRC32C is preferred when both sides have it.
+
+    Args:
+        remote (dict): Object metadata with 'size' and optionally 'crc32c' / 'md5Hash'.
+        size (int): Local file size in bytes.
+        crc32c (str): Local base64 CRC32C.
+        md5 (str): Local base64 MD5.
+
+    Returns:
+        bool: True if the object already holds the file's content.
+    """
+    if int(remote.get('size', -1)) != size:
+        return False
+    if remote.get('crc32c'):
+        return remote['crc32c'] == crc32c
+    if remote.get('md5Hash'):
+        return remote['md5Hash'] == md5
+    return False
+
+
+class _UploadState:
+    """Resumable-session state for one file, persisted as JSON so an interrupted upload can continue."""
+
+    def __init__(self, state_dir, bucket_name, blob_name, source_file):
+        stat = os.stat(source_file)
+        key = f"{bucket_name}/{blob_name}|{os.path.abspath(source_file)}|{stat.st_size}|{stat.st_mtime_ns}"
+        self.path = os.path.join(state_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+        self._lock = threading.Lock()
+        self.data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable upload state {self.path}: {e}")
+
+    def save(self):
+        with self._lock:
+            self._write()
+
+    def update(self, part, **changes):
+        """Change a part and persist the state; parts are only mutated under the lock save() serializes with."""
+        with self._lock:
+            part.update(changes)
+            self._write()
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def _authorized_session():
+    key_path, project_id = gcp.current_target()
+    return clients.get_client('storage_session', source=key_path, project=project_id, scopes=SCOPES)
+
+
+def _persisted_offset(session, url, length):
+    """
+    Ask a resumable session how many bytes it has stored.
+
+    Returns:
+        int: Bytes persisted, or length if the upload is already complete.
+    """
+    response = _put(session, url, headers={'Content-Range': f'bytes */{length}'})
+    if response.status_code in (200, 201):
+        return length
+    if response.status_code == 308:
+        received = response.headers.get('Range')
+        return int(received.rsplit('-', 1)[1]) + 1 if received else 0
+    raise UploadError(f"Resumable session returned {response.status_code}: {response.text}")
+
+
+def _send_range(session, url, source_file, start, end, chunk_size):
+    """
+    Upload bytes [start, end) of a file to a resumable session, resuming at its persisted offset.
+
+    Args:
+        session: Authorized HTTP session.
+        url (str): Resumable session URL.
+        source_file (str): Path to the file.
+        start (int): First byte of the range.
+        end (int): One past the last byte of the range.
+        chunk_size (int): Bytes per PUT, a multiple of 256 KiB.
+    """
+    length = end - start
+    offset = _persisted_offset(session, url, length)
+    with open(source_file, 'rb') as f:
+        while offset < length:
+            f.seek(start + offset)
+            data = f.read(min(chunk_size, length - offset))
+            last = offset + len(data) >= length
+            total = str(length) if last else '*'
+            response = _put(session, url, data=data, headers={
+                'Content-Range': f'bytes {offset}-{offset + len(data) - 1}/{total}',
+            })
+            if response.status_code in (200, 201):
+                if metrics.enabled:
+                    metrics.UPLOADED_BYTES.inc(length - offset)
+                return
+            if response.status_code != 308:
+                raise UploadError(f"Chunk upload returned {response.status_code}: {response.text}")
+            received = response.headers.get('Range')
+            committed = int(received.rsplit('-', 1)[1]) + 1 if received else 0
+            if metrics.enabled and committed > offset:
+                metrics.UPLOADED_BYTES.inc(committed - offset)
+            offset = committed
+    if length == 0:
+        response = _put(session, url, data=b'', headers={'Content-Range': 'bytes */0'})
+        if response.status_code not in (200, 201):
+            raise UploadError(f"Empty upload returned {response.status_code}: {response.text}")
+
+
+def _create_session(bucket, part):
+    blob = bucket.blob(part['name'])
+    return ratelimit.call('storage', gcp.current_target()[1], blob.create_resumable_upload_session,
+                          size=part['end'] - part['start'])
+
+
+def _upload_part(bucket, session, state, part, source_file, chunk_size):
+    if part.get('done'):
+        return part
+    if not part.get('url'):
+        state.update(part, url=_create_session(bucket, part))
+    try:
+        _send_range(session, part['url'], source_file, part['start'], part['end'], chunk_size)
+    except UploadError:
+        # The session may have expired; start a fresh one for this part once
+        state.update(part, url=_create_session(bucket, part))
+        _send_range(session, part['url'], source_file, part['start'], part['end'], chunk_size)
+    state.update(part, done=True)
+    return part
+
+
+def _delete_parts(project, sources):
+    for source in sources:
+        try:
+            ratelimit.call('storage', project, source.delete)
+        except Exception as e:
+            logger.warning(f"Failed to delete temporary part {source.name}: {e}")
+
+
+def upload_file(bucket_name, source_file, destination_blob_name=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                parallel_threshold=PARALLEL_THRESHOLD, max_workers=8, state_dir=STATE_DIR):
+    """
+    Upload a file to Cloud Storage, in parallel parts if it is large, resuming interrupted uploads.
+
+    Large files are split into up to 32 parts, each sent through its own resumable
+    session and composed into the destination object. Session URLs and finished parts
+    are persisted under state_dir, so running the same upload again after an
+    interruption continues where it stopped.
+
+    Args:
+        bucket_name (str): Name of the bucket.
+        source_file (str): Path to the source file.
+        destination_blob_name (str): Destination blob name. If None, uses the source file name.
+        chunk_size (int): Bytes per resumable request; rounded up to a multiple of 256 KiB.
+        parallel_threshold (int): Files at least this large are uploaded in parallel parts.
+        max_workers (int): Parts uploaded at once.
+        state_dir (str): Directory holding resumable-session state.
+
+    Returns:
+        Blob: The uploaded blob.
+    """
+    key_path, project = gcp.current_target()
+    _, storage_client = gcp.initialize_clients()
+    if not storage_client:
+        raise UploadError("Cloud Storage client is not available")
+
+    chunk_size = _align(chunk_size)
+    blob_name = destination_blob_name or os.path.basename(source_file)
+    bucket = storage_client.bucket(bucket_name)
+    blob = bucket.blob(blob_name)
+    size = os.path.getsize(source_file)
+    state = _UploadState(state_dir, bucket_name, blob_name, source_file)
+    session = _authorized_session()
+
+    if size < parallel_threshold:
+        part = state.data.setdefault('parts', [{'name': blob_name, 'start': 0, 'end': size}])[0]
+        _upload_part(bucket, session, state, part, source_file, chunk_size)
+        state.clear()
+        logger.info(f"Uploaded {source_file} to bucket '{bucket_name}' as '{blob_name}'.")
+        return blob
+
+    if 'parts' not in state.data:
+        part_size = _align(max(chunk_size, -(-size // MAX_PARTS)))
+        token = uuid.uuid4().hex[:8]
+        state.data['parts'] = [
+            {'name': f"{blob_name}.part-{index:02d}-{token}", 'start': start, 'end': min(start + part_size, size)}
+            for index, start in enumerate(range(0, size, part_size))
+        ]
+        state.save()
+    parts = state.data['parts']
+
+    def upload_part(part):
+        # Pool threads do not inherit the caller's gcp.use_target()
+        with gcp.use_target(key_path, project):
+            return _upload_part(bucket, session, state, part, source_file, chunk_size)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(upload_part, part) for part in parts]
+        for future in as_completed(futures):
+            part = future.result()
+            logger.info(f"Uploaded part {part['name']} ({part['end'] - part['start']} bytes).")
+
+    sources = [bucket.blob(part['name']) for part in parts]
+    try:
+        ratelimit.call('storage', project, blob.compose, sources)
+    except Exception:
+        # Retries are exhausted; do not leave billable parts or state pointing at them behind
+        _delete_parts(project, sources)
+        state.clear()
+        raise
+    _delete_parts(project, sources)
+    state.clear()
+    logger.info(f"Uploaded {source_file} to bucket '{bucket_name}' as '{blob_name}' in {len(parts)} parts.")
+    return blob
+
+
+def list_remote_objects(bucket_name, prefix=''):
+    """
+    Fetch size and checksum metadata for every object under a prefix in one paged listing.
+
+    Args:
+        bucket_name (str): Name of the bucket.
+        prefix (str): Object name prefix.
+
+    Returns:
+        dict: Object name -> {'size', 'crc32c', 'md5Hash'}.
+    """
+    _, project = gcp.current_target()
+    _, storage_client = gcp.initialize_clients()
+    remote = {}
+
+    def fetch(page_token):
+        iterator = storage_client.list_blobs(
+            bucket_name, prefix=prefix or None, page_size=1000, page_token=page_token,
+            fields='items(name,size,crc32c,md5Hash),nextPageToken')
+        return list(next(iterator.pages, [])), iterator.next_page_token
+
+    for page in gcp.iter_pages('storage', project, fetch):
+        for blob in page:
+            remote[blob.name] = {'size': blob.size, 'crc32c': blob.crc32c, 'md5Hash': blob.md5_hash}
+    return remote
+
+
+def remote_object(bucket_name, blob_name):
+    """
+    Fetch size and checksum metadata for one object with a single metadata request.
+
+    Args:
+        bucket_name (str): Name of the bucket.
+        blob_name (str): Object name.
+
+    Returns:
+        dict: {'size', 'crc32c', 'md5Hash'} as in list_remote_objects(), or None if there is no such object.
+    """
+    _, project = gcp.current_target()
+    _, storage_client = gcp.initialize_clients()
+    blob = ratelimit.call('storage', project, storage_client.bucket(bucket_name).get_blob, blob_name)
+    if blob is None:
+        return None
+    return {'size': blob.size, 'crc32c': blob.crc32c, 'md5Hash': blob.md5_hash}
+
+
+def local_files(source, prefix=''):
+    """
+    List the files under a directory (or a single file) with the object names they upload to.
+
+    Args:
+        source (str): Local directory or file.
+        prefix (str): Object name prefix.
+
+    Returns:
+        list: (path, blob_name) pairs.
+    """
+    prefix = prefix.rstrip('/')
+    if os.path.isfile(source):
+        name = os.path.basename(source)
+        return [(source, f"{prefix}/{name}" if prefix else name)]
+    files = []
+    for root, _, names in os.walk(source):
+        for name in names:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, source).replace(os.sep, '/')
+            files.append((path, f"{prefix}/{relative}" if prefix else relative))
+    return files
+
+
+def is_current(path, remote, index=None):
+    """
+    Check whether a remote object already holds a local file's content.
+
+    Sizes are compared first so files that obviously changed are never hashed, and
+    checksums come from the content index, so unchanged files are not rehashed.
+
+    Args:
+        path (str): Local file.
+        remote (dict): The object's list_remote_objects() entry, or None if it does not exist.
+        index (ContentIndex): Index to take checksums from; defaults to the shared index.
+
+    Returns:
+        bool: True if the upload can be skipped.
+    """
+    if remote is None:
+        return False
+    stat = os.stat(path)
+    if int(remote.get('size', -1)) != stat.st_size:
+        return False
+    crc32c, md5 = (index or get_index()).checksums(path, stat)
+    return remote_matches(remote, stat.st_size, crc32c, md5)
+
+
+def upload_files(bucket_name, files, remote=None, max_workers=8, index=None, **upload_options):
+    """
+    Upload files to Cloud Storage concurrently.
+
+    Args:
+        bucket_name (str): Name of the bucket.
+        files (list): (path, blob_name) pairs.
+        remote (dict): list_remote_objects() result; files whose object already matches are skipped.
+        max_workers (int): Files uploaded at once.
+        index (ContentIndex): Index to take checksums from; defaults to the shared index.
+        **upload_options: Extra arguments passed to upload_file().
+
+    Returns:
+        dict: {'uploaded': [...], 'skipped': [...], 'failed': {name: error}}.
+    """
+    remote = remote or {}
+    index = index or get_index()
+    result = {'uploaded': [], 'skipped': [], 'failed': {}}
+    key_path, project = gcp.current_target()
+
+    def upload(path, blob_name):
+        if is_current(path, remote.get(blob_name), index):
+            return 'skipped'
+        # Pool threads do not inherit the caller's gcp.use_target()
+        with gcp.use_target(key_path, project):
+            upload_file(bucket_name, path, blob_name, **upload_options)
+        return 'uploaded'
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(upload, path, blob_name): blob_name for path, blob_name in files}
+            for future in as_completed(futures):
+                blob_name = futures[future]
+                try:
+                    result[future.result()].append(blob_name)
+                except Exception as e:
+                    logger.error(f"Failed to upload {blob_name}: {e}")
+                    result['failed'][blob_name] = str(e)
+    finally:
+        index.flush()
+    return result
+
+
+def upload_directory(bucket_name, source_dir, prefix='', sync=False, max_workers=8, index=None, **upload_options):
+    """
+    Upload a directory tree to Cloud Storage concurrently.
+
+    Args:
+        bucket_name (str): Name of the bucket.
+        source_dir (str): Local directory to upload.
+        prefix (str): Object name prefix for the uploaded tree.
+        sync (bool): Skip files whose remote object already has the same size and checksum.
+        max_workers (int): Files uploaded at once.
+        index (ContentIndex): Index to take checksums from; defaults to the shared index.
+        **upload_options: Extra arguments passed to upload_file().
+
+    Returns:
+        dict: {'uploaded': [...], 'skipped': [...], 'failed': {name: error}}.
+    """
+    files = local_files(source_dir, prefix)
+    remote = list_remote_objects(bucket_name, prefix) if sync else None
+    result = upload_files(bucket_name, files, remote, max_workers=max_workers, index=index, **upload_options)
+    logger.info(f"Directory upload to '{bucket_name}': {len(result['uploaded'])} uploaded, "
+                f"{len(result['skipped'])} skipped, {len(result['failed'])} failed.")
+    return result
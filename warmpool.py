@@ -0,0 +1,354 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import gcp
+import metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PoolKey = namedtuple('PoolKey', 'project zone machine_type image')
+
+# Label marking a standby instance as belonging to a pool; the value is the pool ID
+POOL_LABEL = 'warm-pool'
+
+# How standby instances are parked and woken. Stopped instances only bill for their
+# disk; suspended ones also keep memory, which makes waking them faster.
+STANDBY = {
+    'stop': ('stop', 'start', 'TERMINATED'),
+    'suspend': ('suspend', 'resume', 'SUSPENDED'),
+}
+
+
+def pool_id(key):
+    """Return a label-safe ID for a pool key."""
+    return hashlib.sha1('|'.join(key).encode('utf-8')).hexdigest()[:16]
+
+
+class WarmPool:
+    """
+    Pre-provisioned standby instances for one (project, zone, machine type, image).
+
+    acquire() hands out a standby instance by relabeling it for the caller and waking
+    it, which takes seconds instead of the minutes a fresh insert takes. The pool's
+    target size follows the observed request rate: enough standby instances to cover
+    the requests expected while a replacement is being prepared, between min_size and
+    max_size. Surplus instances are deleted once the surplus has lasted
+    scale_down_delay seconds. Standby instances are found by label, so a restarted
+    process picks up the pool it left behind; only one process should manage a pool.
+    """
+
+    def __init__(self, key, min_size=1, max_size=10, standby='stop', window=900.0, refill_seconds=120.0,
+                 scale_down_delay=600.0, name_prefix='warm', network='default'):
+        """
+        Args:
+            key (PoolKey): Project, zone, machine type and image of the pooled instances.
+            min_size (int): Standby instances kept even when there are no requests.
+            max_size (int): Upper bound on standby instances.
+            standby (str): 'stop' or 'suspend'.
+            window (float): Seconds of request history used to estimate the request rate.
+            refill_seconds (float): Initial estimate of how long preparing a standby instance takes;
+                refined from observed refills.
+            scale_down_delay (float): Seconds a surplus must persist before instances are deleted.
+            name_prefix (str): Prefix for pooled instance names.
+            network (str): Network name for pooled instances.
+        """
+        if standby not in STANDBY:
+            raise ValueError(f"Unknown standby mode: {standby}")
+        self.key = key
+        self.id = pool_id(key)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.standby = standby
+        self.window = window
+        self.refill_seconds = refill_seconds
+        self.scale_down_delay = scale_down_delay
+        self.name_prefix = name_prefix
+        self.network = network
+        self._ready = deque()     # standby instance names, oldest first
+        self._warming = 0         # instances being created and parked
+        self._requests = deque()  # monotonic times of recent acquire() calls
+        self._surplus_since = None
+        self._lock = threading.Lock()
+
+    def _target(self, name):
+        return {'project': self.key.project, 'zone': self.key.zone, 'instance_name': name}
+
+    def _desired_size(self, now):
+        # Little's law: requests arriving while one standby instance is prepared
+        while self._requests and self._requests[0] < now - self.window:
+            self._requests.popleft()
+        expected = math.ceil(len(self._requests) / self.window * self.refill_seconds)
+        return max(self.min_size, min(self.max_size, expected))
+
+    def desired_size(self):
+        """Return how many standby instances the observed request rate calls for."""
+        with self._lock:
+            return self._desired_size(time.monotonic())
+
+    def available(self):
+        """Return the number of standby instances ready to hand out."""
+        return len(self._ready)
+
+    def refresh(self):
+        """Reload the standby instances from the Compute Engine inventory."""
+        parked = STANDBY[self.standby][2]
+        names = sorted(record.name for record in gcp.iter_instances(
+            self.key.project, self.key.zone, status=parked, labels={POOL_LABEL: self.id}))
+        with self._lock:
+            self._ready = deque(names)
+        logger.info(f"Warm pool {self.id} has {len(names)} standby instances.")
+
+    def acquire(self, labels=None, timeout=None):
+        """
+        Hand out a running instance, from the pool if it has one.
+
+        The instance is relabeled before it is woken, so it leaves the pool (and any
+        inventory scan) before anyone else can take it. With the pool empty the
+        instance is created from scratch.
+
+        Args:
+            labels (dict): Labels the handed-out instance should carry.
+            timeout (float): Seconds to wait for the instance to start.
+
+        Returns:
+            str: Name of the running instance, or None if none could be provided.
+        """
+        started = time.monotonic()
+        with self._lock:
+            self._requests.append(started)
+        wake = STANDBY[self.standby][1]
+        while True:
+            with self._lock:
+                name = self._ready.popleft() if self._ready else None
+            if name is None:
+                break
+            # Replacing the labels drops the pool label; on failure the next refresh() finds it again
+            if not gcp.set_instance_labels(self.key.project, self.key.zone, name, dict(labels or {})):
+                continue
+            if gcp.change_instance_state(self.key.project, self.key.zone, name, wake, timeout=timeout):
+                self._record(started, 'hit')
+                return name
+            # Relabeled but not started: it no longer belongs to the pool, so do not leak it
+            gcp.terminate_instance(self.key.project, self.key.zone, name)
+
+        name = gcp.create_instance(self.key.project, self.key.zone, self._new_name(), self.key.machine_type,
+                                   self.key.image, self.network, labels)
+        self._record(started, 'miss' if name else 'failed')
+        return name
+
+    def _record(self, started, outcome):
+        if metrics.enabled:
+            metrics.WARM_POOL_HANDOUTS.inc(1, self.key.zone, outcome)
+            metrics.WARM_POOL_HANDOUT_LATENCY.observe(time.monotonic() - started, outcome)
+
+    def _new_name(self):
+        return f"{self.name_prefix}-{self.id[:8]}-{uuid.uuid4().hex[:8]}"
+
+    def replenish(self, max_in_flight=10):
+        """
+        Create and park instances until the pool reaches its desired size.
+
+        Returns:
+            int: Number of instances added to the pool.
+        """
+        with self._lock:
+            deficit = self._desired_size(time.monotonic()) - len(self._ready) - self._warming
+            if deficit <= 0:
+                return 0
+            self._warming += deficit
+        started = time.monotonic()
+        parked = []
+        try:
+            specs = [{'project': self.key.project, 'zone': self.key.zone, 'instance_name': self._new_name(),
+                      'machine_type': self.key.machine_type, 'source_image': self.key.image,
+                      'network': self.network, 'labels': {POOL_LABEL: self.id}} for _ in range(deficit)]
+            created = [self._target(result['instance_name'])
+                       for result in gcp.create_instances(specs, max_in_flight=max_in_flight) if result['success']]
+            park = STANDBY[self.standby][0]
+            failed = []
+            for result in gcp.change_instance_states(created, park, max_in_flight=max_in_flight):
+                (parked if result['success'] else failed).append(result['instance_name'])
+            if failed:
+                # Running instances that could not be parked would bill at full rate
+                list(gcp.terminate_instances([self._target(name) for name in failed], max_in_flight=max_in_flight))
+        finally:
+            with self._lock:
+                self._warming -= deficit
+                self._ready.extend(parked)
+                if parked:
+                    # Smooth the refill estimate that sizes the pool
+                    self.refill_seconds = 0.7 * self.refill_seconds + 0.3 * (time.monotonic() - started)
+        logger.info(f"Warm pool {self.id}: added {len(parked)} of {deficit} standby instances.")
+        return len(parked)
+
+    def scale_down(self, max_in_flight=10):
+        """
+        Delete standby instances the request rate no longer justifies.
+
+        Returns:
+            int: Number of instances deleted.
+        """
+        now = time.monotonic()
+        with self._lock:
+            excess = len(self._ready) - self._desired_size(now)
+            if excess <= 0:
+                self._surplus_since = None
+                return 0
+            if self._surplus_since is None:
+                self._surplus_since = now
+            if now - self._surplus_since < self.scale_down_delay:
+                return 0
+            # Newest first, so the instances that stay have been parked longest
+            names = [self._ready.pop() for _ in range(excess)]
+            self._surplus_since = None
+        results = list(gcp.terminate_instances([self._target(name) for name in names], max_in_flight=max_in_flight))
+        deleted = sum(result['success'] for result in results)
+        logger.info(f"Warm pool {self.id}: scaled down by {deleted} standby instances.")
+        return deleted
+
+    def maintain(self):
+        """Bring the pool to its desired size: refill it, or shrink it after a lasting surplus."""
+        self.replenish()
+        self.scale_down()
+
+
+class WarmPoolManager:
+    """
+    Warm pools keyed by (project, zone, machine type, image), maintained in the background.
+
+    Every handout wakes the maintenance thread so the pool is refilled right away;
+    otherwise pools are checked every check_interval seconds.
+    """
+
+    def __init__(self, check_interval=30.0, key_path=None, max_workers=4, **pool_options):
+        """
+        Args:
+            check_interval (float): Seconds between maintenance passes.
+            key_path (str): Service account key file for handouts and maintenance, or None for gcp.KEY_PATH.
+            max_workers (int): Pools maintained at once.
+            **pool_options: Default WarmPool arguments for pools created on demand.
+        """
+        self.check_interval = check_interval
+        self.key_path = key_path
+        self.max_workers = max_workers
+        self.pool_options = pool_options
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def configure(self, project, zone, machine_type, image, **options):
+        """
+        Create (or replace) the pool for a key with its own settings.
+
+        Returns:
+            WarmPool: The pool.
+        """
+        key = PoolKey(project, zone, machine_type, image)
+        pool = WarmPool(key, **{**self.pool_options, **options})
+        if self._thread is not None:
+            self._refresh(pool)
+        with self._lock:
+            self._pools[key] = pool
+        self._wake.set()
+        return pool
+
+    def pool(self, project, zone, machine_type, image):
+        """
+        Return the pool for a key, creating it with the default settings on first use.
+
+        A pool created while the manager is running first loads the standby instances
+        a previous run left behind, so it does not create duplicates of them.
+        """
+        key = PoolKey(project, zone, machine_type, image)
+        with self._lock:
+            pool = self._pools.get(key)
+        if pool is not None:
+            return pool
+        pool = WarmPool(key, **self.pool_options)
+        if self._thread is not None:
+            self._refresh(pool)
+        with self._lock:
+            # Another thread may have created the pool meanwhile; keep the first one
+            return self._pools.setdefault(key, pool)
+
+    def acquire(self, project, zone, machine_type, image, labels=None, timeout=None):
+        """
+        Hand out a running instance from the matching pool.
+
+        Args:
+            project (str): GCP project ID.
+            zone (str): Compute Engine zone.
+            machine_type (str): Machine type, e.g. 'e2-medium'.
+            image (str): Source image.
+            labels (dict): Labels the handed-out instance should carry.
+            timeout (float): Seconds to wait for the instance to start.
+
+        Returns:
+            str: Name of the running instance, or None if none could be provided.
+        """
+        pool = self.pool(project, zone, machine_type, image)
+        try:
+            with gcp.use_target(self.key_path, project):
+                return pool.acquire(labels, timeout=timeout)
+        finally:
+            self._wake.set()
+
+    def maintain(self):
+        """Run one maintenance pass over every pool."""
+        with self._lock:
+            pools = list(self._pools.values())
+
+        def maintain(pool):
+            try:
+                with gcp.use_target(self.key_path, pool.key.project):
+                    pool.maintain()
+            except Exception as e:
+                logger.error(f"Maintenance of warm pool {pool.id} failed: {e}")
+
+        if pools:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pools))) as executor:
+                list(executor.map(maintain, pools))
+
+    def start(self):
+        """Load existing standby instances and start background maintenance."""
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            self._refresh(pool)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='warm-pool', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop background maintenance; standby instances stay parked for the next run."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _refresh(self, pool):
+        with gcp.use_target(self.key_path, pool.key.project):
+            pool.refresh()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.maintain()
+            self._wake.wait(self.check_interval)
+            self._wake.clear()